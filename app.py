@@ -1,13 +1,30 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, g, jsonify, make_response, request
 from flask_cors import CORS
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.metrics import mean_squared_error
+import logging
 import os
-
-app = Flask(__name__)
+import time
+import zlib
+from datetime import datetime
+
+import config
+from assets import (
+    IMMUTABLE_CACHE_CONTROL, PAYLOAD_BROTLI_QUALITY, PAYLOAD_GZIP_LEVEL, REVALIDATE_CACHE_CONTROL, StaticAssets, compress,
+    preferred_encoding
+)
+from cache import ResponseCache
+from evaluation import evaluation_job, start_evaluation
+from hours import local_time
+from logs import log_event
+from metrics import REQUEST_SECONDS, Gauge, registry
+from model import (
+    PROFILE_FEATURES, RANKING_WEIGHTS, build_status, current_model, ensure_model, ingest_ratings, ranking_weights,
+    start_background_build
+)
+from profiler import SamplingProfiler
+from serialization import JSONProvider
+
+app = Flask(__name__, static_folder=None)
+app.json = JSONProvider(app)
 # Configure CORS to allow all origins and methods
 CORS(app, resources={
     r"/api/*": {
@@ -17,131 +34,228 @@ CORS(app, resources={
     }
 })
 
-# Global variables to store loaded data
-data_loaded = False
-rest_pay = None
-rest_cuisine = None
-rest_hours = None
-rest_parking = None
-rest_geo = None
-cons_cuisine = None
-cons_pay = None
-cons_profile = None
-rating = None
-user_item_matrix = None
-user_similarity_df = None
-cf_scores = None
-cbf_scores_df = None
-hybrid_scores = None
-encoder = None
-
-def load_dataset(file_name):
-    """Load dataset from CSV file"""
-    try:
-        df = pd.read_csv(os.path.join('data', file_name))
-        print(f'{file_name} has {df.shape[0]} samples with {df.shape[1]} features each.')
-        return df
-    except Exception as e:
-        print(f'{file_name} could not be loaded. Error: {e}')
-        return None
+# Serialized /api/recommendations/<user_id> responses of the current model version
+recommendation_cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL)
 
-def load_all_data():
-    """Load all datasets and initialize recommendation system"""
-    global data_loaded, rest_pay, rest_cuisine, rest_hours, rest_parking, rest_geo
-    global cons_cuisine, cons_pay, cons_profile, rating
-    global user_item_matrix, user_similarity_df, cf_scores, cbf_scores_df, hybrid_scores, encoder
-
-    if data_loaded:
-        return True
-
-    print('Loading restaurant datasets')
-    rest_pay = load_dataset('chefmozaccepts.csv')
-    rest_cuisine = load_dataset('chefmozcuisine.csv')
-    rest_hours = load_dataset('chefmozhours4.csv')
-    rest_parking = load_dataset('chefmozparking.csv')
-    rest_geo = load_dataset('geoplaces2.csv')
-
-    print('\nLoading consumer datasets')
-    cons_cuisine = load_dataset('usercuisine.csv')
-    cons_pay = load_dataset('userpayment.csv')
-    cons_profile = load_dataset('userprofile.csv')
-
-    print('\nLoading User-Item-Rating dataset')
-    rating = load_dataset('rating_final.csv')
-
-    # Filter users as in notebook
-    if rating is not None and cons_profile is not None:
-        list_users = rating['userID'].unique()
-        cons_profile = cons_profile[cons_profile['userID'].isin(list_users)]
-
-    # Initialize Collaborative Filtering
-    user_item_matrix = rating.pivot_table(
-        index='userID',
-        columns='placeID',
-        values='rating',
-        fill_value=0
-    )
-    user_similarity = cosine_similarity(user_item_matrix)
-    user_similarity_df = pd.DataFrame(
-        user_similarity,
-        index=user_item_matrix.index,
-        columns=user_item_matrix.index
-    )
-
-    # Predict CF scores
-    sim_sums = user_similarity_df.abs().sum(axis=1).replace(0, 1)
-    cf_scores = np.dot(user_similarity_df, user_item_matrix) / sim_sums.values[:, np.newaxis]
-    cf_scores = pd.DataFrame(cf_scores, index=user_item_matrix.index, columns=user_item_matrix.columns)
-
-    # Initialize Content-Based Filtering
-    rest_features = rest_geo[['placeID', 'price', 'alcohol', 'Rambience']].merge(
-        rest_cuisine[['placeID', 'Rcuisine']], on='placeID', how='left'
-    )
-    rest_features['Rcuisine'] = rest_features['Rcuisine'].fillna('Unknown')
-
-    user_ratings = rating[rating['rating'] > 1][['userID', 'placeID']]  # High ratings
-    user_features = user_ratings.merge(rest_features, on='placeID')
-
-    encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-    feature_columns = ['price', 'alcohol', 'Rambience', 'Rcuisine']
-    encoder.fit(rest_features[feature_columns])
-
-    # Encode restaurant features
-    encoded_rest_features = encoder.transform(rest_features[feature_columns])
-    item_profiles = pd.DataFrame(encoded_rest_features, index=rest_features['placeID'])
-
-    # Encode user features
-    if not user_features.empty:
-        encoded_user_features = encoder.transform(user_features[feature_columns])
-        encoded_user_features_df = pd.DataFrame(encoded_user_features, index=user_features.index)
-        encoded_user_features_df['userID'] = user_features['userID']
-        user_profiles = encoded_user_features_df.groupby('userID').mean()
-    else:
-        user_profiles = pd.DataFrame(columns=item_profiles.columns, index=user_item_matrix.index)
+# Compressed variants of the large model payloads, compressed once per model version
+payload_cache = ResponseCache(16, ttl_seconds=None)
+
+# The frontend pages and their content-hashed, precompressed scripts, stylesheets and images
+frontend = StaticAssets(os.path.dirname(os.path.abspath(__file__)))
+
+# Slowest-request profiles, when PROFILE_SLOW_REQUESTS is set
+profiler = SamplingProfiler(config.PROFILE_SLOW_REQUESTS, config.PROFILE_INTERVAL_MS) if config.PROFILE_SLOW_REQUESTS > 0 else None
+
+# Endpoints that answer before the first model build has finished
+MODEL_FREE_PATHS = ['/api/ready', '/api/metrics']
+
+
+def model_memory():
+    """Bytes held by the main arrays and payloads of the published model"""
+    model = current_model()
+    if model is None:
+        return {}
+    return {
+        ('cf_engine',): model.cf_engine.nbytes,
+        ('cbf_engine',): model.cbf_engine.nbytes,
+        ('top_n_index',): model.top_n_index.nbytes,
+        ('candidate_index',): model.candidate_index.nbytes,
+        ('similar_places',): model.similar_places.nbytes,
+        ('search_index',): model.search_index.nbytes,
+        ('opening_hours',): model.opening_hours.nbytes,
+        **{(f'{name}_json',): len(body) for name, (body, _) in model.payloads.items()}
+    }
+
+
+def cache_stats():
+    """Statistics of the in-process caches by cache name"""
+    model = current_model()
+    stats = {'recommendations': recommendation_cache.stats(), 'payloads': payload_cache.stats()}
+    if model is not None:
+        stats['entities'] = model.entity_store.cache.stats()
+    return stats
+
+
+def cache_metric(stat):
+    return lambda: {(name,): cache[stat] for name, cache in cache_stats().items()}
+
+
+registry.register(Gauge('model_version', 'Version of the published model', callback=lambda: (
+    {(): current_model().version} if current_model() is not None else {}
+)))
+registry.register(Gauge('model_memory_bytes', 'Memory held by model components', ('component',), callback=model_memory))
+registry.register(Gauge('cache_hits_total', 'Cache hits', ('cache',), callback=cache_metric('hits'), kind='counter'))
+registry.register(Gauge('cache_misses_total', 'Cache misses', ('cache',), callback=cache_metric('misses'), kind='counter'))
+registry.register(Gauge('cache_evictions_total', 'Cache evictions', ('cache',), callback=cache_metric('evictions'), kind='counter'))
+registry.register(Gauge('cache_entries', 'Entries held by each cache', ('cache',), callback=cache_metric('size')))
+
+
+@app.before_request
+def start_request_timer():
+    """Record the request start (and start sampling it when the profiler is on)"""
+    g.request_start = time.perf_counter()
+    if profiler is not None:
+        profiler.begin()
+
+
+@app.before_request
+def require_model():
+    """Answer API requests with 503 until the first model build has finished"""
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/') or request.path in MODEL_FREE_PATHS:
+        return None
+    if current_model() is None:
+        start_background_build()
+        status = build_status()
+        return jsonify({'error': 'Model is not ready', 'status': status['status']}), 503
+    return None
+
+
+def encoded_response(body, variants, mimetype, etag, cache_control):
+    """Serve a body, or its compressed variant matching Accept-Encoding, answering 304 when If-None-Match matches"""
+    encoding = preferred_encoding(variants, request.accept_encodings)
+    response = app.response_class(variants[encoding] if encoding else body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if variants:
+        response.vary.add('Accept-Encoding')
+    # Every encoding is its own representation, with its own ETag
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+
+def cached_json_response(model, name):
+    """Serve a pre-encoded model payload, compressed on first use and cached for the model version"""
+    body, etag = model.payload(name)
+    variants = payload_cache.get(model.version, name)
+    if variants is None:
+        variants = compress(body, gzip_level=PAYLOAD_GZIP_LEVEL, brotli_quality=PAYLOAD_BROTLI_QUALITY)
+        payload_cache.put(model.version, name, variants)
+    # Let browsers keep the payload but revalidate it on every load
+    return encoded_response(body, variants, 'application/json', etag, REVALIDATE_CACHE_CONTROL)
+
+
+def asset_response(asset, cache_control):
+    """Serve a frontend file with its precompressed variants, or 404"""
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return encoded_response(asset.body, asset.variants, asset.mimetype, asset.etag, cache_control)
+
+
+# Filter parameters accepted by the paged listing endpoints
+RESTAURANT_FILTERS = ['city', 'price', 'cuisine', 'payment', 'parking', 'alcohol', 'smoking']
+USER_FILTERS = ['cuisine', 'payment', 'budget', 'smoker', 'drink_level', 'ambience', 'transport']
+PAGING_PARAMS = ['limit', 'offset', 'cursor', 'sort', 'min_rating']
+OPEN_PARAMS = ['open_at', 'open_now']
+SEARCH_PARAMS = ['q']
+
+# Parameters that re-rank /api/recommendations/<user_id> (weights, filters, min_rating, bucket)
+RANKING_PARAMS = [f'{name}_weight' for name in RANKING_WEIGHTS] + RESTAURANT_FILTERS + ['min_rating', 'bucket']
+
+
+def requested_open_time():
+    """Local datetime asked for with open_at=<ISO datetime> or open_now=1, or None; raises ValueError"""
+    open_at = request.args.get('open_at')
+    if open_at:
+        return local_time(datetime.fromisoformat(open_at), config.RESTAURANT_TIMEZONE)
+    if request.args.get('open_now', '').lower() in ('1', 'true', 'yes'):
+        return local_time(None, config.RESTAURANT_TIMEZONE)
+    return None
+
+
+def wants_page(filter_names):
+    """Whether the request asks for a paged/filtered listing instead of the full table"""
+    return any(name in request.args for name in PAGING_PARAMS + filter_names)
+
+
+def requested_filters(filter_names):
+    """Facet filters of the request: name -> values, from repeated or comma-separated parameters"""
+    filters = {}
+    for name in filter_names:
+        values = [value for param in request.args.getlist(name) for value in param.split(',') if value.strip()]
+        if values:
+            filters[name] = values
+    return filters
+
+
+def requested_minimums():
+    """Range filters of the request (min_rating); raises ValueError"""
+    min_rating = request.args.get('min_rating')
+    if min_rating in (None, ''):
+        return {}
+    try:
+        return {'rating': float(min_rating)}
+    except ValueError:
+        raise ValueError('min_rating must be a number') from None
 
-    # Align columns
-    user_profiles = user_profiles.reindex(columns=item_profiles.columns, fill_value=0)
-    user_profiles = user_profiles.fillna(0).replace([np.inf, -np.inf], 0)
-    item_profiles = item_profiles.fillna(0).replace([np.inf, -np.inf], 0)
 
-    # Compute CBF scores
-    cbf_scores = cosine_similarity(user_profiles, item_profiles)
-    cbf_scores_df = pd.DataFrame(cbf_scores, index=user_profiles.index, columns=item_profiles.index)
+def listing_page(listing, key, filter_names, positions=None):
+    """Serve one page of a listing index from limit/offset/cursor/sort and filter parameters"""
+    try:
+        limit = int(request.args.get('limit', config.PAGE_SIZE_DEFAULT))
+        offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor not in (None, '') else None
+        minimums = requested_minimums()
+    except ValueError:
+        return jsonify({'error': 'limit, offset, cursor and min_rating must be numbers'}), 400
+    if limit < 1 or limit > config.PAGE_SIZE_MAX or offset < 0 or (cursor is not None and cursor < 0):
+        return jsonify({
+            'error': f'limit must be between 1 and {config.PAGE_SIZE_MAX} and offset and cursor must not be negative'
+        }), 400
 
-    # Normalize CBF scores to match CF scale (0-2)
-    cbf_scores_df = 2 * (cbf_scores_df - cbf_scores_df.min()) / (cbf_scores_df.max() - cbf_scores_df.min())
+    filters = requested_filters(filter_names)
 
-    # Compute hybrid scores
-    hybrid_scores = 0.6 * cf_scores + 0.4 * cbf_scores_df.reindex(cf_scores.index).fillna(0)
+    try:
+        records, total, next_cursor = listing.query(
+            filters, minimums, sort=request.args.get('sort') or None, limit=limit, offset=offset, cursor=cursor,
+            positions=positions
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    data_loaded = True
-    return True
+    return jsonify({
+        key: records,
+        'total': total,
+        'limit': limit,
+        'offset': offset if cursor is None else None,
+        'next_cursor': str(next_cursor) if next_cursor is not None else None
+    })
 
 
 @app.route('/')
 def index():
     """Serve the main page"""
-    return render_template('index.html')
+    return asset_response(frontend.page('index.html'), REVALIDATE_CACHE_CONTROL)
+
+@app.route('/<page>.html')
+def get_page(page):
+    """Serve a frontend page; its scripts and stylesheets are linked by content-hashed URLs"""
+    return asset_response(frontend.page(f'{page}.html'), REVALIDATE_CACHE_CONTROL)
+
+@app.route('/static/<path:name>')
+def get_static_file(name):
+    """Serve a content-hashed frontend file, cacheable for a year"""
+    return asset_response(frontend.file(name), IMMUTABLE_CACHE_CONTROL)
+
+@app.after_request
+def observe_request(response):
+    """Record the request latency by route and log the request"""
+    start = g.get('request_start')
+    if start is not None:
+        seconds = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(seconds, request.method, route, str(response.status_code))
+        log_event(logging.DEBUG, 'request', method=request.method, path=request.full_path.rstrip('?'),
+                  route=route, status=response.status_code, ms=round(seconds * 1000, 3))
+    return response
+
+@app.teardown_request
+def finish_profile(error=None):
+    """Hand the request's stack samples to the profiler"""
+    start = g.get('request_start')
+    if profiler is not None and start is not None:
+        profiler.end(time.perf_counter() - start, method=request.method, path=request.full_path.rstrip('?'))
 
 @app.after_request
 def after_request(response):
@@ -163,334 +277,444 @@ def handle_options(path):
 @app.route('/api/users')
 def get_users():
     """Get list of all users"""
-    if not load_all_data():
-        return jsonify({'error': 'Failed to load data'}), 500
-    users = cons_profile['userID'].tolist()
-    return jsonify({'users': users})
-def get_user_recommendations(user_id, top_n=10):
-    """Get hybrid recommendations for a specific user, returning a DataFrame like in the notebook"""
-    global hybrid_scores, rest_geo
-    if not load_all_data():
-        print("Error: Data not loaded")
+    model = current_model()
+    return jsonify({'users': model.profile_user_ids})
+def get_user_recommendations(user_id, top_n=10, open_at=None):
+    """Get hybrid recommendations for a specific user as a list of restaurant records"""
+    model = ensure_model()
+    if model is None:
+        log_event(logging.ERROR, 'model_not_loaded')
         return None
 
     try:
-        if user_id not in hybrid_scores.index:
-            print(f'User {user_id} not found.')
+        result = model.recommendations(user_id, top_n, open_at)
+        if result is None:
+            log_event(logging.INFO, 'user_not_found', user_id=user_id)
             return None
 
-        # Get top N recommendations and remove duplicate indices
-        recommendations = hybrid_scores.loc[user_id].sort_values(ascending=False).head(top_n)
-        recommendations = recommendations[~recommendations.index.duplicated(keep='first')]
+        return result
+
+    except Exception as e:
+        log_event(logging.ERROR, 'recommendations_failed', user_id=user_id, error=str(e))
+        return None
 
-        # Filter rest_geo for matching placeIDs and remove duplicates
-        result = rest_geo[rest_geo['placeID'].isin(recommendations.index)].drop_duplicates(subset=['placeID']).copy()
+def nearby_recommendations_response(user_id, top_n, open_at=None):
+    """Recommendations within radius_km of the user's location (or of lat/lon), ranked by hybrid score"""
+    model = ensure_model()
+    try:
+        radius_km = float(request.args.get('radius_km') or config.NEAR_RADIUS_KM)
+        latitude, longitude = request.args.get('lat'), request.args.get('lon')
+        if latitude or longitude:
+            location = (float(latitude), float(longitude))
+        else:
+            location = None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'radius_km, lat and lon must be numbers, and lat and lon must be given together'}), 400
+    if not 0 < radius_km <= config.NEAR_RADIUS_MAX_KM:
+        return jsonify({'error': f'radius_km must be greater than 0 and at most {config.NEAR_RADIUS_MAX_KM}'}), 400
+    if location is not None and not (-90 <= location[0] <= 90 and -180 <= location[1] <= 180):
+        return jsonify({'error': 'lat must be between -90 and 90 and lon between -180 and 180'}), 400
+
+    if location is None:
+        location = model.user_location(user_id)
+        if location is None:
+            return jsonify({'error': f'No location known for user {user_id}; pass lat and lon'}), 400
+    recommendations = model.nearby_recommendations(user_id, location[0], location[1], radius_km, top_n, open_at)
+    if recommendations is None:
+        return jsonify({'error': f'User {user_id} not found or no recommendations available'}), 404
 
-        # Map recommendation scores to result DataFrame
-        result['Recommendation Score'] = result['placeID'].map(recommendations)
+    return jsonify({
+        'user_id': user_id,
+        'recommendations': recommendations,
+        'count': len(recommendations),
+        'near': {'latitude': location[0], 'longitude': location[1], 'radius_km': radius_km},
+        'open_at': open_at.isoformat() if open_at is not None else None
+    })
 
-        # Handle NaN in Recommendation Score and round to 2 decimal places
-        result['Recommendation Score'] = result['Recommendation Score'].fillna(0).astype(float).round(2)
+def requested_ranking(user_id):
+    """(bucket, weights, filters, minimums) of a re-ranked recommendations request, or None; raises ValueError
+
+    Without weights or a bucket in the request, users are split evenly between the
+    RANKING_EXPERIMENTS buckets by a hash of their userID. Request parameters take
+    precedence over the settings of the bucket.
+    """
+    for name in request.args:
+        if name.endswith('_weight') and name not in RANKING_PARAMS:
+            raise ValueError(f'Unknown ranking weight: {name}')
+    overrides = {
+        name: request.args[f'{name}_weight'] for name in RANKING_WEIGHTS if request.args.get(f'{name}_weight')
+    }
+    filters, minimums = requested_filters(RESTAURANT_FILTERS), requested_minimums()
+    bucket = request.args.get('bucket') or None
+    if bucket is None and not overrides and config.RANKING_EXPERIMENTS:
+        buckets = sorted(config.RANKING_EXPERIMENTS)
+        bucket = buckets[zlib.crc32(user_id.encode()) % len(buckets)]
+    if bucket is not None:
+        if bucket not in config.RANKING_EXPERIMENTS:
+            raise ValueError(f'Unknown bucket: {bucket}')
+        experiment = config.RANKING_EXPERIMENTS[bucket]
+        overrides = {**experiment.get('weights', {}), **overrides}
+        filters = {**experiment.get('filters', {}), **filters}
+        if not minimums and experiment.get('min_rating') is not None:
+            minimums = {'rating': float(experiment['min_rating'])}
+    if bucket is None and not overrides and not filters and not minimums:
+        return None
+    return bucket, ranking_weights(overrides), filters, minimums
 
-        # Log for debugging
-        print(f"Recommendations for {user_id}: {result[['placeID', 'name', 'Recommendation Score']].to_dict(orient='records')}")
 
-        return result
+def recommendation_cache_key(user_id, top_n):
+    """Cache key of a recommendations request, or None when its response must not be cached
 
-    except Exception as e:
-        print(f"Error generating recommendations: {e}")
+    open_now depends on the clock, so only an explicit open_at is part of a key.
+    """
+    if request.args.get('open_now', '').lower() in ('1', 'true', 'yes') and not request.args.get('open_at'):
         return None
+    near = None
+    if request.args.get('near', '').lower() in ('1', 'true', 'yes'):
+        near = (request.args.get('radius_km'), request.args.get('lat'), request.args.get('lon'))
+    ranking = tuple((name, tuple(request.args.getlist(name))) for name in RANKING_PARAMS if name in request.args)
+    return user_id, top_n, request.args.get('open_at'), near, ranking
 
 @app.route('/api/recommendations/<user_id>')
 def get_recommendations(user_id):
-    """Get hybrid recommendations for a specific user"""
+    """Get hybrid recommendations for a specific user, optionally only those near a location"""
+    model = ensure_model()
+    top_n = request.args.get('top_n', 10, type=int)
+    cache_key = recommendation_cache_key(user_id, top_n)
+    if cache_key is not None:
+        body = recommendation_cache.get(model.version, cache_key)
+        if body is not None:
+            return app.response_class(body, mimetype='application/json')
+
+    response = recommendations_response(model, user_id, top_n)
+    if cache_key is not None and response.status_code == 200:
+        recommendation_cache.put(model.version, cache_key, response.get_data())
+    return response
+
+def recommendations_response(model, user_id, top_n):
+    """Compute the /api/recommendations/<user_id> response, errors included"""
     try:
-        top_n = request.args.get('top_n', 10, type=int)
-        recommendations = get_user_recommendations(user_id, top_n)
+        try:
+            open_at = requested_open_time()
+        except ValueError:
+            return make_response(jsonify({'error': 'open_at must be an ISO 8601 datetime'}), 400)
+        if request.args.get('near', '').lower() in ('1', 'true', 'yes'):
+            if any(name in RANKING_PARAMS or name.endswith('_weight') for name in request.args):
+                return make_response(jsonify({'error': 'near cannot be combined with ranking weights, filters or bucket'}), 400)
+            return make_response(nearby_recommendations_response(user_id, top_n, open_at))
+        try:
+            ranking = requested_ranking(user_id)
+        except ValueError as e:
+            return make_response(jsonify({'error': str(e)}), 400)
+
+        if ranking is None or (ranking[1] == RANKING_WEIGHTS and not ranking[2] and not ranking[3]):
+            # The default weights without filters rank exactly like the precomputed top-N index
+            recommendations = get_user_recommendations(user_id, top_n, open_at)
+        else:
+            bucket, weights, filters, minimums = ranking
+            try:
+                place_mask = model.place_filter_mask(filters, minimums, open_at)
+            except ValueError as e:
+                return make_response(jsonify({'error': str(e)}), 400)
+            recommendations = model.reranked_recommendations(user_id, weights, top_n, place_mask)
         if recommendations is None:
-            return jsonify({'error': f'User {user_id} not found or no recommendations available'}), 404
-
-        # Replace NaN with None across the entire DataFrame
-        recommendations = recommendations.replace({pd.NA: None, np.nan: None})
-
-        # Convert DataFrame to JSON-compatible format
-        recommendations_dict = recommendations.to_dict(orient='records')
-        for rec in recommendations_dict:
-            rec['placeID'] = int(rec['placeID'])  # Convert placeID to int
-            rec['Recommendation Score'] = float(rec['Recommendation Score'])  # Ensure float for score
-            # Handle other fields to ensure JSON compatibility
-            for key in rec:
-                if isinstance(rec[key], (np.int64, np.int32)):
-                    rec[key] = int(rec[key])
-                elif isinstance(rec[key], (np.float64, np.float32)):
-                    rec[key] = float(rec[key])
+            return make_response(jsonify({'error': f'User {user_id} not found or no recommendations available'}), 404)
 
-        return jsonify({
+        response = {
             'user_id': user_id,
-            'recommendations': recommendations_dict,
-            'count': len(recommendations_dict)
-        })
+            'recommendations': recommendations,
+            'count': len(recommendations)
+        }
+        if ranking is not None:
+            response['bucket'], response['weights'] = ranking[0], ranking[1]
+        if open_at is not None:
+            response['open_at'] = open_at.isoformat()
+        return jsonify(response)
     except Exception as e:
-        print(f"Error in recommendations endpoint: {e}")
-        return jsonify({'error': str(e)}), 500
+        log_event(logging.ERROR, 'recommendations_endpoint_failed', user_id=user_id, error=str(e))
+        return make_response(jsonify({'error': str(e)}), 500)
     
+@app.route('/api/recommendations/batch', methods=['POST'])
+def get_batch_recommendations():
+    """Get hybrid recommendations for many users at once"""
+    model = ensure_model()
+    payload = request.get_json(silent=True)
+    user_ids = payload.get('user_ids') if isinstance(payload, dict) else None
+    if not isinstance(user_ids, list) or not all(isinstance(user_id, str) for user_id in user_ids):
+        return jsonify({'error': 'Expected a JSON object with a user_ids list of strings'}), 400
+    if len(user_ids) > config.RECOMMENDATIONS_BATCH_MAX:
+        return jsonify({'error': f'At most {config.RECOMMENDATIONS_BATCH_MAX} users per batch'}), 400
+    top_n = payload.get('top_n', 10)
+    if isinstance(top_n, bool) or not isinstance(top_n, int) or top_n < 0:
+        return jsonify({'error': 'top_n must be a non-negative integer'}), 400
+
+    results = model.batch_recommendations(list(dict.fromkeys(user_ids)), top_n)
+    return jsonify({
+        'top_n': top_n,
+        'results': {
+            user_id: {'recommendations': recommendations, 'count': len(recommendations)}
+            for user_id, recommendations in results.items()
+        },
+        'not_found': [user_id for user_id in dict.fromkeys(user_ids) if user_id not in results]
+    })
+
+@app.route('/api/recommendations/profile', methods=['POST'])
+def get_profile_recommendations():
+    """Get content-based recommendations for a new user from their stated preferences"""
+    model = ensure_model()
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    preferences = {}
+    for field in ('cuisines', 'payments'):
+        values = payload.get(field, [])
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            return jsonify({'error': f'{field} must be a list of strings'}), 400
+        preferences[field] = values
+    attributes = {}
+    for field in PROFILE_FEATURES:
+        value = payload.get(field)
+        if value is not None and not isinstance(value, str):
+            return jsonify({'error': f'{field} must be a string'}), 400
+        if value is not None:
+            attributes[field] = value
+    if not preferences['cuisines'] and not preferences['payments'] and not attributes:
+        return jsonify({'error': f'Give at least one of cuisines, payments, {", ".join(PROFILE_FEATURES)}'}), 400
+    top_n = payload.get('top_n', 10)
+    if isinstance(top_n, bool) or not isinstance(top_n, int) or top_n < 0:
+        return jsonify({'error': 'top_n must be a non-negative integer'}), 400
+
+    recommendations = model.profile_recommendations(preferences['cuisines'], preferences['payments'], attributes, top_n)
+    return jsonify({
+        'profile': dict(preferences, **attributes),
+        'recommendations': recommendations,
+        'count': len(recommendations)
+    })
+
 @app.route('/api/user/<user_id>')
 def get_user_profile(user_id):
     """Get user profile information"""
-    if not load_all_data():
-        return jsonify({'error': 'Failed to load data'}), 500
+    model = current_model()
 
-    user_info = cons_profile[cons_profile['userID'] == user_id]
-    if user_info.empty:
+    user = model.entity_store.user_detail(user_id)
+    if user is None:
         return jsonify({'error': 'User not found'}), 404
-
-    user = user_info.iloc[0]
-    user_cuisines = cons_cuisine[cons_cuisine['userID'] == user_id]['Rcuisine'].tolist()
-    user_payments = cons_pay[cons_pay['userID'] == user_id]['Upayment'].tolist()
-    user_ratings = rating[rating['userID'] == user_id]
-
-    return jsonify({
-        'userID': user_id,
-        'profile': {
-            'latitude': float(user['latitude']) if pd.notna(user['latitude']) else None,
-            'longitude': float(user['longitude']) if pd.notna(user['longitude']) else None,
-            'smoker': str(user['smoker']) if pd.notna(user['smoker']) else None,
-            'drink_level': str(user['drink_level']) if pd.notna(user['drink_level']) else None,
-            'dress_preference': str(user['dress_preference']) if pd.notna(user['dress_preference']) else None,
-            'ambience': str(user['ambience']) if pd.notna(user['ambience']) else None,
-            'transport': str(user['transport']) if pd.notna(user['transport']) else None,
-            'marital_status': str(user['marital_status']) if pd.notna(user['marital_status']) else None,
-            'hijos': str(user['hijos']) if pd.notna(user['hijos']) else None,
-            'birth_year': int(user['birth_year']) if pd.notna(user['birth_year']) else None,
-            'interest': str(user['interest']) if pd.notna(user['interest']) else None,
-            'personality': str(user['personality']) if pd.notna(user['personality']) else None,
-            'religion': str(user['religion']) if pd.notna(user['religion']) else None,
-            'activity': str(user['activity']) if pd.notna(user['activity']) else None,
-            'color': str(user['color']) if pd.notna(user['color']) else None,
-            'weight': float(user['weight']) if pd.notna(user['weight']) else None,
-            'budget': str(user['budget']) if pd.notna(user['budget']) else None,
-            'height': float(user['height']) if pd.notna(user['height']) else None
-        },
-        'cuisine_preferences': user_cuisines,
-        'payment_preferences': user_payments,
-        'total_ratings': int(len(user_ratings)),
-        'average_rating': round(float(user_ratings['rating'].mean()), 2) if len(user_ratings) > 0 else 0
-    })
+    return jsonify(user)
 
 @app.route('/api/restaurants')
 def get_restaurants():
-    """Get all restaurants with details"""
-    if not load_all_data():
-        return jsonify({'error': 'Failed to load data'}), 500
-
-    restaurants = []
-    for _, restaurant in rest_geo.iterrows():
-        place_id = restaurant['placeID']
-        cuisine_info = rest_cuisine[rest_cuisine['placeID'] == place_id]
-        cuisines = cuisine_info['Rcuisine'].tolist() if not cuisine_info.empty else []
-        payment_info = rest_pay[rest_pay['placeID'] == place_id]
-        payments = payment_info['Rpayment'].tolist() if not payment_info.empty else []
-        parking_info = rest_parking[rest_parking['placeID'] == place_id]
-        parking = parking_info['parking_lot'].tolist() if not parking_info.empty else []
-        restaurant_ratings = rating[rating['placeID'] == place_id]
-        avg_rating = round(float(restaurant_ratings['rating'].mean()), 2) if len(restaurant_ratings) > 0 else 0
-        rating_count = len(restaurant_ratings)
-
-        restaurants.append({
-            'placeID': int(place_id),
-            'name': str(restaurant['name']) if pd.notna(restaurant['name']) else 'N/A',
-            'address': str(restaurant['address']) if pd.notna(restaurant['address']) else 'N/A',
-            'city': str(restaurant['city']) if pd.notna(restaurant['city']) else 'N/A',
-            'state': str(restaurant['state']) if pd.notna(restaurant['state']) else 'N/A',
-            'country': str(restaurant['country']) if pd.notna(restaurant['country']) else 'N/A',
-            'latitude': float(restaurant['latitude']) if pd.notna(restaurant['latitude']) else None,
-            'longitude': float(restaurant['longitude']) if pd.notna(restaurant['longitude']) else None,
-            'price': str(restaurant['price']) if pd.notna(restaurant['price']) else 'N/A',
-            'alcohol': str(restaurant['alcohol']) if pd.notna(restaurant['alcohol']) else 'N/A',
-            'smoking_area': str(restaurant['smoking_area']) if pd.notna(restaurant['smoking_area']) else 'N/A',
-            'dress_code': str(restaurant['dress_code']) if pd.notna(restaurant['dress_code']) else 'N/A',
-            'accessibility': str(restaurant['accessibility']) if pd.notna(restaurant['accessibility']) else 'N/A',
-            'other_services': str(restaurant['other_services']) if pd.notna(restaurant['other_services']) else 'N/A',
-            'cuisines': cuisines,
-            'payments': payments,
-            'parking': parking,
-            'average_rating': avg_rating,
-            'rating_count': rating_count
-        })
-
-    return jsonify({'restaurants': restaurants})
+    """Get all restaurants with details, or one filtered and sorted page of them"""
+    model = current_model()
+    if wants_page(RESTAURANT_FILTERS + OPEN_PARAMS + SEARCH_PARAMS):
+        try:
+            open_at = requested_open_time()
+        except ValueError:
+            return jsonify({'error': 'open_at must be an ISO 8601 datetime'}), 400
+        positions = model.listing_positions(open_at, request.args.get('q', '').strip())
+        return listing_page(model.restaurant_listing, 'restaurants', RESTAURANT_FILTERS, positions)
+    return cached_json_response(model, 'restaurants')
+
+@app.route('/api/search')
+def search_restaurants():
+    """Search restaurants by name, address, city and cuisine, the last word matching as a prefix"""
+    model = current_model()
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    limit = request.args.get('limit', config.SEARCH_LIMIT_DEFAULT, type=int)
+    if limit < 1 or limit > config.SEARCH_LIMIT_MAX:
+        return jsonify({'error': f'limit must be an integer between 1 and {config.SEARCH_LIMIT_MAX}'}), 400
+
+    records, scores, total = model.search_index.search(query, limit)
+    results = [dict(record, score=round(score, 3)) for record, score in zip(records, scores)]
+    return jsonify({'query': query, 'results': results, 'count': len(results), 'total': total})
 
 @app.route('/api/restaurant/<int:place_id>')
 def get_restaurant_detail(place_id):
     """Get detailed information for a specific restaurant"""
-    if not load_all_data():
-        return jsonify({'error': 'Failed to load data'}), 500
+    model = current_model()
 
-    restaurant_info = rest_geo[rest_geo['placeID'] == place_id]
-    if restaurant_info.empty:
+    restaurant = model.entity_store.restaurant_detail(place_id)
+    if restaurant is None:
         return jsonify({'error': 'Restaurant not found'}), 404
-
-    restaurant = restaurant_info.iloc[0]
-    cuisine_info = rest_cuisine[rest_cuisine['placeID'] == place_id]
-    cuisines = cuisine_info['Rcuisine'].tolist() if not cuisine_info.empty else []
-    payment_info = rest_pay[rest_pay['placeID'] == place_id]
-    payments = payment_info['Rpayment'].tolist() if not payment_info.empty else []
-    parking_info = rest_parking[rest_parking['placeID'] == place_id]
-    parking = parking_info['parking_lot'].tolist() if not parking_info.empty else []
-    hours_info = rest_hours[rest_hours['placeID'] == place_id]
-    hours = [{'days': str(hour['days']) if pd.notna(hour['days']) else 'N/A',
-              'hours': str(hour['hours']) if pd.notna(hour['hours']) else 'N/A'}
-             for _, hour in hours_info.iterrows()]
-    restaurant_ratings = rating[rating['placeID'] == place_id]
-    reviews = [{'userID': str(review['userID']),
-                'rating': int(review['rating']),
-                'food_rating': int(review['food_rating']) if pd.notna(review['food_rating']) else None,
-                'service_rating': int(review['service_rating']) if pd.notna(review['service_rating']) else None}
-               for _, review in restaurant_ratings.iterrows()]
-    avg_rating = round(float(restaurant_ratings['rating'].mean()), 2) if len(restaurant_ratings) > 0 else 0
-
-    return jsonify({
-        'placeID': int(place_id),
-        'name': str(restaurant['name']) if pd.notna(restaurant['name']) else 'N/A',
-        'address': str(restaurant['address']) if pd.notna(restaurant['address']) else 'N/A',
-        'city': str(restaurant['city']) if pd.notna(restaurant['city']) else 'N/A',
-        'state': str(restaurant['state']) if pd.notna(restaurant['state']) else 'N/A',
-        'country': str(restaurant['country']) if pd.notna(restaurant['country']) else 'N/A',
-        'latitude': float(restaurant['latitude']) if pd.notna(restaurant['latitude']) else None,
-        'longitude': float(restaurant['longitude']) if pd.notna(restaurant['longitude']) else None,
-        'price': str(restaurant['price']) if pd.notna(restaurant['price']) else 'N/A',
-        'alcohol': str(restaurant['alcohol']) if pd.notna(restaurant['alcohol']) else 'N/A',
-        'smoking_area': str(restaurant['smoking_area']) if pd.notna(restaurant['smoking_area']) else 'N/A',
-        'dress_code': str(restaurant['dress_code']) if pd.notna(restaurant['dress_code']) else 'N/A',
-        'accessibility': str(restaurant['accessibility']) if pd.notna(restaurant['accessibility']) else 'N/A',
-        'other_services': str(restaurant['other_services']) if pd.notna(restaurant['other_services']) else 'N/A',
-        'cuisines': cuisines,
-        'payments': payments,
-        'parking': parking,
-        'hours': hours,
-        'average_rating': avg_rating,
-        'rating_count': len(restaurant_ratings),
-        'reviews': reviews
-    })
+    return jsonify(restaurant)
+
+@app.route('/api/restaurant/<int:place_id>/similar')
+def get_similar_restaurants(place_id):
+    """Get the restaurants most similar to a restaurant"""
+    model = current_model()
+    k = request.args.get('k', 10, type=int)
+    if k < 1 or k > config.SIMILAR_PLACES_K:
+        return jsonify({'error': f'k must be an integer between 1 and {config.SIMILAR_PLACES_K}'}), 400
+
+    similar = model.similar_restaurants(place_id, k)
+    if similar is None:
+        return jsonify({'error': 'Restaurant not found'}), 404
+    return jsonify({'placeID': place_id, 'similar': similar, 'count': len(similar)})
 
 @app.route('/api/stats')
 def get_stats():
     """Get overall statistics"""
-    if not load_all_data():
-        return jsonify({'error': 'Failed to load data'}), 500
-
-    total_users = len(cons_profile)
-    total_restaurants = len(rest_geo)
-    total_reviews = len(rating)
-    cuisine_counts = cons_cuisine['Rcuisine'].value_counts().to_dict()
-    payment_counts = cons_pay['Upayment'].value_counts().to_dict()
-    restaurant_cuisine_counts = rest_cuisine['Rcuisine'].value_counts().to_dict()
-
-    return jsonify({
-        'total_users': total_users,
-        'total_restaurants': total_restaurants,
-        'total_reviews': total_reviews,
-        'user_cuisine_preferences': cuisine_counts,
-        'user_payment_preferences': payment_counts,
-        'restaurant_cuisines': restaurant_cuisine_counts
-    })
+    model = current_model()
+    return cached_json_response(model, 'stats')
 
 @app.route('/api/users/all')
 def get_all_users():
-    """Get all users with basic information"""
-    if not load_all_data():
-        return jsonify({'error': 'Failed to load data'}), 500
-
-    users = []
-    for _, user in cons_profile.iterrows():
-        user_id = user['userID']
-        user_ratings = rating[rating['userID'] == user_id]
-        user_cuisines = cons_cuisine[cons_cuisine['userID'] == user_id]['Rcuisine'].tolist()
-
-        users.append({
-            'userID': str(user_id),
-            'latitude': float(user['latitude']) if pd.notna(user['latitude']) else None,
-            'longitude': float(user['longitude']) if pd.notna(user['longitude']) else None,
-            'smoker': str(user['smoker']) if pd.notna(user['smoker']) else None,
-            'drink_level': str(user['drink_level']) if pd.notna(user['drink_level']) else None,
-            'dress_preference': str(user['dress_preference']) if pd.notna(user['dress_preference']) else None,
-            'ambience': str(user['ambience']) if pd.notna(user['ambience']) else None,
-            'transport': str(user['transport']) if pd.notna(user['transport']) else None,
-            'marital_status': str(user['marital_status']) if pd.notna(user['marital_status']) else None,
-            'birth_year': int(user['birth_year']) if pd.notna(user['birth_year']) else None,
-            'budget': str(user['budget']) if pd.notna(user['budget']) else None,
-            'total_ratings': len(user_ratings),
-            'average_rating': round(float(user_ratings['rating'].mean()), 2) if len(user_ratings) > 0 else 0,
-            'cuisine_preferences': user_cuisines[:3]  # Show top 3 preferences
-        })
-
-    return jsonify({'users': users})
-
-@app.route('/api/evaluate')
-def evaluate_model():
-    """Evaluate the hybrid model with RMSE and Precision@K"""
-    if not load_all_data():
-        return jsonify({'error': 'Failed to load data'}), 500
+    """Get all users with basic information, or one filtered and sorted page of them"""
+    model = current_model()
+    if wants_page(USER_FILTERS):
+        return listing_page(model.user_listing, 'users', USER_FILTERS)
 
-    try:
-        # Split data into train and test (80-20)
-        np.random.seed(42)
-        test_indices = np.random.choice(rating.index, size=int(0.2 * len(rating)), replace=False)
-        test_set = rating.loc[test_indices]
-        train_set = rating.drop(test_indices)
-
-        # Recreate rating matrix for training
-        train_rating_matrix = train_set.pivot_table(
-            index='userID',
-            columns='placeID',
-            values='rating',
-            fill_value=0
-        )
-        train_user_similarity = cosine_similarity(train_rating_matrix)
-        train_user_similarity_df = pd.DataFrame(
-            train_user_similarity,
-            index=train_rating_matrix.index,
-            columns=train_rating_matrix.index
-        )
-        sim_sums = train_user_similarity_df.abs().sum(axis=1).replace(0, 1)
-        train_cf_scores = np.dot(train_user_similarity_df, train_rating_matrix) / sim_sums.values[:, np.newaxis]
-        train_cf_scores = pd.DataFrame(train_cf_scores, index=train_rating_matrix.index, columns=train_rating_matrix.columns)
-
-        # RMSE
-        predictions = []
-        true_ratings = []
-        for _, row in test_set.iterrows():
-            user_id, item_id, true_rating = row['userID'], row['placeID'], row['rating']
-            if user_id in hybrid_scores.index and item_id in hybrid_scores.columns:
-                pred_score = hybrid_scores.loc[user_id, item_id]
-                if isinstance(pred_score, (int, float)) and isinstance(true_rating, (int, float)):
-                    predictions.append(float(pred_score))
-                    true_ratings.append(float(true_rating))
-
-        rmse = np.sqrt(mean_squared_error(true_ratings, predictions)) if predictions else 0
-
-        # Precision@K
-        K = 10
-        precision_sum = 0
-        user_count = 0
-        list_users = rating['userID'].unique()
-        for user_id in list_users:
-            if user_id in hybrid_scores.index:
-                user_recs = hybrid_scores.loc[user_id].sort_values(ascending=False).head(K).index
-                relevant_items = rating[(rating['userID'] == user_id) & (rating['rating'] > 1)]['placeID']
-                hits = len(set(user_recs).intersection(set(relevant_items)))
-                precision_sum += hits / K
-                user_count += 1
-
-        precision_at_k = precision_sum / user_count if user_count > 0 else 0
+    return cached_json_response(model, 'users')
 
-        return jsonify({
-            'rmse': round(rmse, 4) if rmse else 'N/A',
-            'precision_at_10': round(precision_at_k, 4) if user_count > 0 else 'N/A'
-        })
+def positive_int_param(params, name):
+    """Optional positive integer of request parameters or a JSON body, or None; raises ValueError naming it"""
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f'{name} must be a positive integer')
+    return value
+
+def evaluation_response(job):
+    """Job status with 202 while it runs, or the finished job with its result"""
+    job = dict(job, status_url=f"/api/evaluate/{job['job_id']}")
+    return jsonify(job), 200 if job['status'] in ('done', 'failed') else 202
+
+@app.route('/api/evaluate', methods=['GET', 'POST'])
+def evaluate_model():
+    """Start a k-fold evaluation job (RMSE, precision, recall and NDCG@K per CF backend), or reuse an identical one"""
+    model = current_model()
+    params = request.get_json(silent=True) if request.method == 'POST' else None
+    params = params if isinstance(params, dict) else request.args
 
+    try:
+        folds, k, workers = (positive_int_param(params, name) for name in ('folds', 'k', 'workers'))
+        backends = params.get('backends') or None
+        if isinstance(backends, str):
+            backends = [backend.strip() for backend in backends.split(',') if backend.strip()]
+        if backends is not None and not (
+            isinstance(backends, list) and all(isinstance(backend, str) for backend in backends)
+        ):
+            raise ValueError('backends must be a list or comma-separated string of CF backends')
+        job = start_evaluation(model, folds=folds, k=k, backends=backends, workers=workers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return evaluation_response(job)
+
+@app.route('/api/evaluate/<job_id>')
+def get_evaluation(job_id):
+    """Status and, once finished, result of an evaluation job"""
+    job = evaluation_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Evaluation job not found'}), 404
+    return evaluation_response(job)
+
+def parse_rating(model, payload):
+    """Validate one posted rating and return it as a rating table row; raises ValueError"""
+    if not isinstance(payload, dict):
+        raise ValueError('A rating must be a JSON object')
+    user_id = payload.get('userID')
+    if not isinstance(user_id, str) or not user_id.strip():
+        raise ValueError('userID must be a non-empty string')
+    try:
+        place_id = int(payload.get('placeID'))
+    except (TypeError, ValueError):
+        raise ValueError('placeID must be an integer')
+    if place_id not in model.restaurant_records:
+        raise ValueError(f'Restaurant {place_id} not found')
+
+    row = {'userID': user_id.strip(), 'placeID': place_id}
+    for column in ('rating', 'food_rating', 'service_rating'):
+        value = payload.get(column)
+        if value is None and column != 'rating':
+            row[column] = None
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 2:
+            raise ValueError(f'{column} must be an integer between 0 and 2')
+        row[column] = value
+    return row
+
+def ingest_response(ratings):
+    """Apply validated ratings to the model and report what was rescored"""
+    try:
+        summary = ingest_ratings(ratings)
     except Exception as e:
+        log_event(logging.ERROR, 'ratings_ingest_failed', ratings=len(ratings), error=str(e))
         return jsonify({'error': str(e)}), 500
+    log_event(logging.INFO, 'ratings_ingested', **summary)
+    return jsonify(summary)
+
+@app.route('/api/ratings', methods=['POST'])
+def post_rating():
+    """Add or replace one rating and update the recommendations without a full rebuild"""
+    model = current_model()
+    try:
+        rating = parse_rating(model, request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return ingest_response([rating])
+
+@app.route('/api/ratings/batch', methods=['POST'])
+def post_ratings_batch():
+    """Add or replace a batch of ratings and update the recommendations once"""
+    model = current_model()
+    payload = request.get_json(silent=True)
+    items = payload.get('ratings') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a JSON object with a non-empty ratings list'}), 400
+    if len(items) > config.RATINGS_BATCH_MAX:
+        return jsonify({'error': f'At most {config.RATINGS_BATCH_MAX} ratings per batch'}), 400
+
+    ratings = []
+    for position, item in enumerate(items):
+        try:
+            ratings.append(parse_rating(model, item))
+        except ValueError as e:
+            return jsonify({'error': f'ratings[{position}]: {e}'}), 400
+    return ingest_response(ratings)
+
+@app.route('/api/ready')
+def get_ready():
+    """Report whether the recommendation model is building or ready to serve"""
+    status = build_status()
+    return jsonify(status), 200 if status['status'] == 'ready' else 503
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Report cache counters"""
+    stats = cache_stats()
+    response = {'recommendation_cache': stats['recommendations'], 'payload_cache': stats['payloads']}
+    if 'entities' in stats:
+        response['entity_cache'] = stats['entities']
+    return jsonify(response)
+
+@app.route('/metrics')
+def get_prometheus_metrics():
+    """Request latency histograms, build stage timings, memory footprints and cache counters of this process"""
+    return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/profiles')
+def get_profiles():
+    """Sampled stacks of the slowest requests, slowest first"""
+    if profiler is None:
+        return jsonify({'error': 'The profiler is disabled; set PROFILE_SLOW_REQUESTS to enable it'}), 404
+    return jsonify({'profiles': profiler.profiles()})
+
+def create_app(preload=False):
+    """The WSGI application, with the model loaded before returning (preload) or building in the background"""
+    if preload:
+        ensure_model()
+    else:
+        start_background_build()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Development server only; serve production traffic with `python server.py` (or any WSGI server on wsgi:app).
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests.
+    debug = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        create_app()
+    app.run(debug=debug, port=config.SERVER_PORT)
@@ -0,0 +1,140 @@
+"""
+Static frontend and precompressed response bodies
+
+The pages, scripts, stylesheets and images of the frontend are read once at startup.
+Scripts, stylesheets and images are served under URLs holding a hash of their content
+(/static/styles.1a2b3c4d5e.css) and the pages and stylesheets are rewritten to use them,
+so browsers may keep them for a year: a changed file is a new URL. Text files are
+compressed once, with gzip and with brotli when it is installed, and a request gets the
+best variant its Accept-Encoding allows, as is.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Mimetypes of the frontend files, by extension (text types are sent as UTF-8)
+ASSET_TYPES = {
+    '.html': 'text/html',
+    '.css': 'text/css',
+    '.js': 'text/javascript',
+    '.svg': 'image/svg+xml',
+    '.ico': 'image/x-icon',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp'
+}
+
+# Extensions of the files worth compressing (images are compressed already)
+COMPRESSIBLE = ('.html', '.css', '.js', '.svg')
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+# gzip level and brotli quality of API payloads, compressed on the first request of a model version
+PAYLOAD_GZIP_LEVEL = 6
+PAYLOAD_BROTLI_QUALITY = 5
+
+# Content encodings in order of preference
+ENCODINGS = ('br', 'gzip')
+
+# URL prefix of the content-hashed files
+STATIC_PREFIX = '/static/'
+
+# Cache-Control of content-hashed files and of everything else (revalidated with the ETag)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def extension_of(path):
+    """Lowercase extension of a file path, with its dot"""
+    return os.path.splitext(path)[1].lower()
+
+
+def compress(body, gzip_level=9, brotli_quality=11):
+    """Compressed variants of a body, encoding -> bytes, keeping only those smaller than the body"""
+    if len(body) < MIN_COMPRESS_BYTES:
+        return {}
+    variants = {'gzip': gzip.compress(body, compresslevel=gzip_level, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=brotli_quality)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def preferred_encoding(variants, accept_encodings):
+    """Encoding of the variant to send for a request's Accept-Encoding, or None for the plain body"""
+    for encoding in ENCODINGS:
+        if encoding in variants and accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+class Asset:
+    """One frontend file: its body, compressed variants, mimetype and ETag"""
+
+    def __init__(self, body, mimetype, compressible):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.variants = compress(body) if compressible else {}
+
+
+class StaticAssets:
+    """The frontend files of a directory, by page name (index.html) or content-hashed name
+
+    Only the files directly in the directory and in the subdirectories listed in
+    directories are served, so the Python sources and data files never are.
+    """
+
+    def __init__(self, root, directories=('images',)):
+        paths = [name for name in sorted(os.listdir(root)) if os.path.isfile(os.path.join(root, name))]
+        for directory in directories:
+            if os.path.isdir(os.path.join(root, directory)):
+                paths += [f'{directory}/{name}' for name in sorted(os.listdir(os.path.join(root, directory)))]
+        # Images first, then the stylesheets referencing them, then scripts and the pages
+        rank = {'.css': 1, '.js': 2, '.html': 3}
+        paths = [path for path in paths if extension_of(path) in ASSET_TYPES]
+        paths.sort(key=lambda path: rank.get(extension_of(path), 0))
+
+        self.pages = {}
+        self.files = {}
+        self.urls = {}
+        for path in paths:
+            with open(os.path.join(root, path), 'rb') as f:
+                body = f.read()
+            extension = extension_of(path)
+            if extension in ('.css', '.html'):
+                body = self._rewrite(body)
+            asset = Asset(body, ASSET_TYPES[extension], extension in COMPRESSIBLE)
+            if extension == '.html':
+                self.pages[path] = asset
+            else:
+                stem = path[:-len(extension)]
+                hashed = f'{stem}.{asset.etag[:10]}{extension}'
+                self.files[hashed] = asset
+                self.urls[path] = hashed
+
+    def _rewrite(self, body):
+        """Replace the quoted or url() references to the hashed files with their /static/ URLs"""
+        if not self.urls:
+            return body
+        names = '|'.join(re.escape(path) for path in sorted(self.urls, key=len, reverse=True))
+        pattern = rf'(?<=["\'(])({names})(?=["\')?#])'
+        text = re.sub(pattern, lambda match: STATIC_PREFIX + self.urls[match.group(1)], body.decode('utf-8'))
+        return text.encode('utf-8')
+
+    def page(self, name):
+        """Asset of a page such as index.html, or None"""
+        return self.pages.get(name)
+
+    def file(self, hashed_name):
+        """Asset of a content-hashed file such as styles.1a2b3c4d5e.css, or None"""
+        return self.files.get(hashed_name)
@@ -0,0 +1,84 @@
+"""
+Per-request latency of /api/recommendations: full-row sort (before) vs top-N index (after)
+
+Run from the project root:
+    python -m benchmarks.bench_recommendations --repeat 20 --top-n 10
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from model import ensure_model  # noqa: E402
+
+
+def legacy_recommendations(rest_geo, hybrid_scores, user_id, top_n):
+    """Previous implementation: sort the user's full score row, then scan rest_geo with isin"""
+    recommendations = hybrid_scores.loc[user_id].sort_values(ascending=False).head(top_n)
+    result = rest_geo[rest_geo['placeID'].isin(recommendations.index)].drop_duplicates(subset=['placeID']).copy()
+    result['Recommendation Score'] = result['placeID'].map(recommendations).fillna(0).astype(float).round(2)
+    result = result.replace({pd.NA: None, np.nan: None})
+    records = result.to_dict(orient='records')
+    for rec in records:
+        for key in rec:
+            if isinstance(rec[key], (np.int64, np.int32)):
+                rec[key] = int(rec[key])
+            elif isinstance(rec[key], (np.float64, np.float32)):
+                rec[key] = float(rec[key])
+    return records
+
+
+def time_calls(func, user_ids, repeat):
+    """Latency of func(user_id) in microseconds for every call"""
+    timings = []
+    for _ in range(repeat):
+        for user_id in user_ids:
+            start = time.perf_counter()
+            func(user_id)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return np.array(timings)
+
+
+def summarize(name, timings):
+    """One result line: mean, p50 and p99 latency"""
+    return (f'{name:<10} mean {timings.mean():10.1f} us   p50 {np.percentile(timings, 50):10.1f} us   '
+            f'p99 {np.percentile(timings, 99):10.1f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='passes over all users')
+    parser.add_argument('--top-n', type=int, default=10, help='recommendations per request')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = ensure_model()
+    user_ids = list(model.cf_engine.user_ids)
+
+    # The dense hybrid matrix the previous implementation kept in memory
+    hybrid_scores = pd.DataFrame(
+        model.hybrid_scores_rows(np.arange(len(user_ids))),
+        index=model.cf_engine.user_ids, columns=model.cf_engine.place_ids
+    )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = time_calls(lambda user_id: legacy_recommendations(model.rest_geo, hybrid_scores, user_id, args.top_n), user_ids, args.repeat)
+        after = time_calls(lambda user_id: app.get_user_recommendations(user_id, args.top_n), user_ids, args.repeat)
+
+    print(f'{len(user_ids)} users x {len(model.cf_engine.place_ids)} places, top_n={args.top_n}, {len(before)} requests each')
+    print(summarize('before', before))
+    print(summarize('after', after))
+    print(f'speedup    {before.mean() / after.mean():.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Build time of the /api/restaurants payload: per-row boolean scans (before) vs groupby aggregates (after)
+
+The bundled restaurants are replicated with fresh placeIDs to reach each synthetic size.
+The previous implementation is quadratic, so it is only timed up to --legacy-max rows.
+
+Run from the project root:
+    python -m benchmarks.bench_restaurants --sizes 1000 10000 100000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import build_restaurant_list  # noqa: E402
+from model import load_dataset  # noqa: E402
+
+
+def legacy_restaurant_list(rest_geo, rest_cuisine, rest_pay, rest_parking, rating):
+    """Previous implementation: iterrows with four full-table filters per restaurant"""
+    restaurants = []
+    for _, restaurant in rest_geo.iterrows():
+        place_id = restaurant['placeID']
+        cuisine_info = rest_cuisine[rest_cuisine['placeID'] == place_id]
+        cuisines = cuisine_info['Rcuisine'].tolist() if not cuisine_info.empty else []
+        payment_info = rest_pay[rest_pay['placeID'] == place_id]
+        payments = payment_info['Rpayment'].tolist() if not payment_info.empty else []
+        parking_info = rest_parking[rest_parking['placeID'] == place_id]
+        parking = parking_info['parking_lot'].tolist() if not parking_info.empty else []
+        restaurant_ratings = rating[rating['placeID'] == place_id]
+        avg_rating = round(float(restaurant_ratings['rating'].mean()), 2) if len(restaurant_ratings) > 0 else 0
+        record = {'placeID': int(place_id), 'cuisines': cuisines, 'payments': payments, 'parking': parking,
+                  'average_rating': avg_rating, 'rating_count': len(restaurant_ratings)}
+        for column in ['name', 'address', 'city', 'state', 'country', 'price', 'alcohol',
+                       'smoking_area', 'dress_code', 'accessibility', 'other_services']:
+            record[column] = str(restaurant[column]) if pd.notna(restaurant[column]) else 'N/A'
+        for column in ['latitude', 'longitude']:
+            record[column] = float(restaurant[column]) if pd.notna(restaurant[column]) else None
+        restaurants.append(record)
+    return restaurants
+
+
+def scale_tables(tables, size):
+    """Replicate every placeID-keyed table so that the restaurant table has `size` rows"""
+    base_ids = tables['rest_geo']['placeID'].unique()
+    copies = -(-size // len(base_ids))
+    offset = int(base_ids.max()) + 1
+    scaled = {}
+    for name, df in tables.items():
+        parts = []
+        for copy in range(copies):
+            part = df.copy()
+            part['placeID'] = part['placeID'] + copy * offset
+            parts.append(part)
+        scaled[name] = pd.concat(parts, ignore_index=True)
+    keep = set(scaled['rest_geo']['placeID'].head(size))
+    return {name: df[df['placeID'].isin(keep)] for name, df in scaled.items()}
+
+
+def time_once(func, tables):
+    """Wall time of one payload build, in seconds"""
+    start = time.perf_counter()
+    func(tables['rest_geo'], tables['rest_cuisine'], tables['rest_pay'], tables['rest_parking'], tables['rating'])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='synthetic restaurant counts')
+    parser.add_argument('--legacy-max', type=int, default=5000, help='largest size the previous implementation is timed at')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tables = {
+            'rest_geo': load_dataset('geoplaces2.csv'),
+            'rest_cuisine': load_dataset('chefmozcuisine.csv'),
+            'rest_pay': load_dataset('chefmozaccepts.csv'),
+            'rest_parking': load_dataset('chefmozparking.csv'),
+            'rating': load_dataset('rating_final.csv')
+        }
+
+    print(f'{"restaurants":>12} {"before (s)":>12} {"after (s)":>12} {"speedup":>9}')
+    for size in args.sizes:
+        scaled = scale_tables(tables, size)
+        after = time_once(build_restaurant_list, scaled)
+        if size <= args.legacy_max:
+            before = time_once(legacy_restaurant_list, scaled)
+            print(f'{size:>12} {before:>12.3f} {after:>12.3f} {before / after:>8.1f}x')
+        else:
+            print(f'{size:>12} {"skipped":>12} {after:>12.3f} {"":>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark suite: model build time, peak RSS and per-endpoint latency at several synthetic scales
+
+Each scale is generated once into --data-root (see benchmarks.synthetic) and measured in
+a fresh process, so the peak RSS of one scale does not leak into the next. Results are
+written as JSON so runs can be compared between commits.
+
+Run from the project root:
+    python -m benchmarks.bench_suite --users 1000 10000 100000 --output results.json
+    python -m benchmarks.bench_suite --compare before.json after.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import ENDPOINTS  # noqa: E402
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(requests, seed):
+    """Build the model from DATA_DIR and time every endpoint through the Flask test client"""
+    import app
+    import model as model_lifecycle
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = model_lifecycle.rebuild_model()
+    if model is None:
+        raise RuntimeError(model_lifecycle.build_status().get('last_error', 'model build failed'))
+    build_rss = peak_rss_bytes()
+
+    rng = random.Random(seed)
+    user_ids = rng.sample(list(model.cf_engine.user_ids), min(100, model.cf_engine.n_users))
+    place_ids = rng.sample(list(model.restaurant_records), min(100, len(model.restaurant_records)))
+    client = app.app.test_client()
+    endpoints = {}
+    for name, template in ENDPOINTS.items():
+        timings = []
+        for number in range(requests):
+            path = template.format(user_id=user_ids[number % len(user_ids)], place_id=place_ids[number % len(place_ids)])
+            start = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - start)
+            if response.status_code >= 500:
+                raise RuntimeError(f'{path} answered {response.status_code}')
+        timings = np.array(timings) * 1000
+        endpoints[name] = {
+            'mean_ms': round(float(timings.mean()), 3),
+            'p50_ms': round(float(np.percentile(timings, 50)), 3),
+            'p99_ms': round(float(np.percentile(timings, 99)), 3)
+        }
+
+    return {
+        'users': int(model.cf_engine.n_users),
+        'restaurants': len(model.restaurant_records),
+        'ratings': int(len(model.rating)),
+        'build_seconds': round(model.build_seconds, 3),
+        'build_stages': {stage: round(seconds, 4) for stage, seconds in model.build_stages.items()},
+        'build_peak_rss_bytes': build_rss,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'endpoints': endpoints
+    }
+
+
+def run_scale(users, restaurants, args):
+    """Generate (or reuse) one scale's data and measure it in a child process"""
+    data_dir = os.path.join(args.data_root, f'users-{users}-restaurants-{restaurants or "auto"}-seed-{args.seed}')
+    if not os.path.exists(os.path.join(data_dir, 'rating_final.csv')):
+        command = [sys.executable, '-m', 'benchmarks.synthetic', '--users', str(users), '--seed', str(args.seed), '--output', data_dir]
+        if restaurants:
+            command += ['--restaurants', str(restaurants)]
+        subprocess.run(command, cwd=ROOT, check=True)
+
+    # Measure the engines rather than the caches in front of them
+    env = dict(os.environ, DATA_DIR=data_dir, SNAPSHOT_ENABLED='0', PERSIST_RATINGS='0', RESPONSE_CACHE_SIZE='0')
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_suite', '--measure', '--requests', str(args.requests), '--seed', str(args.seed)],
+        cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE, text=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    """Print the build time, peak RSS and endpoint p50/p99 of two result files side by side"""
+    with open(before_path) as file:
+        before = {run['users']: run for run in json.load(file)['runs']}
+    with open(after_path) as file:
+        after = {run['users']: run for run in json.load(file)['runs']}
+    for users in sorted(set(before) & set(after)):
+        old, new = before[users], after[users]
+        print(f'\n{users} users')
+        print(f'  {"build_seconds":<28} {old["build_seconds"]:>10.3f} {new["build_seconds"]:>10.3f} {new["build_seconds"] / old["build_seconds"]:>7.2f}x')
+        old_mb, new_mb = old['peak_rss_bytes'] / 2 ** 20, new['peak_rss_bytes'] / 2 ** 20
+        print(f'  {"peak_rss_mb":<28} {old_mb:>10.1f} {new_mb:>10.1f} {new_mb / old_mb:>7.2f}x')
+        for name in sorted(set(old['endpoints']) & set(new['endpoints'])):
+            for stat in ('p50_ms', 'p99_ms'):
+                a, b = old['endpoints'][name][stat], new['endpoints'][name][stat]
+                print(f'  {name + " " + stat:<28} {a:>10.3f} {b:>10.3f} {b / a if a else float("nan"):>7.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000], help='synthetic user counts')
+    parser.add_argument('--restaurants', type=int, help='synthetic restaurant count (default: grows with sqrt(users))')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--seed', type=int, default=42, help='random seed of the data and the requests')
+    parser.add_argument('--data-root', default=os.path.join(ROOT, 'benchmarks', 'data'), help='where generated datasets are kept')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files instead of running')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.requests, args.seed)))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    runs = []
+    for users in args.users:
+        run = run_scale(users, args.restaurants, args)
+        runs.append(run)
+        print(f'{run["users"]:>9} users {run["restaurants"]:>7} restaurants {run["ratings"]:>10} ratings: '
+              f'build {run["build_seconds"]:.2f}s, peak RSS {run["peak_rss_bytes"] / 2 ** 20:.0f} MB, '
+              f'recommendations p99 {run["endpoints"]["recommendations"]["p99_ms"]:.2f} ms')
+
+    results = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'requests': args.requests,
+        'seed': args.seed,
+        'runs': runs
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Results written to {args.output}')
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Load test of a running server: requests per second and latency percentiles per endpoint
+
+Start the server first (e.g. `python server.py --workers 4`), then from the project root:
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --concurrency 16 --duration 10
+
+Every endpoint is hit by --concurrency client threads for --duration seconds, each
+thread on its own keep-alive connection. User and restaurant IDs are sampled from the
+server's own /api/users and /api/restaurants listings.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+# Endpoint name -> path template; {user_id} and {place_id} are filled per request
+ENDPOINTS = {
+    'ready': '/api/ready',
+    'users': '/api/users',
+    'users_all': '/api/users/all',
+    'restaurants': '/api/restaurants',
+    'restaurants_page': '/api/restaurants?limit=20&sort=-rating',
+    'restaurant': '/api/restaurant/{place_id}',
+    'user': '/api/user/{user_id}',
+    'recommendations': '/api/recommendations/{user_id}',
+    'recommendations_near': '/api/recommendations/{user_id}?near=1&radius_km=10',
+    'stats': '/api/stats'
+}
+
+
+def fetch_json(url, path):
+    """GET a JSON document from the server"""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def run_client(url, paths, deadline, latencies, errors, seed):
+    """One client thread: request random paths on a keep-alive connection until the deadline"""
+    parts = urlsplit(url)
+    rng = random.Random(seed)
+    connection = None
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        if connection is None:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            connection.close()
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if response.status >= 500:
+            errors.append(path)
+        if response.will_close:
+            connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+
+
+def load_test(url, paths, concurrency, duration):
+    """(requests per second, latencies in seconds, error count) of one endpoint"""
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(target=run_client, args=(url, paths, deadline, latencies, errors, seed))
+        for seed in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.array(latencies), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server base URL')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads per endpoint')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per endpoint')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=list(ENDPOINTS),
+                        help='endpoints to test (default: all)')
+    parser.add_argument('--sample', type=int, default=100, help='distinct user and restaurant IDs to request')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    user_ids = fetch_json(args.url, '/api/users')['users']
+    place_ids = [record['placeID'] for record in fetch_json(args.url, '/api/restaurants?limit=500')['restaurants']]
+    user_ids = rng.sample(user_ids, min(args.sample, len(user_ids)))
+    place_ids = rng.sample(place_ids, min(args.sample, len(place_ids)))
+
+    print(f'{args.url}: {args.concurrency} clients, {args.duration:g}s per endpoint')
+    print(f'{"endpoint":<22} {"req/s":>10} {"p50 ms":>10} {"p99 ms":>10} {"errors":>8}')
+    for name in args.endpoints:
+        template = ENDPOINTS[name]
+        paths = sorted({template.format(user_id=user_id, place_id=place_id)
+                        for user_id, place_id in zip(user_ids, place_ids)})
+        rate, latencies, errors = load_test(args.url, paths, args.concurrency, args.duration)
+        p50, p99 = (np.percentile(latencies, [50, 99]) * 1000) if len(latencies) else (float('nan'), float('nan'))
+        print(f'{name:<22} {rate:>10.1f} {p50:>10.2f} {p99:>10.2f} {errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
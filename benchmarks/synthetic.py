@@ -0,0 +1,120 @@
+"""
+Synthetic scale-up of the bundled chefmoz and user datasets
+
+Every synthetic restaurant and user copies the attributes of a randomly drawn real one
+(its template), together with the template's cuisines, payments, parking and opening
+hours, with fresh IDs and jittered coordinates, so the joint attribute and cuisine
+distributions match the bundled data. Ratings keep the bundled sparsity: the number of
+ratings per user is drawn from the real per-user counts, places are drawn with the
+popularity of their template, and rating triples are drawn from the real ones.
+
+Run from the project root:
+    python -m benchmarks.synthetic --users 100000 --output benchmarks/data/users-100000
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from model import DATASETS  # noqa: E402
+
+
+def default_restaurants(users):
+    """Restaurant count for a user count: the bundled ratio, growing with the square root of the users"""
+    return max(130, int(round(130 * np.sqrt(users / 138))))
+
+
+def read_tables(data_dir):
+    """The nine bundled CSV files as DataFrames keyed by model attribute"""
+    return {name: pd.read_csv(os.path.join(data_dir, file_name)) for name, file_name in DATASETS.items()}
+
+
+def _copy_children(table, key, template_ids, new_ids):
+    """Rows of a child table copied from each template ID to its new ID"""
+    mapping = pd.DataFrame({key: template_ids, '_new': new_ids})
+    copied = mapping.merge(table, on=key, how='inner').drop(columns=key).rename(columns={'_new': key})
+    return copied[table.columns]
+
+
+def generate(tables, users, restaurants=None, seed=42):
+    """Synthetic versions of the nine tables with `users` users and `restaurants` restaurants"""
+    rng = np.random.default_rng(seed)
+    restaurants = restaurants or default_restaurants(users)
+    geo, profile, rating = tables['rest_geo'], tables['cons_profile'], tables['rating']
+
+    # Restaurants: template rows with new placeIDs, names and jittered coordinates
+    place_templates = geo['placeID'].to_numpy()[rng.integers(0, len(geo), restaurants)]
+    place_ids = np.arange(1, restaurants + 1) + 200000
+    rest_geo = geo.set_index('placeID').loc[place_templates].reset_index()
+    rest_geo['placeID'] = place_ids
+    rest_geo['name'] = rest_geo['name'].astype(str) + ' #' + pd.Series(np.arange(restaurants)).astype(str)
+    rest_geo['latitude'] = (rest_geo['latitude'] + rng.normal(scale=0.02, size=restaurants)).round(6)
+    rest_geo['longitude'] = (rest_geo['longitude'] + rng.normal(scale=0.02, size=restaurants)).round(6)
+
+    # Users: template profiles with new userIDs and jittered coordinates
+    user_templates = profile['userID'].to_numpy()[rng.integers(0, len(profile), users)]
+    user_ids = np.array([f'S{number:07d}' for number in range(1, users + 1)], dtype=object)
+    cons_profile = profile.set_index('userID').loc[user_templates].reset_index()
+    cons_profile['userID'] = user_ids
+    cons_profile['latitude'] = (cons_profile['latitude'] + rng.normal(scale=0.02, size=users)).round(6)
+    cons_profile['longitude'] = (cons_profile['longitude'] + rng.normal(scale=0.02, size=users)).round(6)
+
+    synthetic = {
+        'rest_geo': rest_geo[geo.columns],
+        'rest_cuisine': _copy_children(tables['rest_cuisine'], 'placeID', place_templates, place_ids),
+        'rest_pay': _copy_children(tables['rest_pay'], 'placeID', place_templates, place_ids),
+        'rest_parking': _copy_children(tables['rest_parking'], 'placeID', place_templates, place_ids),
+        'rest_hours': _copy_children(tables['rest_hours'], 'placeID', place_templates, place_ids),
+        'cons_profile': cons_profile[profile.columns],
+        'cons_cuisine': _copy_children(tables['cons_cuisine'], 'userID', user_templates, user_ids),
+        'cons_pay': _copy_children(tables['cons_pay'], 'userID', user_templates, user_ids)
+    }
+
+    # Ratings: real per-user counts, places drawn by template popularity, duplicates dropped
+    counts = rating.groupby('userID').size().to_numpy()
+    per_user = np.minimum(counts[rng.integers(0, len(counts), users)], restaurants)
+    popularity = rating['placeID'].value_counts().reindex(place_templates, fill_value=0).to_numpy() + 1.0
+    raters = np.repeat(np.arange(users), per_user)
+    places = rng.choice(restaurants, size=len(raters), p=popularity / popularity.sum())
+    pairs = pd.DataFrame({'user': raters, 'place': places}).drop_duplicates()
+    triples = rating[['rating', 'food_rating', 'service_rating']].to_numpy()[rng.integers(0, len(rating), len(pairs))]
+    synthetic['rating'] = pd.DataFrame({
+        'userID': user_ids[pairs['user'].to_numpy()],
+        'placeID': place_ids[pairs['place'].to_numpy()],
+        'rating': triples[:, 0],
+        'food_rating': triples[:, 1],
+        'service_rating': triples[:, 2]
+    })
+    return synthetic
+
+
+def write_tables(tables, output_dir):
+    """Write the tables as the bundled CSV file names"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, file_name in DATASETS.items():
+        tables[name].to_csv(os.path.join(output_dir, file_name), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic chefmoz/user datasets at a given scale')
+    parser.add_argument('--users', type=int, required=True, help='number of users')
+    parser.add_argument('--restaurants', type=int, help='number of restaurants (default: grows with sqrt(users))')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    parser.add_argument('--source', default=config.DATA_DIR, help='bundled CSV directory (default: %(default)s)')
+    parser.add_argument('--output', required=True, help='directory the CSV files are written to')
+    args = parser.parse_args()
+
+    tables = generate(read_tables(args.source), args.users, args.restaurants, args.seed)
+    write_tables(tables, args.output)
+    print(f'{len(tables["cons_profile"])} users, {len(tables["rest_geo"])} restaurants and '
+          f'{len(tables["rating"])} ratings written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
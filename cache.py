@@ -0,0 +1,134 @@
+"""
+In-process caches for the Restaurant Recommendation System
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe bounded least-recently-used cache with hit and miss counters"""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Cached value for key, or default; counts a hit or a miss"""
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries beyond max_size"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def without(self, keys):
+        """New cache with the same size and counters, holding every entry but the given keys"""
+        cache = LRUCache(self.max_size)
+        keys = set(keys)
+        with self._lock:
+            cache.hits, cache.misses, cache.evictions = self.hits, self.misses, self.evictions
+            cache._items = OrderedDict((key, value) for key, value in self._items.items() if key not in keys)
+        return cache
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        """Size and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._items), 'max_size': self.max_size,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions
+            }
+
+
+class ResponseCache(LRUCache):
+    """LRU cache of serialized responses that expire after ttl_seconds (None: never) and belong to one model version
+
+    The first lookup or store made against a newer model version drops every entry of
+    the old one, so a rebuild or an ingested rating never serves stale responses.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=300):
+        super().__init__(max_size)
+        self.ttl_seconds = ttl_seconds
+        self.version = None
+        self.invalidations = 0
+
+    def _switch_version(self, version):
+        """Drop every entry when the model version changes (caller holds the lock)"""
+        if version != self.version:
+            if self._items:
+                self.invalidations += 1
+            self._items.clear()
+            self.version = version
+
+    def get(self, version, key, default=None):
+        """Cached body for a key under a model version, or default; counts a hit or a miss"""
+        if self.max_size <= 0:
+            return default
+        with self._lock:
+            self._switch_version(version)
+            entry = self._items.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._items[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, version, key, body):
+        """Store a body for a key under a model version"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            # A response computed on a model that has since been replaced is not worth keeping
+            if self.version is not None and version < self.version:
+                return
+            self._switch_version(version)
+            expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+            self._items[key] = (expires, body)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Size, hit/miss counters and the model version of the entries"""
+        stats = super().stats()
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else None,
+            'ttl_seconds': self.ttl_seconds,
+            'model_version': self.version,
+            'invalidations': self.invalidations
+        })
+        return stats
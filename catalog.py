@@ -0,0 +1,375 @@
+"""
+Catalogue payloads for the Restaurant Recommendation System
+
+The listing endpoints are built from per-placeID groupby aggregates joined to the
+restaurant table in one pass, instead of filtering every table once per row. Paged,
+filtered and sorted listings are answered from inverted indexes and precomputed sort
+orders, so a page costs about the page size (or the size of the matching posting
+lists) instead of the table size.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+# User profile columns returned as strings, with None for missing values
+USER_TEXT_COLUMNS = [
+    'smoker', 'drink_level', 'dress_preference', 'ambience', 'transport', 'marital_status', 'budget'
+]
+
+# Restaurant columns returned as strings, with 'N/A' for missing values
+RESTAURANT_TEXT_COLUMNS = [
+    'name', 'address', 'city', 'state', 'country', 'price', 'alcohol',
+    'smoking_area', 'dress_code', 'accessibility', 'other_services'
+]
+
+
+def _text_column(series, missing):
+    """Column values as str, with a placeholder for missing values"""
+    missing_mask = series.isna().tolist()
+    return [missing if is_missing else str(value) for value, is_missing in zip(series.tolist(), missing_mask)]
+
+
+def _float_column(series):
+    """Column values as float, with None for missing values"""
+    values = series.astype(float)
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def grouped_lists(df, key, column):
+    """Map every key to the list of its column values, in file order"""
+    keys = df[key].to_numpy()
+    order = np.argsort(keys, kind='stable')
+    unique_keys, starts = np.unique(keys[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+    values = df[column].to_numpy()[order].tolist()
+    return pd.Series([values[start:end] for start, end in zip(starts, ends)], index=unique_keys, dtype=object)
+
+
+def _int_column(series):
+    """Column values as int, with None for missing values"""
+    return [int(value) if pd.notna(value) else None for value in series.tolist()]
+
+
+def restaurant_aggregates(rest_cuisine, rest_pay, rest_parking, rating):
+    """Per-placeID cuisine, payment and parking lists plus rating mean and count"""
+    aggregates = pd.concat([
+        grouped_lists(rest_cuisine, 'placeID', 'Rcuisine').rename('cuisines'),
+        grouped_lists(rest_pay, 'placeID', 'Rpayment').rename('payments'),
+        grouped_lists(rest_parking, 'placeID', 'parking_lot').rename('parking'),
+        rating.groupby('placeID')['rating'].agg(['mean', 'count']).rename(
+            columns={'mean': 'average_rating', 'count': 'rating_count'}
+        )
+    ], axis=1)
+    return aggregates
+
+
+def build_restaurant_list(rest_geo, rest_cuisine, rest_pay, rest_parking, rating):
+    """All restaurants with their aggregated details, as JSON-ready dicts"""
+    aggregates = restaurant_aggregates(rest_cuisine, rest_pay, rest_parking, rating)
+    joined = aggregates.reindex(rest_geo['placeID'])
+
+    columns = {
+        'placeID': [int(place_id) for place_id in rest_geo['placeID'].tolist()],
+        'latitude': _float_column(rest_geo['latitude']),
+        'longitude': _float_column(rest_geo['longitude']),
+        'cuisines': [value if isinstance(value, list) else [] for value in joined['cuisines'].tolist()],
+        'payments': [value if isinstance(value, list) else [] for value in joined['payments'].tolist()],
+        'parking': [value if isinstance(value, list) else [] for value in joined['parking'].tolist()],
+        'average_rating': [round(float(value), 2) if pd.notna(value) else 0 for value in joined['average_rating'].tolist()],
+        'rating_count': [int(value) if pd.notna(value) else 0 for value in joined['rating_count'].tolist()]
+    }
+    for column in RESTAURANT_TEXT_COLUMNS:
+        columns[column] = _text_column(rest_geo[column], 'N/A')
+
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def user_aggregates(rating, cons_cuisine):
+    """Per-userID rating count and mean plus the first three cuisine preferences"""
+    cuisines = grouped_lists(cons_cuisine, 'userID', 'Rcuisine')
+    aggregates = pd.concat([
+        rating.groupby('userID', observed=True)['rating'].agg(['count', 'mean']).rename(
+            columns={'count': 'total_ratings', 'mean': 'average_rating'}
+        ),
+        pd.Series([values[:3] for values in cuisines.tolist()], index=cuisines.index, dtype=object).rename('cuisine_preferences')
+    ], axis=1)
+    return aggregates
+
+
+def build_user_list(cons_profile, rating, cons_cuisine):
+    """All users with their rating summary and top cuisine preferences, as JSON-ready dicts"""
+    aggregates = user_aggregates(rating, cons_cuisine)
+    joined = aggregates.reindex(cons_profile['userID'])
+
+    columns = {
+        'userID': [str(user_id) for user_id in cons_profile['userID'].tolist()],
+        'latitude': _float_column(cons_profile['latitude']),
+        'longitude': _float_column(cons_profile['longitude']),
+        'birth_year': _int_column(cons_profile['birth_year']),
+        'total_ratings': [int(value) if pd.notna(value) else 0 for value in joined['total_ratings'].tolist()],
+        'average_rating': [round(float(value), 2) if pd.notna(value) else 0 for value in joined['average_rating'].tolist()],
+        'cuisine_preferences': [value if isinstance(value, list) else [] for value in joined['cuisine_preferences'].tolist()]
+    }
+    for column in USER_TEXT_COLUMNS:
+        columns[column] = _text_column(cons_profile[column], None)
+
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def rating_summary(ratings):
+    """(average rounded to 2 decimals, count) of a list of ratings, 0 for no ratings"""
+    return (round(float(sum(ratings) / len(ratings)), 2) if ratings else 0), len(ratings)
+
+
+class KeyPositions:
+    """Positions of the records with given keys in a list of records, found by bisection"""
+
+    def __init__(self, keys):
+        keys = np.asarray(keys)
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def find(self, keys):
+        """Sorted positions of the records with any of the keys"""
+        keys = np.asarray(keys)
+        starts = np.searchsorted(self.keys, keys, side='left')
+        ends = np.searchsorted(self.keys, keys, side='right')
+        positions = [self.order[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+        return np.sort(np.concatenate(positions + [np.empty(0, dtype=np.int64)]))
+
+
+def normalize_key(value):
+    """Case-insensitive facet key"""
+    return str(value).strip().lower()
+
+
+class ListingIndex:
+    """Inverted indexes and sort orders over a list of JSON-ready records
+
+    facets maps a filter name to the key (or list of keys) of every record, ranges maps a
+    filter name to a numeric value per record, and sorts maps a sort name to a sort key
+    per record. Sort names can be prefixed with '-' for descending order; cursors are
+    positions in the chosen order, so paging with a cursor is stable. with_values()
+    returns a new index where some records and their numeric values are replaced.
+    """
+
+    def __init__(self, records, facets=None, ranges=None, sorts=None):
+        self.records = records
+        size = len(records)
+
+        self.facets = {}
+        for name, keys in (facets or {}).items():
+            postings = {}
+            for position, record_keys in enumerate(keys):
+                if not isinstance(record_keys, list):
+                    record_keys = [record_keys]
+                for key in record_keys:
+                    if key is None or (isinstance(key, float) and np.isnan(key)):
+                        continue
+                    postings.setdefault(normalize_key(key), []).append(position)
+            self.facets[name] = {key: np.unique(np.array(positions, dtype=np.int64)) for key, positions in postings.items()}
+
+        self.ranges = {}
+        for name, values in (ranges or {}).items():
+            values = np.asarray(values, dtype=np.float64)
+            order = np.argsort(values, kind='stable')
+            self.ranges[name] = (values[order], order)
+
+        self.orders = {None: (np.arange(size), np.arange(size))}
+        self.sort_keys = {}
+        positions = np.arange(size)
+        for name, keys in (sorts or {}).items():
+            self.sort_keys[name] = np.asarray(keys, dtype=object)
+            # Ties keep file order in both directions
+            _, groups = np.unique(np.asarray(keys, dtype=object), return_inverse=True)
+            for sort_name, group_keys in ((name, groups), ('-' + name, -groups)):
+                order = np.lexsort((positions, group_keys))
+                rank = np.empty(size, dtype=np.int64)
+                rank[order] = positions
+                self.orders[sort_name] = (order, rank)
+
+    def with_values(self, positions, records, ranges=None, sorts=None):
+        """New index with the records at sorted positions replaced, along with their numeric range and sort values
+
+        The facets are kept, so the new records must have the same facet keys. The sort
+        orders are updated by reinserting the replaced records, without sorting again.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        index = copy.copy(self)
+        index.records = list(self.records)
+        for position, record in zip(positions.tolist(), records):
+            index.records[position] = record
+        replaced = np.zeros(len(self.records), dtype=bool)
+        replaced[positions] = True
+
+        index.ranges = dict(self.ranges)
+        for name, values in (ranges or {}).items():
+            sorted_values, order = self.ranges[name]
+            kept = ~replaced[order]
+            values = np.asarray(values, dtype=np.float64)
+            new = np.argsort(values, kind='stable')
+            at = np.searchsorted(sorted_values[kept], values[new], side='right')
+            index.ranges[name] = (
+                np.insert(sorted_values[kept], at, values[new]), np.insert(order[kept], at, positions[new])
+            )
+
+        index.orders = dict(self.orders)
+        index.sort_keys = dict(self.sort_keys)
+        for name, values in (sorts or {}).items():
+            keys = self.sort_keys[name].copy()
+            keys[positions] = values
+            index.sort_keys[name] = keys
+            for sort_name, sign in ((name, 1), ('-' + name, -1)):
+                # Orders are sorted by (key, position); reinsert the replaced positions at their place
+                order = self.orders[sort_name][0]
+                order = order[~replaced[order]]
+                order_keys = sign * keys[order].astype(np.float64)
+                new_keys = sign * np.asarray(values, dtype=np.float64)
+                new = np.lexsort((positions, new_keys))
+                starts = np.searchsorted(order_keys, new_keys[new], side='left')
+                ends = np.searchsorted(order_keys, new_keys[new], side='right')
+                at = [
+                    start + int(np.searchsorted(order[start:end], position))
+                    for start, end, position in zip(starts.tolist(), ends.tolist(), positions[new].tolist())
+                ]
+                order = np.insert(order, at, positions[new])
+                rank = np.empty(len(order), dtype=np.int64)
+                rank[order] = np.arange(len(order))
+                index.orders[sort_name] = (order, rank)
+        return index
+
+    def facet_keys(self, name):
+        """All keys of one facet, for building filter menus"""
+        return sorted(self.facets[name])
+
+    def _check_filters(self, filters, minimums):
+        """Raise ValueError for filters the index does not have"""
+        for name in (filters or {}):
+            if name not in self.facets:
+                raise ValueError(f'Unknown filter: {name}')
+        for name in (minimums or {}):
+            if name not in self.ranges:
+                raise ValueError(f'Unknown filter: {name}')
+
+    def match(self, filters=None, minimums=None):
+        """Sorted positions of the records passing every filter, or None when nothing is filtered"""
+        self._check_filters(filters, minimums)
+        return self._match(filters or {}, minimums or {})
+
+    def _match(self, filters, minimums, positions=None):
+        """Sorted positions matching every filter, or None when nothing is filtered"""
+        matches = [] if positions is None else [positions]
+        for name, keys in filters.items():
+            postings = self.facets[name]
+            lists = [postings.get(normalize_key(key)) for key in keys]
+            lists = [positions for positions in lists if positions is not None]
+            if not lists:
+                return np.empty(0, dtype=np.int64)
+            matches.append(lists[0] if len(lists) == 1 else np.unique(np.concatenate(lists)))
+        for name, minimum in minimums.items():
+            values, order = self.ranges[name]
+            matches.append(np.sort(order[np.searchsorted(values, minimum, side='left'):]))
+        if not matches:
+            return None
+
+        # Intersect the smallest posting lists first
+        matches.sort(key=len)
+        result = matches[0]
+        for positions in matches[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, positions, assume_unique=True)
+        return result
+
+    def query(self, filters=None, minimums=None, sort=None, limit=50, offset=0, cursor=None, positions=None):
+        """One page of records: (records, total matches, cursor of the next page or None)
+
+        positions optionally restricts the query to a sorted array of record positions.
+        """
+        if sort not in self.orders:
+            raise ValueError(f'Unknown sort: {sort}')
+        self._check_filters(filters, minimums)
+        order, rank = self.orders[sort]
+        candidates = self._match(filters or {}, minimums or {}, positions)
+        skip = 0 if cursor is not None else offset
+
+        if candidates is None:
+            total = len(order)
+            start = max(cursor + 1 if cursor is not None else offset, 0)
+            page_ranks = np.arange(start, min(start + limit, total))
+            has_more = start + limit < total
+        else:
+            total = len(candidates)
+            ranks = rank[candidates]
+            if cursor is not None:
+                ranks = ranks[ranks > cursor]
+            needed = skip + limit
+            if needed < len(ranks):
+                ranks = np.partition(ranks, needed - 1)[:needed]
+                has_more = True
+            else:
+                has_more = False
+            page_ranks = np.sort(ranks)[skip:needed]
+
+        records = [self.records[position] for position in order[page_ranks].tolist()]
+        next_cursor = int(page_ranks[-1]) if has_more and len(page_ranks) > 0 else None
+        return records, total, next_cursor
+
+
+# Price levels in ascending order, for sorting by price
+PRICE_ORDER = {'low': 1, 'medium': 2, 'high': 3}
+
+
+def build_restaurant_listing(restaurants):
+    """Filter and sort indexes over the /api/restaurants records"""
+    return ListingIndex(
+        restaurants,
+        facets={
+            'city': [record['city'] for record in restaurants],
+            'price': [record['price'] for record in restaurants],
+            'cuisine': [record['cuisines'] for record in restaurants],
+            'payment': [record['payments'] for record in restaurants],
+            'parking': [record['parking'] for record in restaurants],
+            'alcohol': [record['alcohol'] for record in restaurants],
+            'smoking': [record['smoking_area'] for record in restaurants]
+        },
+        ranges={'rating': [record['average_rating'] for record in restaurants]},
+        sorts={
+            'name': [record['name'].casefold() for record in restaurants],
+            'rating': [record['average_rating'] for record in restaurants],
+            'rating_count': [record['rating_count'] for record in restaurants],
+            'price': [PRICE_ORDER.get(record['price'], 0) for record in restaurants],
+            'placeID': [record['placeID'] for record in restaurants]
+        }
+    )
+
+
+def build_user_listing(users, cons_cuisine, cons_pay):
+    """Filter and sort indexes over the /api/users/all records"""
+    user_ids = [record['userID'] for record in users]
+    cuisines = grouped_lists(cons_cuisine, 'userID', 'Rcuisine').reindex(user_ids)
+    payments = grouped_lists(cons_pay, 'userID', 'Upayment').reindex(user_ids)
+    return ListingIndex(
+        users,
+        facets={
+            'cuisine': [value if isinstance(value, list) else [] for value in cuisines.tolist()],
+            'payment': [value if isinstance(value, list) else [] for value in payments.tolist()],
+            'budget': [record['budget'] for record in users],
+            'smoker': [record['smoker'] for record in users],
+            'drink_level': [record['drink_level'] for record in users],
+            'ambience': [record['ambience'] for record in users],
+            'transport': [record['transport'] for record in users]
+        },
+        ranges={'rating': [record['average_rating'] for record in users]},
+        sorts={
+            'userID': user_ids,
+            'rating': [record['average_rating'] for record in users],
+            'total_ratings': [record['total_ratings'] for record in users],
+            'birth_year': [record['birth_year'] if record['birth_year'] is not None else 0 for record in users]
+        }
+    )
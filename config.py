@@ -0,0 +1,127 @@
+"""
+Runtime configuration for the Restaurant Recommendation System
+Every setting can be overridden with an environment variable of the same name
+"""
+
+import json
+import os
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    return int(value)
+
+
+# Directory holding the chefmoz / user CSV files
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+# Typed tables parsed from the CSV files, cached as Parquet (with pyarrow) or pickles and
+# used while they are newer than their CSV file; an empty value disables the cache
+DATA_CACHE_DIR = os.environ.get('DATA_CACHE_DIR', os.path.join(DATA_DIR, '.cache'))
+
+# Collaborative filtering: number of nearest neighbours kept per user.
+# The bundled dataset has fewer users than this, so rankings match the full dense model.
+CF_NEIGHBOURS = _env_int('CF_NEIGHBOURS', 200)
+
+# Number of users whose similarity rows are computed at once while building the model
+CF_BLOCK_SIZE = _env_int('CF_BLOCK_SIZE', 1024)
+
+# Collaborative filtering backend blended into the hybrid scores: 'neighbours' (user-based
+# cosine top-k) or 'als' (matrix factorization trained with alternating least squares)
+CF_BACKEND = os.environ.get('CF_BACKEND', 'neighbours')
+
+# ALS backend: latent factors, training sweeps, L2 regularisation, 'explicit' or 'implicit'
+# feedback, implicit confidence weight and the number of threads solving factor rows
+ALS_FACTORS = _env_int('ALS_FACTORS', 32)
+ALS_ITERATIONS = _env_int('ALS_ITERATIONS', 15)
+ALS_REGULARIZATION = float(os.environ.get('ALS_REGULARIZATION') or 0.1)
+ALS_MODE = os.environ.get('ALS_MODE', 'explicit')
+ALS_ALPHA = float(os.environ.get('ALS_ALPHA') or 10.0)
+ALS_THREADS = _env_int('ALS_THREADS', os.cpu_count() or 1)
+
+# ALS training target: weight of food_rating and service_rating next to the overall rating (0 to ignore)
+ALS_FOOD_WEIGHT = float(os.environ.get('ALS_FOOD_WEIGHT') or 0.2)
+ALS_SERVICE_WEIGHT = float(os.environ.get('ALS_SERVICE_WEIGHT') or 0.2)
+
+# Number of recommendations precomputed per user; larger top_n requests are scored on demand
+TOP_N_MAX = _env_int('TOP_N_MAX', 50)
+
+# Restaurant search (/api/search): default and maximum number of results, and weight of the
+# average rating (0-2) added to the text match score when ranking
+SEARCH_LIMIT_DEFAULT = _env_int('SEARCH_LIMIT_DEFAULT', 10)
+SEARCH_LIMIT_MAX = _env_int('SEARCH_LIMIT_MAX', 50)
+SEARCH_RATING_WEIGHT = float(os.environ.get('SEARCH_RATING_WEIGHT') or 0.5)
+
+# Similar places (/api/restaurant/<id>/similar): neighbours precomputed per restaurant (the
+# maximum k) and weight of co-rating similarity next to feature similarity (0 to 1)
+SIMILAR_PLACES_K = _env_int('SIMILAR_PLACES_K', 20)
+SIMILAR_RATING_WEIGHT = float(os.environ.get('SIMILAR_RATING_WEIGHT') or 0.5)
+
+# Re-ranked recommendations (per-request weights, filters or experiment buckets): number of
+# top CF and CBF places precomputed per user, and of most popular places, merged as candidates
+RANKING_CANDIDATES = _env_int('RANKING_CANDIDATES', 50)
+
+# Ranking experiments as JSON: bucket name -> {"weights": {"cf", "cbf", "popularity"}, "filters":
+# {facet: [values]}, "min_rating"}; users are split evenly between the buckets by a hash of
+# their userID unless a request names its bucket or weights
+RANKING_EXPERIMENTS = json.loads(os.environ.get('RANKING_EXPERIMENTS') or '{}')
+
+# Nearby recommendations (/api/recommendations/<user_id>?near=1): default and maximum radius_km
+NEAR_RADIUS_KM = float(os.environ.get('NEAR_RADIUS_KM') or 5.0)
+NEAR_RADIUS_MAX_KM = float(os.environ.get('NEAR_RADIUS_MAX_KM') or 100.0)
+
+# Cache of /api/recommendations/<user_id> responses: maximum entries (0 disables it) and
+# seconds an entry is served; entries are also dropped whenever the model version changes
+RESPONSE_CACHE_SIZE = _env_int('RESPONSE_CACHE_SIZE', 10000)
+RESPONSE_CACHE_TTL = _env_int('RESPONSE_CACHE_TTL', 300)
+
+# Maximum number of users in one POST /api/recommendations/batch request
+RECOMMENDATIONS_BATCH_MAX = _env_int('RECOMMENDATIONS_BATCH_MAX', 1000)
+
+# Time zone of the restaurants' opening hours, used for open_now and for open_at values with an offset
+RESTAURANT_TIMEZONE = os.environ.get('RESTAURANT_TIMEZONE', 'America/Mexico_City')
+
+# Paged listings (/api/restaurants, /api/users/all): default and maximum page size
+PAGE_SIZE_DEFAULT = _env_int('PAGE_SIZE_DEFAULT', 50)
+PAGE_SIZE_MAX = _env_int('PAGE_SIZE_MAX', 500)
+
+# Number of restaurant/user detail payloads kept in the LRU cache
+ENTITY_CACHE_SIZE = _env_int('ENTITY_CACHE_SIZE', 4096)
+
+# Model snapshots written by `python manage.py build-model` and memory-mapped at startup
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots'))
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+# Ratings posted to /api/ratings are appended to rating_final.csv so they survive a rebuild
+PERSIST_RATINGS = os.environ.get('PERSIST_RATINGS', '1').lower() not in ('0', 'false', 'no')
+
+# Maximum number of ratings accepted by one /api/ratings/batch request
+RATINGS_BATCH_MAX = _env_int('RATINGS_BATCH_MAX', 1000)
+
+# /api/evaluate: number of cross-validation folds, cut-off of the ranking metrics, worker
+# processes evaluating folds in parallel and number of finished jobs kept for polling
+EVALUATION_FOLDS = _env_int('EVALUATION_FOLDS', 5)
+EVALUATION_K = _env_int('EVALUATION_K', 10)
+EVALUATION_WORKERS = _env_int('EVALUATION_WORKERS', min(EVALUATION_FOLDS, os.cpu_count() or 1))
+EVALUATION_JOBS_MAX = _env_int('EVALUATION_JOBS_MAX', 20)
+
+# Production server (python server.py): listening address, worker processes, whether the
+# model is loaded once before the workers are forked, seconds a stopping worker waits for
+# its in-flight requests, and whether every request is logged
+SERVER_HOST = os.environ.get('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = _env_int('SERVER_PORT', 5000)
+SERVER_WORKERS = _env_int('SERVER_WORKERS', os.cpu_count() or 1)
+SERVER_PRELOAD = os.environ.get('SERVER_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+SERVER_GRACEFUL_TIMEOUT = _env_int('SERVER_GRACEFUL_TIMEOUT', 30)
+SERVER_ACCESS_LOG = os.environ.get('SERVER_ACCESS_LOG', '0').lower() not in ('0', 'false', 'no')
+
+# Structured JSON logging of request-path events on stderr: debug, info, warning or error (off when empty)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', '')
+
+# Sampling profiler: number of slowest requests whose profiles are kept (0 disables it)
+# and milliseconds between two stack samples
+PROFILE_SLOW_REQUESTS = _env_int('PROFILE_SLOW_REQUESTS', 0)
+PROFILE_INTERVAL_MS = _env_int('PROFILE_INTERVAL_MS', 5)
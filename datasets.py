@@ -0,0 +1,140 @@
+"""
+Typed loading of the chefmoz and user CSV datasets
+
+Every file has a declared schema: IDs and attributes that repeat across rows are read
+as pandas categoricals, numbers as compact integer or float dtypes and free text (names,
+addresses, URLs) as strings, and the '?' placeholders of the files become real nulls.
+The typed tables are cached in DATA_CACHE_DIR as Parquet (when pyarrow is installed) or
+as pandas pickles, and a cached table is used instead of its CSV file as long as it is
+newer than the file and was written for the same schema.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+
+# Placeholder of unknown values in the CSV files
+NA_VALUES = ['?']
+
+# Column dtypes of every CSV file: 'category' for repeated values, 'str' for free text
+SCHEMAS = {
+    'chefmozaccepts.csv': {'placeID': 'int32', 'Rpayment': 'category'},
+    'chefmozcuisine.csv': {'placeID': 'int32', 'Rcuisine': 'category'},
+    'chefmozhours4.csv': {'placeID': 'int32', 'hours': 'category', 'days': 'category'},
+    'chefmozparking.csv': {'placeID': 'int32', 'parking_lot': 'category'},
+    'geoplaces2.csv': {
+        'placeID': 'int32', 'latitude': 'float64', 'longitude': 'float64', 'the_geom_meter': 'str',
+        'name': 'str', 'address': 'str', 'city': 'category', 'state': 'category', 'country': 'category',
+        'fax': 'str', 'zip': 'str', 'alcohol': 'category', 'smoking_area': 'category',
+        'dress_code': 'category', 'accessibility': 'category', 'price': 'category', 'url': 'str',
+        'Rambience': 'category', 'franchise': 'category', 'area': 'category', 'other_services': 'category'
+    },
+    'usercuisine.csv': {'userID': 'category', 'Rcuisine': 'category'},
+    'userpayment.csv': {'userID': 'category', 'Upayment': 'category'},
+    'userprofile.csv': {
+        'userID': 'str', 'latitude': 'float64', 'longitude': 'float64', 'smoker': 'category',
+        'drink_level': 'category', 'dress_preference': 'category', 'ambience': 'category',
+        'transport': 'category', 'marital_status': 'category', 'hijos': 'category', 'birth_year': 'int16',
+        'interest': 'category', 'personality': 'category', 'religion': 'category', 'activity': 'category',
+        'color': 'category', 'weight': 'int16', 'budget': 'category', 'height': 'float64'
+    },
+    'rating_final.csv': {
+        'userID': 'category', 'placeID': 'int32', 'rating': 'int8', 'food_rating': 'Int8', 'service_rating': 'Int8'
+    }
+}
+
+
+def read_csv(path, schema=None):
+    """Read a CSV file with its declared column dtypes and '?' as null"""
+    schema = SCHEMAS.get(os.path.basename(path)) if schema is None else schema
+    return pd.read_csv(path, dtype=schema, na_values=NA_VALUES)
+
+
+def cache_format():
+    """'parquet' when pyarrow is installed, else 'pickle'"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return 'pickle'
+    return 'parquet'
+
+
+def cache_path(cache_dir, file_name, schema, file_format):
+    """Cached table of a CSV file, named after the file, its schema and the cache format"""
+    fingerprint = hashlib.sha256(
+        json.dumps({'schema': schema, 'na_values': NA_VALUES}, sort_keys=True).encode('utf-8')
+    ).hexdigest()[:12]
+    extension = 'parquet' if file_format == 'parquet' else 'pkl'
+    return os.path.join(cache_dir, f'{os.path.splitext(file_name)[0]}.{fingerprint}.{extension}')
+
+
+def _read_cache(path, file_format):
+    return pd.read_parquet(path) if file_format == 'parquet' else pd.read_pickle(path)
+
+
+def _write_cache(df, path, file_format):
+    """Write a cached table atomically and remove the ones written for other schemas or formats"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f'{path}.{os.getpid()}.partial'
+    if file_format == 'parquet':
+        df.to_parquet(partial, index=False)
+    else:
+        df.to_pickle(partial)
+    os.replace(partial, path)
+    stem = os.path.basename(path).split('.')[0]
+    for stale in glob.glob(os.path.join(os.path.dirname(path), f'{stem}.*')):
+        if stale != path and not stale.endswith('.partial'):
+            os.remove(stale)
+
+
+def load_table(data_dir, file_name, cache_dir=None):
+    """Typed table of a CSV file, from its cache when that is newer than the file
+
+    Returns (DataFrame, source) where source is 'cache' or 'csv'. Without a cache_dir the
+    CSV file is always parsed; a cache that cannot be read or written is ignored.
+    """
+    csv_path = os.path.join(data_dir, file_name)
+    schema = SCHEMAS.get(file_name)
+    if not cache_dir or schema is None:
+        return read_csv(csv_path, schema), 'csv'
+
+    file_format = cache_format()
+    path = cache_path(cache_dir, file_name, schema, file_format)
+    try:
+        if os.stat(path).st_mtime_ns > os.stat(csv_path).st_mtime_ns:
+            return _read_cache(path, file_format), 'cache'
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f'Cached {file_name} could not be read, parsing the CSV file. Error: {e}')
+
+    df = read_csv(csv_path, schema)
+    try:
+        _write_cache(df, path, file_format)
+    except Exception as e:
+        print(f'{file_name} could not be cached. Error: {e}')
+    return df, 'csv'
+
+
+def concat(frames):
+    """pd.concat of tables with the same columns, keeping categorical columns categorical
+
+    The categories of a column are the sorted union of the categories and values of every frame.
+    """
+    frames = list(frames)
+    dtypes = {}
+    for column in frames[0].columns:
+        if not isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            continue
+        values = [
+            frame[column].cat.categories if isinstance(frame[column].dtype, pd.CategoricalDtype)
+            else pd.Index(frame[column].dropna().unique())
+            for frame in frames
+        ]
+        categories = values[0].append(values[1:]).unique().sort_values()
+        dtypes[column] = pd.CategoricalDtype(categories)
+    return pd.concat([frame.astype(dtypes) for frame in frames], ignore_index=True)
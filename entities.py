@@ -0,0 +1,180 @@
+"""
+Hash-indexed entity store for the restaurant and user detail endpoints
+
+Restaurants and users are keyed by ID, and their related rows (hours, reviews,
+cuisines, payments) are grouped by key once at load time, so a detail request is a
+few dictionary lookups and list slices instead of scans over full DataFrames.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from catalog import rating_summary
+
+
+# User profile columns returned by /api/user/<id>, with their JSON types
+USER_PROFILE_COLUMNS = [
+    ('latitude', float), ('longitude', float), ('smoker', str), ('drink_level', str),
+    ('dress_preference', str), ('ambience', str), ('transport', str), ('marital_status', str),
+    ('hijos', str), ('birth_year', int), ('interest', str), ('personality', str),
+    ('religion', str), ('activity', str), ('color', str), ('weight', float),
+    ('budget', str), ('height', float)
+]
+
+
+class GroupedRows:
+    """Rows of a table grouped by a key column, stored as plain Python column lists
+
+    with_rows() returns a new grouping that shares the columns and keeps the rows of
+    changed keys in an overlay dictionary.
+    """
+
+    def __init__(self, df, key):
+        keys = df[key].to_numpy()
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self.ranges = dict(zip(unique_keys.tolist(), zip(starts.tolist(), ends.tolist())))
+        self.columns = {}
+        for column in df.columns:
+            values = df[column].to_numpy()[order]
+            missing = pd.isna(values)
+            self.columns[column] = [None if is_missing else value for value, is_missing in zip(values.tolist(), missing.tolist())]
+        self._overrides = {}
+
+    def with_rows(self, df, key, unique):
+        """New grouping with the rows of df added to their keys
+
+        A row replaces the row of its key with the same value in the unique column, and
+        goes last, as with drop_duplicates(keep='last') on the concatenated table.
+        """
+        grouped = copy.copy(self)
+        grouped._overrides = dict(self._overrides)
+        df = df.drop_duplicates(subset=[key, unique], keep='last')
+        for group_key, rows in df.groupby(key, sort=False, observed=True):
+            group_key = group_key.item() if hasattr(group_key, 'item') else group_key
+            replaced = set(rows[unique].tolist())
+            kept = [position for position, value in enumerate(self.values(group_key, unique)) if value not in replaced]
+            grouped._overrides[group_key] = {
+                column: [self.values(group_key, column)[position] for position in kept] + [
+                    None if pd.isna(value) else value for value in rows[column].tolist()
+                ]
+                for column in self.columns
+            }
+        return grouped
+
+    def __contains__(self, key):
+        return key in self._overrides or key in self.ranges
+
+    def values(self, key, column):
+        """Values of one column for every row of a key, in file order"""
+        if key in self._overrides:
+            return self._overrides[key][column]
+        start, end = self.ranges.get(key, (0, 0))
+        return self.columns[column][start:end]
+
+    def first(self, key, column):
+        """Value of one column in the first row of a key"""
+        if key in self._overrides:
+            return self._overrides[key][column][0]
+        start, _ = self.ranges[key]
+        return self.columns[column][start]
+
+
+def _as(kind, value):
+    """Convert a plain value to a JSON type, keeping None"""
+    return kind(value) if value is not None else None
+
+
+class EntityStore:
+    """Restaurants and users keyed by ID, with detail payloads cached in an LRU
+
+    with_ratings() returns a new store with the rating rows of the rated places and users
+    replaced and only their cached payloads dropped.
+    """
+
+    def __init__(self, restaurants, rest_hours, rating, cons_profile, cons_cuisine, cons_pay, cache_size=1024):
+        # placeID -> /api/restaurants record (first row wins, as with iloc[0])
+        self.restaurants = {}
+        for record in restaurants:
+            self.restaurants.setdefault(record['placeID'], record)
+        self.hours = GroupedRows(rest_hours, 'placeID')
+        self.place_ratings = GroupedRows(rating, 'placeID')
+
+        self.users = GroupedRows(cons_profile, 'userID')
+        self.user_ratings = GroupedRows(rating, 'userID')
+        self.user_cuisines = GroupedRows(cons_cuisine, 'userID')
+        self.user_payments = GroupedRows(cons_pay, 'userID')
+
+        self.cache = LRUCache(cache_size)
+
+    def with_ratings(self, rating_rows):
+        """New store with rating table rows added or replaced (the last one of a userID/placeID pair wins)"""
+        store = copy.copy(self)
+        store.place_ratings = self.place_ratings.with_rows(rating_rows, 'placeID', 'userID')
+        store.user_ratings = self.user_ratings.with_rows(rating_rows, 'userID', 'placeID')
+        stale = [('restaurant', place_id) for place_id in rating_rows['placeID'].unique().tolist()]
+        stale += [('user', user_id) for user_id in rating_rows['userID'].unique().tolist()]
+        store.cache = self.cache.without(stale)
+        return store
+
+    def place_rating_summary(self, place_id):
+        """(average rating, rating count) of a restaurant"""
+        return rating_summary(self.place_ratings.values(place_id, 'rating'))
+
+    def user_rating_summary(self, user_id):
+        """(average rating, rating count) of a user"""
+        return rating_summary(self.user_ratings.values(user_id, 'rating'))
+
+    def restaurant_detail(self, place_id):
+        """Detail payload of one restaurant, or None if it does not exist"""
+        key = ('restaurant', place_id)
+        detail = self.cache.get(key)
+        if detail is not None:
+            return detail
+        restaurant = self.restaurants.get(place_id)
+        if restaurant is None:
+            return None
+
+        ratings = self.place_ratings.values(place_id, 'rating')
+        detail = dict(restaurant)
+        detail['hours'] = [
+            {'days': str(days) if days is not None else 'N/A', 'hours': str(hours) if hours is not None else 'N/A'}
+            for days, hours in zip(self.hours.values(place_id, 'days'), self.hours.values(place_id, 'hours'))
+        ]
+        detail['reviews'] = [
+            {'userID': str(user_id), 'rating': int(value),
+             'food_rating': _as(int, food), 'service_rating': _as(int, service)}
+            for user_id, value, food, service in zip(
+                self.place_ratings.values(place_id, 'userID'), ratings,
+                self.place_ratings.values(place_id, 'food_rating'),
+                self.place_ratings.values(place_id, 'service_rating')
+            )
+        ]
+        detail['average_rating'], detail['rating_count'] = rating_summary(ratings)
+        self.cache.put(key, detail)
+        return detail
+
+    def user_detail(self, user_id):
+        """Profile payload of one user, or None if the user does not exist"""
+        key = ('user', user_id)
+        detail = self.cache.get(key)
+        if detail is not None:
+            return detail
+        if user_id not in self.users:
+            return None
+
+        average_rating, total_ratings = self.user_rating_summary(user_id)
+        detail = {
+            'userID': user_id,
+            'profile': {column: _as(kind, self.users.first(user_id, column)) for column, kind in USER_PROFILE_COLUMNS},
+            'cuisine_preferences': self.user_cuisines.values(user_id, 'Rcuisine'),
+            'payment_preferences': self.user_payments.values(user_id, 'Upayment'),
+            'total_ratings': total_ratings,
+            'average_rating': average_rating
+        }
+        self.cache.put(key, detail)
+        return detail
@@ -0,0 +1,260 @@
+"""
+Offline evaluation of the hybrid recommender
+
+Ratings are split into k folds. For every fold the full hybrid pipeline (CF engine of
+each backend plus content-based filtering) is rebuilt from the other folds only, and
+the held-out ratings are scored against it, so no test rating leaks into the model.
+Folds run in a process pool, and evaluations run as background jobs whose status and
+result are polled, so a slow evaluation never ties up a web worker.
+"""
+
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+import config
+from model import CF_BACKENDS, Model, build_cbf_engine, build_cf_engine
+from recommender import top_n_rows
+
+
+# Model tables the hybrid pipeline of every fold is rebuilt from
+EVALUATION_TABLES = ['rest_geo', 'rest_cuisine', 'rest_pay', 'cons_cuisine', 'cons_pay', 'cons_profile', 'rating']
+
+
+def fold_positions(n_ratings, folds, seed=42):
+    """Row positions of the rating table in each of `folds` random folds"""
+    if folds < 2:
+        raise ValueError('folds must be at least 2')
+    if n_ratings < folds:
+        raise ValueError('Not enough ratings for the number of folds')
+    permutation = np.random.default_rng(seed).permutation(n_ratings)
+    return [np.sort(positions) for positions in np.array_split(permutation, folds)]
+
+
+def _pair_matrix(user_index, place_index, ratings, shape):
+    """Boolean CSR matrix of the (user, place) pairs of some ratings that exist in the model"""
+    rows = user_index.get_indexer(ratings['userID'])
+    cols = place_index.get_indexer(ratings['placeID'])
+    known = (rows >= 0) & (cols >= 0)
+    return sparse.csr_matrix((np.ones(known.sum(), dtype=bool), (rows[known], cols[known])), shape=shape)
+
+
+def score_fold(model, train, test, k):
+    """RMSE over the held-out ratings plus precision, recall and NDCG@k of a model built without them
+
+    Places the user rated in the training folds are excluded from the ranking, and the
+    relevant places are the held-out ones rated above 1.
+    """
+    cf_engine = model.cf_engine
+    user_index, place_index = cf_engine.user_ids, cf_engine.place_ids
+    shape = (len(user_index), len(place_index))
+
+    # Held-out ratings of users and places the model knows, scored in blocks of users
+    test_rows = user_index.get_indexer(test['userID'])
+    test_cols = place_index.get_indexer(test['placeID'])
+    known = (test_rows >= 0) & (test_cols >= 0)
+    relevant = test[test['rating'] > 1]
+    relevant_counts = relevant.groupby('userID', observed=True).size()
+    ranked_rows = user_index.get_indexer(relevant_counts.index)
+    order = np.argsort(ranked_rows)
+    ranked_rows, n_relevant = ranked_rows[order], relevant_counts.to_numpy()[order]
+    n_relevant, ranked_rows = n_relevant[ranked_rows >= 0], ranked_rows[ranked_rows >= 0]
+
+    seen = _pair_matrix(user_index, place_index, train, shape)
+    relevant_pairs = _pair_matrix(user_index, place_index, relevant, shape)
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)
+
+    predictions = np.empty(known.sum())
+    known_rows, known_cols = test_rows[known], test_cols[known]
+    rows = np.unique(np.concatenate([known_rows, ranked_rows]))
+    precision, recall, ndcg = [], [], []
+    for start in range(0, len(rows), config.CF_BLOCK_SIZE):
+        block_rows = rows[start:start + config.CF_BLOCK_SIZE]
+        scores = model.hybrid_scores_rows(block_rows)
+
+        # RMSE: fancy-index the predictions of every held-out rating in this block
+        in_block = (known_rows >= block_rows[0]) & (known_rows <= block_rows[-1])
+        predictions[in_block] = scores[np.searchsorted(block_rows, known_rows[in_block]), known_cols[in_block]]
+
+        # Ranking metrics: argpartitioned top-k of the unseen places
+        ranked = np.isin(block_rows, ranked_rows)
+        if not ranked.any():
+            continue
+        ranked_scores = scores[ranked]
+        ranked_block_rows = block_rows[ranked]
+        seen_rows, seen_cols = seen[ranked_block_rows].nonzero()
+        ranked_scores[seen_rows, seen_cols] = -np.inf
+        top_cols, _ = top_n_rows(ranked_scores, np.arange(shape[1]), min(k, shape[1]))
+        hits = np.take_along_axis(relevant_pairs[ranked_block_rows].toarray(), top_cols, axis=1)
+        counts = n_relevant[np.searchsorted(ranked_rows, ranked_block_rows)]
+        precision.append(hits.sum(axis=1) / k)
+        recall.append(hits.sum(axis=1) / counts)
+        ndcg.append((hits * discounts[:hits.shape[1]]).sum(axis=1) / ideal[np.minimum(counts, k) - 1])
+
+    true_ratings = test['rating'].to_numpy(dtype=np.float64)[known]
+    precision = np.concatenate(precision) if precision else np.empty(0)
+    recall = np.concatenate(recall) if recall else np.empty(0)
+    ndcg = np.concatenate(ndcg) if ndcg else np.empty(0)
+    return {
+        'rmse': float(np.sqrt(np.mean((predictions - true_ratings) ** 2))) if len(predictions) else None,
+        'precision': float(precision.mean()) if len(precision) else None,
+        'recall': float(recall.mean()) if len(recall) else None,
+        'ndcg': float(ndcg.mean()) if len(ndcg) else None,
+        'scored_ratings': int(len(predictions)),
+        'ranked_users': int(len(precision))
+    }
+
+
+def evaluate_fold(tables, test_positions, backends, k):
+    """Rebuild the hybrid pipeline without one fold and score that fold, for every backend"""
+    rating = tables['rating']
+    is_test = np.zeros(len(rating), dtype=bool)
+    is_test[test_positions] = True
+    train, test = rating[~is_test], rating[is_test]
+
+    results = {}
+    cbf_engine = None
+    for backend in backends:
+        model = Model()
+        for name, table in tables.items():
+            setattr(model, name, table)
+        model.rating = train
+        start = time.perf_counter()
+        model.cf_engine = build_cf_engine(train, backend)
+        training_seconds = time.perf_counter() - start
+
+        # Every backend is trained on the same ratings, so they share one CBF engine
+        if cbf_engine is None:
+            cbf_engine = build_cbf_engine(model, train, model.cf_engine.user_ids, model.cf_engine.place_ids)
+        model.cbf_engine = cbf_engine
+        metrics = score_fold(model, train, test, k)
+        metrics['training_seconds'] = training_seconds
+        results[backend] = metrics
+    return results
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return round(float(np.mean(values)), 4) if values else None
+
+
+def evaluate(tables, folds=5, k=10, backends=None, workers=1, seed=42):
+    """k-fold evaluation of every backend: metrics averaged over folds, plus the per-fold values"""
+    backends = list(backends or CF_BACKENDS)
+    for backend in backends:
+        if backend not in CF_BACKENDS:
+            raise ValueError(f'Unknown CF backend: {backend}')
+    positions = fold_positions(len(tables['rating']), folds, seed)
+
+    if workers > 1:
+        # Spawned workers do not inherit the web server's threads or locks
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, folds), mp_context=context) as executor:
+            fold_results = list(executor.map(
+                evaluate_fold, [tables] * folds, positions, [backends] * folds, [k] * folds
+            ))
+    else:
+        fold_results = [evaluate_fold(tables, test_positions, backends, k) for test_positions in positions]
+
+    result = {}
+    for backend in backends:
+        per_fold = [fold_result[backend] for fold_result in fold_results]
+        result[backend] = {
+            'rmse': _mean([metrics['rmse'] for metrics in per_fold]),
+            f'precision_at_{k}': _mean([metrics['precision'] for metrics in per_fold]),
+            f'recall_at_{k}': _mean([metrics['recall'] for metrics in per_fold]),
+            f'ndcg_at_{k}': _mean([metrics['ndcg'] for metrics in per_fold]),
+            'training_seconds': _mean([metrics['training_seconds'] for metrics in per_fold]),
+            'folds': [
+                {name: round(value, 4) if isinstance(value, float) else value for name, value in metrics.items()}
+                for metrics in per_fold
+            ]
+        }
+    return result
+
+
+# Evaluation jobs, oldest first; finished jobs beyond EVALUATION_JOBS_MAX are dropped
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _job_view(job):
+    """JSON-ready copy of a job"""
+    return {name: value for name, value in job.items() if not name.startswith('_')}
+
+
+def _run_job(job, tables):
+    with _jobs_lock:
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+    try:
+        params = job['params']
+        result = evaluate(
+            tables, folds=params['folds'], k=params['k'], backends=params['backends'], workers=job['_workers']
+        )
+    except Exception as e:
+        print(f'Evaluation {job["job_id"]} failed. Error: {e}')
+        with _jobs_lock:
+            job.update({'status': 'failed', 'error': str(e), 'finished_at': time.time()})
+        return
+    with _jobs_lock:
+        job.update({'status': 'done', 'result': result, 'finished_at': time.time()})
+        job['seconds'] = round(job['finished_at'] - job['started_at'], 3)
+
+
+def start_evaluation(model, folds=None, k=None, backends=None, workers=None):
+    """Start an evaluation job in a background thread, reusing an identical job of the same model version
+
+    workers (at most EVALUATION_WORKERS, the default) does not change the result, so
+    it is not part of the parameters an identical job is looked up by.
+    """
+    params = {
+        'folds': folds or config.EVALUATION_FOLDS,
+        'k': k or config.EVALUATION_K,
+        'backends': sorted(backends or CF_BACKENDS)
+    }
+    if params['folds'] < 2 or params['k'] < 1:
+        raise ValueError('folds must be at least 2 and k at least 1')
+    workers = workers or config.EVALUATION_WORKERS
+    if not 1 <= workers <= config.EVALUATION_WORKERS:
+        raise ValueError(f'workers must be between 1 and {config.EVALUATION_WORKERS}')
+    for backend in params['backends']:
+        if backend not in CF_BACKENDS:
+            raise ValueError(f'Unknown CF backend: {backend}')
+
+    with _jobs_lock:
+        for job in reversed(_jobs.values()):
+            if job['model_version'] == model.version and job['params'] == params and job['status'] != 'failed':
+                return _job_view(job)
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'model_version': model.version,
+            'params': params,
+            'created_at': time.time(),
+            '_workers': workers
+        }
+        _jobs[job['job_id']] = job
+        finished = [job_id for job_id, other in _jobs.items() if other['status'] in ('done', 'failed')]
+        for job_id in finished[:max(len(_jobs) - config.EVALUATION_JOBS_MAX, 0)]:
+            del _jobs[job_id]
+        view = _job_view(job)
+
+    tables = {name: getattr(model, name) for name in EVALUATION_TABLES}
+    thread = threading.Thread(target=_run_job, args=(job, tables), name=f'evaluation-{job["job_id"][:8]}', daemon=True)
+    thread.start()
+    return view
+
+
+def evaluation_job(job_id):
+    """Status (and result, once done) of an evaluation job, or None if it is unknown"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _job_view(job) if job is not None else None
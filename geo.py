@@ -0,0 +1,59 @@
+"""
+Spatial index over restaurant coordinates for the Restaurant Recommendation System
+
+Coordinates are stored as points on the unit sphere in a KD-tree. A great-circle radius
+maps to a straight-line (chord) radius on the sphere, so a radius query is a ball query
+on the tree: it only visits the tree nodes near the point instead of computing the
+distance to every restaurant. Haversine distances are computed for the hits only.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+
+def unit_vectors(latitudes, longitudes):
+    """Points on the unit sphere for arrays of latitudes and longitudes in degrees"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distance in km from one point to arrays of points"""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(np.asarray(latitudes, dtype=np.float64)), np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class GeoIndex:
+    """KD-tree over place coordinates answering 'places within radius_km of a point' queries"""
+
+    def __init__(self, place_ids, latitudes, longitudes):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = np.isfinite(latitudes) & np.isfinite(longitudes)
+        self.place_ids = np.asarray(place_ids)[valid]
+        self.latitudes = latitudes[valid]
+        self.longitudes = longitudes[valid]
+        self.tree = cKDTree(unit_vectors(self.latitudes, self.longitudes)) if len(self.place_ids) else None
+
+    def __len__(self):
+        return len(self.place_ids)
+
+    def within(self, latitude, longitude, radius_km):
+        """(placeIDs, distances in km) of the places within radius_km of a point, nearest first"""
+        if self.tree is None:
+            return self.place_ids[:0], np.empty(0)
+        angle = min(radius_km / EARTH_RADIUS_KM, np.pi)
+        chord = 2 * np.sin(angle / 2)
+        positions = np.array(self.tree.query_ball_point(unit_vectors([latitude], [longitude])[0], chord), dtype=np.int64)
+        distances = haversine_km(latitude, longitude, self.latitudes[positions], self.longitudes[positions])
+        keep = distances <= radius_km
+        positions, distances = positions[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return self.place_ids[positions[order]], distances[order]
@@ -0,0 +1,107 @@
+"""
+Opening hours of the restaurants as a precompiled week bitmap
+
+chefmozhours4.csv is parsed once at load time into 7 x 96 quarter-hour slots per
+restaurant (Monday 00:00 first), packed into 84 bytes with np.packbits. Asking which
+restaurants are open at a given time is then a single AND of one byte column with a
+bit mask over all restaurants.
+"""
+
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+SLOTS_PER_DAY = 96
+SLOTS_PER_WEEK = len(DAYS) * SLOTS_PER_DAY
+SLOT_MINUTES = 24 * 60 // SLOTS_PER_DAY
+
+_RANGE = re.compile(r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$')
+
+
+def week_slots(hours, days):
+    """Boolean week of quarter-hour slots for one hours/days pair, e.g. '08:00-23:00;' and 'Mon;Tue;'
+
+    A range ending before it starts runs past midnight into the next day, and a range
+    ending when it starts (00:00-00:00) is open all day. Malformed ranges are skipped.
+    """
+    slots = np.zeros(SLOTS_PER_WEEK, dtype=bool)
+    day_numbers = [DAYS.index(day) for day in str(days).split(';') if day in DAYS]
+    for token in str(hours).split(';'):
+        match = _RANGE.match(token.strip())
+        if match is None:
+            continue
+        start_hour, start_minute, end_hour, end_minute = (int(value) for value in match.groups())
+        start = (start_hour * 60 + start_minute) // SLOT_MINUTES
+        end = -(-(end_hour * 60 + end_minute) // SLOT_MINUTES)
+        if end <= start:
+            end += SLOTS_PER_DAY
+        for day in day_numbers:
+            positions = np.arange(day * SLOTS_PER_DAY + start, day * SLOTS_PER_DAY + end) % SLOTS_PER_WEEK
+            slots[positions] = True
+    return slots
+
+
+def slot_of(when):
+    """Week slot (0 = Monday 00:00-00:15) of a datetime"""
+    return when.weekday() * SLOTS_PER_DAY + (when.hour * 60 + when.minute) // SLOT_MINUTES
+
+
+def local_time(when=None, timezone=None):
+    """A datetime in the restaurants' time zone: now if None; naive datetimes are taken as local already"""
+    zone = ZoneInfo(timezone) if timezone else None
+    if when is None:
+        return datetime.now(zone)
+    if when.tzinfo is not None and zone is not None:
+        return when.astimezone(zone)
+    return when
+
+
+class OpeningHours:
+    """Packed week bitmaps of the restaurants, one row per distinct placeID
+
+    Places without any opening hours have an empty bitmap and are never open.
+    """
+
+    def __init__(self, place_ids, rest_hours):
+        self.place_ids = pd.Index(pd.unique(np.asarray(place_ids)))
+        rows = self.place_ids.get_indexer(rest_hours['placeID'])
+        known = rows >= 0
+        self.bits = np.zeros((len(self.place_ids), SLOTS_PER_WEEK // 8), dtype=np.uint8)
+
+        # Parse every distinct hours/days pair once, then OR together the weeks of each place
+        keys = (rest_hours['hours'].astype(str) + '|' + rest_hours['days'].astype(str)).to_numpy()[known]
+        if len(keys):
+            pairs, codes = np.unique(keys, return_inverse=True)
+            weeks = np.packbits(np.array([week_slots(*pair.split('|', 1)) for pair in pairs.tolist()]), axis=1)
+            order = np.argsort(rows[known], kind='stable')
+            place_rows, starts = np.unique(rows[known][order], return_index=True)
+            self.bits[place_rows] = np.bitwise_or.reduceat(weeks[codes[order]], starts, axis=0)
+        self.known = self.bits.any(axis=1)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def rows_for(self, place_ids):
+        """Bitmap row of every placeID (-1 for places without a row)"""
+        return self.place_ids.get_indexer(place_ids)
+
+    def open_mask(self, when, rows=None):
+        """Boolean array over all rows (or over the given rows, False for -1): open at a datetime"""
+        slot = slot_of(when)
+        is_open = (self.bits[:, slot // 8] & (0x80 >> (slot % 8))) != 0
+        if rows is None:
+            return is_open
+        return is_open[rows] & (rows >= 0)
+
+    def week(self, place_id):
+        """Unpacked week of slots of one place, or None if it is unknown"""
+        rows = self.rows_for([place_id])
+        if rows[0] < 0:
+            return None
+        return np.unpackbits(self.bits[rows[0]]).astype(bool)
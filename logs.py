@@ -0,0 +1,51 @@
+"""
+Structured logging for the Restaurant Recommendation System
+
+Request-path events are logged as one JSON object per line on stderr, e.g.
+{"ts": ..., "level": "info", "event": "user_not_found", "user_id": "U1"}.
+Logging is off unless LOG_LEVEL is set (debug, info, warning or error), and
+log_event() returns before building anything when its level is disabled.
+"""
+
+import logging
+import sys
+
+import config
+from serialization import dumps
+
+
+logger = logging.getLogger('restaurants')
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, event and the record's fields"""
+
+    def format(self, record):
+        payload = {'ts': round(record.created, 6), 'level': record.levelname.lower(), 'event': record.getMessage()}
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return dumps(payload).decode('utf-8')
+
+
+def configure_logging(level=None):
+    """Send request-path events to stderr at a level, or disable them when the level is empty"""
+    level = (config.LOG_LEVEL if level is None else level).strip().upper()
+    logger.handlers.clear()
+    logger.propagate = False
+    if not level or level in ('0', 'OFF', 'NONE'):
+        logger.setLevel(logging.CRITICAL + 1)
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def log_event(level, event, **fields):
+    """Log an event with structured fields at a logging level"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+
+configure_logging()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Management commands for the Restaurant Recommendation System
+
+    python manage.py build-model               Build the model from the CSV files and write a snapshot
+    python manage.py export-recommendations    Write the top-N recommendations of every user to a file
+"""
+
+import argparse
+import os
+import sys
+
+import config
+import snapshot
+from model import DATASETS, build_model, load_or_build_model, model_to_snapshot
+from serialization import encode_json
+
+
+def build_model_command(args):
+    """Build the model from CSV and write it as the current snapshot"""
+    model = build_model()
+    tables, arrays, vocabulary = model_to_snapshot(model)
+    checksums = snapshot.source_checksums(config.DATA_DIR, DATASETS.values())
+    path = snapshot.write_snapshot(args.snapshot_dir, tables, arrays, vocabulary, checksums, snapshot.model_settings())
+    print(f'\nModel built in {model.build_seconds:.2f}s; snapshot written to {path}')
+    for removed in snapshot.prune_snapshots(args.snapshot_dir, args.keep):
+        print(f'Removed old snapshot {removed}')
+    return 0
+
+
+class JsonlExport:
+    """One JSON line per user: {"userID": ..., "recommendations": [...]}"""
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+
+    def write(self, model, user_ids, place_ids, scores):
+        for user_id, user_place_ids, user_scores in zip(user_ids, place_ids, scores):
+            self.file.write(encode_json({
+                'userID': user_id, 'recommendations': model.records_for(user_place_ids, user_scores)
+            }))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExport:
+    """One row per recommendation (userID, rank, placeID, name, score), one row group per chunk"""
+
+    def __init__(self, path):
+        import pyarrow
+        import pyarrow.parquet
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            ('userID', pyarrow.string()), ('rank', pyarrow.int32()), ('placeID', pyarrow.int64()),
+            ('name', pyarrow.string()), ('score', pyarrow.float64())
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, model, user_ids, place_ids, scores):
+        n = place_ids.shape[1]
+        names = [model.restaurant_records.get(place_id, {}).get('name') for place_id in place_ids.ravel().tolist()]
+        self.writer.write_table(self.pyarrow.table({
+            'userID': [user_id for user_id in user_ids for _ in range(n)],
+            'rank': [rank for _ in user_ids for rank in range(1, n + 1)],
+            'placeID': place_ids.ravel().astype('int64'),
+            'name': names,
+            'score': scores.ravel().round(2)
+        }, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_FORMATS = {'jsonl': JsonlExport, 'parquet': ParquetExport}
+
+
+def export_recommendations_command(args):
+    """Stream the top-N recommendations of every user to a JSONL or Parquet file, chunk by chunk"""
+    export_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    if args.top_n < 1 or args.chunk_size < 1:
+        print('--top-n and --chunk-size must be positive')
+        return 1
+
+    # Write to a temporary file so a failed export never leaves a truncated file behind
+    partial_path = args.output + '.partial'
+    try:
+        export = EXPORT_FORMATS[export_format](partial_path)
+    except ImportError:
+        print('Parquet export needs pyarrow: pip install pyarrow')
+        return 1
+
+    model = load_or_build_model()
+    cf_engine = model.cf_engine
+    # Raters first, in matrix row order, then the users served from their cold-start profile
+    cold_user_ids = [user_id for user_id in model.cbf_engine.cold_user_ids.tolist() if user_id not in cf_engine]
+    n_users = cf_engine.n_users + len(cold_user_ids)
+    written = 0
+    try:
+        for start in range(0, n_users, args.chunk_size):
+            user_ids = [
+                cf_engine.user_id(row) if row < cf_engine.n_users else cold_user_ids[row - cf_engine.n_users]
+                for row in range(start, min(start + args.chunk_size, n_users))
+            ]
+            known, place_ids, scores = model.batch_top_n(user_ids, args.top_n)
+            export.write(model, known, place_ids, scores)
+            written += len(known)
+    except BaseException:
+        export.close()
+        os.remove(partial_path)
+        raise
+    export.close()
+    os.replace(partial_path, args.output)
+    print(f'Top-{args.top_n} recommendations of {written} users written to {args.output}')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Restaurant Recommendation System management commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build-model', help='build the model from CSV and write a snapshot')
+    build.add_argument('--snapshot-dir', default=config.SNAPSHOT_DIR, help='snapshot directory (default: %(default)s)')
+    build.add_argument('--keep', type=int, default=3, help='number of snapshots to keep (default: %(default)s)')
+    build.set_defaults(handler=build_model_command)
+
+    export = commands.add_parser('export-recommendations', help='write the top-N recommendations of every user to a file')
+    export.add_argument('output', help='output file (.jsonl or .parquet)')
+    export.add_argument('--format', choices=sorted(EXPORT_FORMATS), help='output format (default: from the file extension)')
+    export.add_argument('--top-n', type=int, default=10, help='recommendations per user (default: %(default)s)')
+    export.add_argument('--chunk-size', type=int, default=config.CF_BLOCK_SIZE, help='users per chunk (default: %(default)s)')
+    export.set_defaults(handler=export_recommendations_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Prometheus-style metrics for the Restaurant Recommendation System
+
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format by GET /metrics. Every worker process keeps its own
+registry. Model builds are timed stage by stage: timed() blocks inside an active
+collect_stages() add up per stage, and the totals of each build are observed once when
+the collection ends (and kept on the model as build_stages).
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric family with a fixed list of label names"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    """Monotonic counter per label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_label_text(self.labels, key)} {_number(value)}' for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """Value per label values, read from a callback returning {label values: value} at render time
+
+    kind='counter' exposes totals that are counted elsewhere, e.g. cache hit counters.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), callback=None, kind=None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+        if kind is not None:
+            self.kind = kind
+
+    def render(self):
+        values = sorted((self.callback() or {}).items())
+        return self.header() + [
+            f'{self.name}{_label_text(self.labels, key)} {_number(value)}' for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    """Cumulative histogram with sum and count per label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f'{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_text(self.labels, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_label_text(self.labels, key)} {count}')
+        return lines
+
+
+class Registry:
+    """Metric families in registration order"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by route', ('method', 'route', 'status')
+))
+BUILD_STAGE_SECONDS = registry.register(Histogram(
+    'model_build_stage_seconds', 'Duration of each model build stage', ('stage',), STAGE_BUCKETS
+))
+
+
+_collector = threading.local()
+
+
+@contextlib.contextmanager
+def collect_stages():
+    """Collect the stage durations timed in this thread into a {stage: seconds} dict"""
+    stages = {}
+    previous = getattr(_collector, 'stages', None)
+    _collector.stages = stages
+    try:
+        yield stages
+    finally:
+        _collector.stages = previous
+        for stage, seconds in stages.items():
+            BUILD_STAGE_SECONDS.observe(seconds, stage)
+
+
+@contextlib.contextmanager
+def timed(stage):
+    """Add the duration of a block to a stage of the active collection (free outside of one)"""
+    stages = getattr(_collector, 'stages', None)
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
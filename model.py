@@ -0,0 +1,845 @@
+"""
+Model lifecycle for the Restaurant Recommendation System
+
+The datasets and recommendation engines are built into a Model object that is never
+mutated once published. Builds run at most one at a time (single-flight), usually in a
+background thread at process start, and the finished model is swapped in atomically so
+requests only ever see a fully built model.
+"""
+
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder
+
+import config
+import datasets
+import snapshot
+from entities import EntityStore
+from geo import GeoIndex
+from hours import OpeningHours
+from metrics import collect_stages, timed
+from catalog import KeyPositions, build_restaurant_list, build_restaurant_listing, build_user_list, build_user_listing
+from recommender import (
+    ALSRecommender, CandidateIndex, ContentBased, SimilarPlaces, SparseCF, TopNIndex, popularity_scores, top_n_rows
+)
+from search import SearchIndex
+from serialization import encode_json, json_etag
+
+
+# Restaurant attributes one-hot encoded for content-based filtering
+FEATURE_COLUMNS = ['price', 'alcohol', 'Rambience', 'Rcuisine']
+
+# userprofile attributes of cold-start profiles -> (restaurant feature, profile value -> feature value)
+PROFILE_FEATURES = {
+    'budget': ('price', {'low': 'low', 'medium': 'medium', 'high': 'high'}),
+    'drink_level': ('alcohol', {'abstemious': 'No_Alcohol_Served', 'casual drinker': 'Wine-Beer', 'social drinker': 'Full_Bar'}),
+    'ambience': ('Rambience', {'family': 'familiar', 'friends': 'familiar', 'solitary': 'quiet'})
+}
+
+# Weights of the collaborative and content-based scores in the hybrid score
+CF_WEIGHT = 0.6
+CBF_WEIGHT = 0.4
+
+# Components of re-ranked recommendations and their default weights (the hybrid score)
+RANKING_WEIGHTS = {'cf': CF_WEIGHT, 'cbf': CBF_WEIGHT, 'popularity': 0.0}
+
+# Columns of rating_final.csv, in file order
+RATING_COLUMNS = ['userID', 'placeID', 'rating', 'food_rating', 'service_rating']
+
+
+def load_dataset(file_name):
+    """Load a typed dataset from its CSV file, or from its cached table when that is newer"""
+    try:
+        df, source = datasets.load_table(config.DATA_DIR, file_name, config.DATA_CACHE_DIR)
+        cached = ' (cached)' if source == 'cache' else ''
+        print(f'{file_name} has {df.shape[0]} samples with {df.shape[1]} features each{cached}.')
+        return df
+    except Exception as e:
+        print(f'{file_name} could not be loaded. Error: {e}')
+        return None
+
+
+class Model:
+    """Loaded datasets and recommendation engines for one model version"""
+
+    def __init__(self, version=0):
+        self.version = version
+        self.built_at = None
+        self.build_seconds = None
+        self.build_stages = {}
+        self.source = None
+        self.incremental_updates = 0
+        self.rest_pay = None
+        self.rest_cuisine = None
+        self.rest_hours = None
+        self.rest_parking = None
+        self.rest_geo = None
+        self.cons_cuisine = None
+        self.cons_pay = None
+        self.cons_profile = None
+        self.rating = None
+        self.cf_engine = None
+        self.cbf_engine = None
+        self.encoder = None
+        self.top_n_index = None
+        self.candidate_index = None
+        self.popularity = None
+        self.similar_places = None
+        self.restaurant_records = None
+        self.restaurant_list = None
+        self.user_list = None
+        self.payloads = {}
+        self.profile_user_ids = None
+        self.stats = None
+        self.restaurant_listing = None
+        self.listing_place_ids = None
+        self.restaurant_positions = None
+        self.user_listing = None
+        self.user_positions = None
+        self.entity_store = None
+        self.geo_index = None
+        self.search_index = None
+        self.opening_hours = None
+        self.listing_hours_rows = None
+        self.place_hours_rows = None
+
+    def payload(self, name):
+        """Serialized /api/restaurants ('restaurants'), /api/users/all ('users') or /api/stats ('stats') payload and its ETag
+
+        Full builds encode them up front; after incremental updates they are encoded
+        again on first use.
+        """
+        if name not in self.payloads:
+            payload = {'restaurants': {'restaurants': self.restaurant_list}, 'users': {'users': self.user_list}}
+            body = encode_json(payload.get(name, self.stats))
+            self.payloads[name] = (body, json_etag(body))
+        return self.payloads[name]
+
+    def component_scores_rows(self, rows):
+        """Dense hybrid, CF and CBF scores for a block of users, given as rows of the CF matrix"""
+        with timed('cf_scores'):
+            cf_scores = self.cf_engine.scores_rows(rows)
+        with timed('cbf_scores'):
+            cbf_scores = self.cbf_engine.scores_rows(rows)
+        with timed('hybrid_blend'):
+            hybrid_scores = CF_WEIGHT * cf_scores + CBF_WEIGHT * cbf_scores
+        return {'hybrid': hybrid_scores, 'cf': cf_scores, 'cbf': cbf_scores}
+
+    def hybrid_scores_rows(self, rows):
+        """Dense hybrid scores for a block of users, given as rows of the CF matrix"""
+        return self.component_scores_rows(rows)['hybrid']
+
+    def profile_scores(self, profile):
+        """Hybrid scores of a cold-start profile over the CF place columns (no CF part)"""
+        return CBF_WEIGHT * self.cbf_engine.cold_start_scores(profile)[0]
+
+    def has_user(self, user_id):
+        """Whether a user has rated places or has a cold-start profile"""
+        return user_id in self.cf_engine or user_id in self.cbf_engine.cold_index
+
+    def user_scores(self, user_id):
+        """Hybrid scores of a user over the CF place columns, or None for an unknown user
+
+        Users who never rated a place are scored from their cold-start profile.
+        """
+        if user_id in self.cf_engine:
+            return self.hybrid_scores_rows(self.cf_engine.row(user_id))[0]
+        profile = self.cbf_engine.user_cold_start_profile(user_id)
+        return self.profile_scores(profile) if profile is not None else None
+
+    def recommendations(self, user_id, top_n=10, open_at=None):
+        """Top-N restaurant records with a 'Recommendation Score', or None for an unknown user
+
+        With open_at (a local datetime) only restaurants open at that time are returned.
+        """
+        top_n = max(top_n, 0)
+        top = self.top_n_index.get(user_id, self.top_n_index.max_n if open_at is not None else top_n)
+        if top is not None and open_at is not None:
+            is_open = self.opening_hours.open_mask(open_at, self.opening_hours.rows_for(top[0]))
+            # Too few open places among the precomputed ones: rank all places instead
+            if is_open.sum() < top_n and self.top_n_index.max_n < len(self.cf_engine.place_ids):
+                top = None
+            else:
+                top = (top[0][is_open][:top_n], top[1][is_open][:top_n])
+        if top is None:
+            # Requests beyond the precomputed index fall back to scoring the user on demand
+            scores = self.user_scores(user_id)
+            if scores is None:
+                return None
+            return self.ranked_recommendations(scores, top_n, open_at)
+
+        return self.records_for(top[0], top[1])
+
+    def weighted_scores(self, user_id, weights):
+        """Scores of a user over the CF place columns with per-component weights, or None for an unknown user"""
+        scores = weights['popularity'] * self.popularity
+        if user_id in self.cf_engine:
+            components = self.component_scores_rows(np.array([self.cf_engine.row(user_id)]))
+            return scores + weights['cf'] * components['cf'][0] + weights['cbf'] * components['cbf'][0]
+        profile = self.cbf_engine.user_cold_start_profile(user_id)
+        if profile is None:
+            return None
+        return scores + weights['cbf'] * self.cbf_engine.cold_start_scores(profile)[0]
+
+    def reranked_recommendations(self, user_id, weights, top_n=10, place_mask=None):
+        """Top-N restaurant records of a user ranked with per-request component weights, or None for an unknown user
+
+        The user's candidates (their best CF and CBF places and the most popular places)
+        are re-ranked by the weighted sum of their stored component scores. place_mask, a
+        boolean array over the CF place columns, filters the candidates. Users without
+        candidates, or with fewer than top_n candidates passing the filter, are scored
+        over every place instead.
+        """
+        top_n = max(top_n, 0)
+        place_ids = np.asarray(self.cf_engine.place_ids)
+        candidates = self.candidate_index.get(user_id)
+        if candidates is not None:
+            cols, cf_scores, cbf_scores = candidates
+            if place_mask is not None:
+                passing = place_mask[cols]
+                cols, cf_scores, cbf_scores = cols[passing], cf_scores[passing], cbf_scores[passing]
+            if len(cols) >= top_n:
+                scores = (
+                    weights['cf'] * cf_scores + weights['cbf'] * cbf_scores
+                    + weights['popularity'] * self.popularity[cols]
+                )
+                top_place_ids, top_scores = top_n_rows(scores[np.newaxis], place_ids[cols], top_n)
+                return self.records_for(top_place_ids[0], top_scores[0])
+
+        scores = self.weighted_scores(user_id, weights)
+        if scores is None:
+            return None
+        if place_mask is not None:
+            scores, place_ids = scores[place_mask], place_ids[place_mask]
+        top_place_ids, top_scores = top_n_rows(scores[np.newaxis], place_ids, min(top_n, len(place_ids)))
+        return self.records_for(top_place_ids[0], top_scores[0])
+
+    def place_filter_mask(self, filters=None, minimums=None, open_at=None):
+        """Boolean array over the CF place columns of the restaurants passing listing filters and open_at, or None"""
+        mask = None
+        positions = self.restaurant_listing.match(filters, minimums)
+        if positions is not None:
+            mask = np.isin(np.asarray(self.cf_engine.place_ids), self.listing_place_ids[positions])
+        if open_at is not None:
+            is_open = self.open_place_mask(open_at)
+            mask = is_open if mask is None else mask & is_open
+        return mask
+
+    def profile_recommendations(self, cuisines=(), payments=(), attributes=None, top_n=10):
+        """Top-N restaurant records of an ad-hoc cold-start profile (see ContentBased.cold_start_profile)"""
+        profile = self.cbf_engine.cold_start_profile(cuisines, payments, attributes)
+        return self.ranked_recommendations(self.profile_scores(profile), top_n)
+
+    def ranked_recommendations(self, scores, top_n=10, open_at=None):
+        """Top-N restaurant records of a hybrid score row over the CF place columns"""
+        place_ids = np.asarray(self.cf_engine.place_ids)
+        if open_at is not None:
+            is_open = self.open_place_mask(open_at)
+            scores, place_ids = scores[is_open], place_ids[is_open]
+        top_place_ids, top_scores = top_n_rows(scores[np.newaxis], place_ids, min(max(top_n, 0), len(place_ids)))
+        return self.records_for(top_place_ids[0], top_scores[0])
+
+    def batch_top_n(self, user_ids, top_n):
+        """Known users among user_ids plus their top-N (placeIDs, scores) arrays, best first
+
+        Served from the precomputed index with one fancy-indexing step when top_n fits in
+        it, otherwise the users are scored in blocks of dense hybrid score rows.
+        """
+        known = [user_id for user_id in user_ids if self.has_user(user_id)]
+        index = self.top_n_index
+        if top_n <= index.max_n and all(user_id in index for user_id in known):
+            return (known,) + index.get_many(known, top_n)
+
+        rated = np.array([user_id in self.cf_engine for user_id in known], dtype=bool)
+        rows = np.array([self.cf_engine.row(user_id) for user_id in known if user_id in self.cf_engine], dtype=np.int64)
+        place_ids = np.asarray(self.cf_engine.place_ids)
+        n = min(top_n, len(place_ids))
+        top_place_ids = np.empty((len(known), n), dtype=place_ids.dtype)
+        top_scores = np.empty((len(known), n))
+        positions = np.flatnonzero(rated)
+        for start in range(0, len(rows), config.CF_BLOCK_SIZE):
+            block = slice(start, start + config.CF_BLOCK_SIZE)
+            top_place_ids[positions[block]], top_scores[positions[block]] = top_n_rows(
+                self.hybrid_scores_rows(rows[block]), place_ids, n
+            )
+        # Users without ratings are scored one by one from their cold-start profiles
+        for position in np.flatnonzero(~rated).tolist():
+            user_place_ids, user_scores = top_n_rows(self.user_scores(known[position])[np.newaxis], place_ids, n)
+            top_place_ids[position], top_scores[position] = user_place_ids[0], user_scores[0]
+        return known, top_place_ids, top_scores
+
+    def batch_recommendations(self, user_ids, top_n=10):
+        """userID -> top-N restaurant records for every known user among user_ids"""
+        known, place_ids, scores = self.batch_top_n(user_ids, max(top_n, 0))
+        return {
+            user_id: self.records_for(user_place_ids, user_scores)
+            for user_id, user_place_ids, user_scores in zip(known, place_ids, scores)
+        }
+
+    def open_place_mask(self, open_at):
+        """Boolean array over the CF place columns: restaurant open at a local datetime"""
+        return self.opening_hours.open_mask(open_at, self.place_hours_rows)
+
+    def listing_positions(self, open_at=None, query=None):
+        """Sorted positions of the /api/restaurants records open at a local datetime and matching a search query
+
+        None when neither is given.
+        """
+        positions = None
+        if open_at is not None:
+            positions = np.flatnonzero(self.opening_hours.open_mask(open_at, self.listing_hours_rows))
+        if query:
+            matches = self.search_index.matches(query)
+            positions = matches if positions is None else np.intersect1d(positions, matches, assume_unique=True)
+        return positions
+
+    def similar_restaurants(self, place_id, k=10):
+        """Restaurant records of up to k places most similar to a place, with a similarity score, or None if unknown"""
+        similar = self.similar_places.get(place_id, k)
+        if similar is None:
+            return None
+        result = []
+        for similar_id, score in zip(similar[0].tolist(), similar[1].tolist()):
+            restaurant = self.restaurant_records.get(similar_id)
+            if restaurant is not None:
+                result.append(dict(restaurant, similarity=round(score, 4)))
+        return result
+
+    def records_for(self, place_ids, scores, distances=None):
+        """Join placeIDs against the placeID-keyed restaurant table, adding scores (and distances)"""
+        result = []
+        for position, (place_id, score) in enumerate(zip(place_ids.tolist(), scores.tolist())):
+            restaurant = self.restaurant_records.get(place_id)
+            if restaurant is None:
+                continue
+            record = dict(restaurant)
+            record['Recommendation Score'] = round(score, 2)
+            if distances is not None:
+                record['distance_km'] = round(float(distances[position]), 2)
+            result.append(record)
+        return result
+
+    def user_location(self, user_id):
+        """(latitude, longitude) of a user's profile, or None if unknown"""
+        users = self.entity_store.users
+        if user_id not in users:
+            return None
+        latitude, longitude = users.first(user_id, 'latitude'), users.first(user_id, 'longitude')
+        if latitude is None or longitude is None:
+            return None
+        return latitude, longitude
+
+    def nearby_recommendations(self, user_id, latitude, longitude, radius_km, top_n=10, open_at=None):
+        """Top-N restaurants within radius_km of a point, ranked by hybrid score, or None for an unknown user
+
+        Candidates come from the spatial index, so only the places in the radius are ranked.
+        With open_at only restaurants open at that local datetime are returned.
+        """
+        user_scores = self.user_scores(user_id)
+        if user_scores is None:
+            return None
+        place_ids, distances = self.geo_index.within(latitude, longitude, radius_km)
+        cols = self.cf_engine.place_ids.get_indexer(place_ids)
+        rated = cols >= 0
+        if open_at is not None:
+            rated &= self.opening_hours.open_mask(open_at, self.opening_hours.rows_for(place_ids))
+        place_ids, distances, cols = place_ids[rated], distances[rated], cols[rated]
+
+        scores = user_scores[cols]
+        # Best score first; nearer places first among equal scores
+        order = np.argsort(-scores, kind='stable')[:max(top_n, 0)]
+        return self.records_for(place_ids[order], scores[order], distances[order])
+
+
+# Model attribute -> CSV file in DATA_DIR, grouped as they are logged while loading
+DATASET_GROUPS = [
+    ('Loading restaurant datasets', {
+        'rest_pay': 'chefmozaccepts.csv',
+        'rest_cuisine': 'chefmozcuisine.csv',
+        'rest_hours': 'chefmozhours4.csv',
+        'rest_parking': 'chefmozparking.csv',
+        'rest_geo': 'geoplaces2.csv'
+    }),
+    ('Loading consumer datasets', {
+        'cons_cuisine': 'usercuisine.csv',
+        'cons_pay': 'userpayment.csv',
+        'cons_profile': 'userprofile.csv'
+    }),
+    ('Loading User-Item-Rating dataset', {
+        'rating': 'rating_final.csv'
+    })
+]
+DATASETS = {name: file_name for _, group in DATASET_GROUPS for name, file_name in group.items()}
+
+
+def load_tables(model):
+    """Load every CSV dataset into the model"""
+    for position, (title, group) in enumerate(DATASET_GROUPS):
+        print(('\n' if position else '') + title)
+        for name, file_name in group.items():
+            setattr(model, name, load_dataset(file_name))
+
+    # A user's latest rating of a place replaces earlier ones (ratings ingested at runtime are appended)
+    if model.rating is not None:
+        model.rating = model.rating.drop_duplicates(subset=['userID', 'placeID'], keep='last')
+
+    # Users who never rated a place stay in cons_profile: they are served from cold-start profiles
+
+
+# Collaborative filtering backends selectable with config.CF_BACKEND
+CF_BACKENDS = ['neighbours', 'als']
+
+
+def build_cf_engine(rating, backend=None):
+    """Train the collaborative filtering engine of a backend (config.CF_BACKEND by default)"""
+    backend = backend or config.CF_BACKEND
+    if backend == 'neighbours':
+        return SparseCF(rating, n_neighbours=config.CF_NEIGHBOURS, block_size=config.CF_BLOCK_SIZE)
+    if backend == 'als':
+        return ALSRecommender(
+            rating, factors=config.ALS_FACTORS, iterations=config.ALS_ITERATIONS,
+            regularization=config.ALS_REGULARIZATION, mode=config.ALS_MODE, alpha=config.ALS_ALPHA,
+            food_weight=config.ALS_FOOD_WEIGHT, service_weight=config.ALS_SERVICE_WEIGHT, threads=config.ALS_THREADS
+        )
+    raise ValueError(f'Unknown CF backend: {backend}')
+
+
+def build_cbf_engine(model, rating, user_ids, place_ids):
+    """Content-based engine aligned with the CF users and places, with cold-start profiles from the user tables"""
+    return ContentBased(
+        model.rest_geo, model.rest_cuisine, rating, user_ids, place_ids, FEATURE_COLUMNS, rest_pay=model.rest_pay,
+        cons_cuisine=model.cons_cuisine, cons_pay=model.cons_pay, cons_profile=model.cons_profile,
+        profile_features=PROFILE_FEATURES, block_size=config.CF_BLOCK_SIZE
+    )
+
+
+def build_engines(model):
+    """Build the CF and CBF engines, the similar places index, the top-N index and the candidate lists"""
+    rest_geo, rating = model.rest_geo, model.rating
+
+    # Initialize Collaborative Filtering (sparse top-k neighbours or ALS factors, scored on demand)
+    model.cf_engine = cf_engine = build_cf_engine(rating)
+
+    # Initialize Content-Based Filtering (scores aligned with the CF users and places)
+    model.cbf_engine = build_cbf_engine(model, rating, cf_engine.user_ids, cf_engine.place_ids)
+    model.encoder = model.cbf_engine.encoder
+
+    # Precompute each restaurant's most similar places (co-ratings blended with features)
+    with timed('similar_places'):
+        model.similar_places = SimilarPlaces(
+            rating, model.cbf_engine.item_profiles, model.cbf_engine.item_place_ids, k=config.SIMILAR_PLACES_K,
+            rating_weight=config.SIMILAR_RATING_WEIGHT, block_size=config.CF_BLOCK_SIZE
+        )
+
+    # Precompute each user's top-N hybrid recommendations and re-ranking candidates in one pass
+    build_popularity(model)
+    with timed('top_n_index'):
+        user_ids, place_ids = cf_engine.user_ids, np.asarray(cf_engine.place_ids)
+        model.top_n_index = TopNIndex(user_ids, place_ids, max_n=config.TOP_N_MAX)
+        popular_cols = np.argsort(-model.popularity, kind='stable')
+        model.candidate_index = CandidateIndex(user_ids, len(place_ids), popular_cols, k=config.RANKING_CANDIDATES)
+        for start in range(0, len(user_ids), config.CF_BLOCK_SIZE):
+            rows = np.arange(start, min(start + config.CF_BLOCK_SIZE, len(user_ids)))
+            blocks = model.component_scores_rows(rows)
+            model.top_n_index.set_rows(rows, *top_n_rows(blocks['hybrid'], place_ids, model.top_n_index.max_n))
+            model.candidate_index.set_rows(rows, blocks['cf'], blocks['cbf'])
+
+
+def build_popularity(model):
+    """Popularity scores of the CF place columns"""
+    model.popularity = popularity_scores(model.rating, model.cf_engine.place_ids)
+
+
+def ranking_weights(overrides=None):
+    """RANKING_WEIGHTS updated with per-request or per-bucket weights; raises ValueError for invalid ones"""
+    weights = dict(RANKING_WEIGHTS)
+    for name, value in (overrides or {}).items():
+        if name not in weights:
+            raise ValueError(f'Unknown ranking component: {name}')
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = -1.0
+        if not 0 <= value < float('inf'):
+            raise ValueError('Ranking weights must be non-negative numbers')
+        weights[name] = value
+    return weights
+
+
+def build_catalog(model):
+    """Build restaurant records, listing payloads, listing indexes and the entity store"""
+    rest_geo, rating = model.rest_geo, model.rating
+
+    # placeID-keyed restaurant table with JSON-ready values
+    unique_restaurants = rest_geo.drop_duplicates(subset=['placeID'])
+    model.restaurant_records = dict(zip(
+        unique_restaurants['placeID'].tolist(),
+        unique_restaurants.astype(object).where(unique_restaurants.notna(), None).to_dict(orient='records')
+    ))
+
+    # /api/restaurants and /api/users/all records, with the position of every placeID and userID
+    restaurants = build_restaurant_list(rest_geo, model.rest_cuisine, model.rest_pay, model.rest_parking, rating)
+    users = build_user_list(model.cons_profile, rating, model.cons_cuisine)
+    model.restaurant_list, model.user_list = restaurants, users
+    model.profile_user_ids = model.cons_profile['userID'].tolist()
+    model.listing_place_ids = np.array([record['placeID'] for record in restaurants])
+    model.restaurant_positions = KeyPositions(model.listing_place_ids)
+    model.user_positions = KeyPositions([record['userID'] for record in users])
+    model.stats = {
+        'total_users': len(model.cons_profile),
+        'total_restaurants': len(rest_geo),
+        'total_reviews': len(rating),
+        'user_cuisine_preferences': model.cons_cuisine['Rcuisine'].value_counts().to_dict(),
+        'user_payment_preferences': model.cons_pay['Upayment'].value_counts().to_dict(),
+        'restaurant_cuisines': model.rest_cuisine['Rcuisine'].value_counts().to_dict()
+    }
+
+    # Serialized /api/restaurants, /api/users/all and /api/stats payloads, encoded once per model
+    model.payloads = {}
+    for name in ('restaurants', 'users', 'stats'):
+        model.payload(name)
+
+    # Inverted indexes and sort orders for paged, filtered listings
+    model.restaurant_listing = build_restaurant_listing(restaurants)
+    model.user_listing = build_user_listing(users, model.cons_cuisine, model.cons_pay)
+
+    # Inverted index with prefix lookup for restaurant search and typeahead
+    model.search_index = SearchIndex(restaurants, rating_weight=config.SEARCH_RATING_WEIGHT)
+
+    # Spatial index over restaurant coordinates for nearby recommendations
+    model.geo_index = GeoIndex(
+        unique_restaurants['placeID'].to_numpy(), unique_restaurants['latitude'], unique_restaurants['longitude']
+    )
+
+    # Week bitmaps of opening hours, with the bitmap row of every listing record and CF place column
+    model.opening_hours = OpeningHours(unique_restaurants['placeID'].to_numpy(), model.rest_hours)
+    model.listing_hours_rows = model.opening_hours.rows_for([record['placeID'] for record in restaurants])
+    model.place_hours_rows = model.opening_hours.rows_for(model.cf_engine.place_ids)
+
+    # ID-keyed restaurants and users for the detail endpoints
+    model.entity_store = EntityStore(
+        restaurants, model.rest_hours, rating, model.cons_profile, model.cons_cuisine, model.cons_pay,
+        cache_size=config.ENTITY_CACHE_SIZE
+    )
+
+
+def build_model(version=0):
+    """Load all datasets from CSV and build a new recommendation model"""
+    start = time.perf_counter()
+    model = Model(version)
+    with collect_stages() as stages:
+        with timed('csv_load'):
+            load_tables(model)
+        build_engines(model)
+        with timed('catalog'):
+            build_catalog(model)
+    model.build_stages = stages
+    model.source = 'csv'
+    model.built_at = time.time()
+    model.build_seconds = time.perf_counter() - start
+    return model
+
+
+def model_to_snapshot(model):
+    """Tables, arrays and encoder vocabulary of a model, as written to a snapshot"""
+    tables = {name: getattr(model, name) for name in DATASETS}
+    arrays = dict(model.cf_engine.to_arrays())
+    arrays.update(model.cbf_engine.to_arrays())
+    arrays.update(model.similar_places.to_arrays())
+    arrays['top_n_place_ids'] = model.top_n_index.place_ids
+    arrays['top_n_scores'] = model.top_n_index.scores
+    arrays['candidates_popular_cols'] = model.candidate_index.popular_cols
+    arrays['candidates_cols'] = model.candidate_index.cols
+    arrays['candidates_cf_scores'] = model.candidate_index.cf_scores
+    arrays['candidates_cbf_scores'] = model.candidate_index.cbf_scores
+    vocabulary = {
+        column: [value.item() if hasattr(value, 'item') else value for value in categories]
+        for column, categories in zip(FEATURE_COLUMNS, model.encoder.categories_)
+    }
+    return tables, arrays, vocabulary
+
+
+def load_snapshot_model(path, version=0):
+    """Build a model from a snapshot directory; score arrays are memory-mapped read-only"""
+    start = time.perf_counter()
+    with collect_stages() as stages:
+        with timed('snapshot_load'):
+            tables, arrays, manifest = snapshot.load_snapshot(path)
+        model = _snapshot_model(tables, arrays, manifest, version)
+    model.build_stages = stages
+    model.source = f'snapshot:{os.path.basename(path)}'
+    model.built_at = time.time()
+    model.build_seconds = time.perf_counter() - start
+    return model
+
+
+def _snapshot_model(tables, arrays, manifest, version):
+    """Model with the engines rebuilt from snapshot arrays and the catalogue built from its tables"""
+    model = Model(version)
+    for name in DATASETS:
+        setattr(model, name, tables[name])
+
+    settings = manifest['settings']
+    if settings['CF_BACKEND'] == 'als':
+        model.cf_engine = ALSRecommender.from_arrays(arrays, settings)
+    else:
+        model.cf_engine = SparseCF.from_arrays(arrays, settings['CF_NEIGHBOURS'])
+    model.top_n_index = TopNIndex.from_arrays(model.cf_engine.user_ids, arrays['top_n_place_ids'], arrays['top_n_scores'])
+    model.candidate_index = CandidateIndex.from_arrays(
+        model.cf_engine.user_ids, arrays['candidates_popular_cols'], arrays['candidates_cols'],
+        arrays['candidates_cf_scores'], arrays['candidates_cbf_scores']
+    )
+    build_popularity(model)
+
+    # Encoder with the vocabulary it was fitted with
+    vocabulary = manifest['encoder_vocabulary']
+    model.encoder = OneHotEncoder(
+        categories=[vocabulary[column] for column in FEATURE_COLUMNS], sparse_output=True, handle_unknown='ignore'
+    )
+    model.encoder.fit(pd.DataFrame([[vocabulary[column][0] for column in FEATURE_COLUMNS]], columns=FEATURE_COLUMNS))
+    model.cbf_engine = ContentBased.from_arrays(
+        arrays, model.encoder, model.cf_engine.user_ids, model.cf_engine.place_ids, FEATURE_COLUMNS, PROFILE_FEATURES
+    )
+    model.similar_places = SimilarPlaces.from_arrays(arrays)
+
+    with timed('catalog'):
+        build_catalog(model)
+    return model
+
+
+def load_or_build_model(version=0):
+    """Load the current snapshot if it matches the CSV files and settings, else build from CSV"""
+    if config.SNAPSHOT_ENABLED:
+        path = snapshot.current_snapshot(config.SNAPSHOT_DIR)
+        if path is not None:
+            checksums = snapshot.source_checksums(config.DATA_DIR, DATASETS.values())
+            if snapshot.is_valid(path, checksums, snapshot.model_settings()):
+                print(f'Loading model snapshot {path}')
+                return load_snapshot_model(path, version)
+            print(f'Model snapshot {path} does not match the data files or settings; building from CSV')
+    return build_model(version)
+
+
+# Currently published model and build state (the model reference is swapped atomically)
+_current_model = None
+# Serialises everything that publishes a model, so ingested ratings are never lost to a concurrent rebuild
+_write_lock = threading.Lock()
+_build_lock = threading.Lock()
+_build_done = threading.Condition(_build_lock)
+_building = False
+_last_error = None
+
+
+def current_model():
+    """The published model, or None before the first build has finished"""
+    return _current_model
+
+
+def build_status():
+    """Lifecycle state: 'idle', 'building', 'ready' or 'failed', plus model details"""
+    model = _current_model
+    with _build_lock:
+        building, error = _building, _last_error
+    if model is not None:
+        state = 'ready'
+    elif building:
+        state = 'building'
+    elif error is not None:
+        state = 'failed'
+    else:
+        state = 'idle'
+    status = {'status': state, 'rebuilding': building and model is not None}
+    if model is not None:
+        status.update({
+            'version': model.version,
+            'built_at': model.built_at,
+            'build_seconds': round(model.build_seconds, 3),
+            'build_stages': {stage: round(seconds, 4) for stage, seconds in model.build_stages.items()},
+            'source': model.source,
+            'incremental_updates': model.incremental_updates
+        })
+    if error is not None:
+        status['last_error'] = error
+    return status
+
+
+def rebuild_model():
+    """Build a new model and publish it; concurrent callers share one build (single-flight)"""
+    global _current_model, _building, _last_error
+
+    with _build_lock:
+        if _building:
+            # Another thread is already building: wait for its result instead of building again
+            while _building:
+                _build_done.wait()
+            return _current_model
+        _building = True
+        version = _current_model.version + 1 if _current_model is not None else 1
+
+    model = None
+    try:
+        with _write_lock:
+            model = load_or_build_model(version)
+            with _build_lock:
+                _current_model = model
+                _last_error = None
+    except Exception as e:
+        print(f'Model build failed. Error: {e}')
+        with _build_lock:
+            _last_error = str(e)
+    finally:
+        with _build_lock:
+            _building = False
+            _build_done.notify_all()
+    return _current_model
+
+
+def ensure_model():
+    """Return the published model, building it in the calling thread if none exists yet"""
+    model = _current_model
+    if model is not None:
+        return model
+    return rebuild_model()
+
+
+def start_background_build():
+    """Start building the model in a daemon thread unless a build is running or finished"""
+    with _build_lock:
+        if _building or _current_model is not None:
+            return None
+    thread = threading.Thread(target=rebuild_model, name='model-build', daemon=True)
+    thread.start()
+    return thread
+
+
+def rating_rows(ratings):
+    """Rating table rows for a list of rating dicts (food and service ratings may be None)"""
+    rows = pd.DataFrame(ratings, columns=RATING_COLUMNS)
+    return rows.astype({'placeID': 'int32', 'rating': 'int8', 'food_rating': 'Int8', 'service_rating': 'Int8'})
+
+
+def refresh_catalog(model, base, new_rows):
+    """Update the rating summaries of the places and users of new rating rows in the catalogue
+
+    Only their records are replaced, in the listing indexes, the search index and the
+    entity store; the payloads are encoded again on first use. Search postings,
+    coordinates and opening hours do not depend on ratings and are kept as they are.
+    """
+    model.entity_store = base.entity_store.with_ratings(new_rows)
+
+    positions = base.restaurant_positions.find(new_rows['placeID'].unique())
+    restaurants = []
+    for position in positions.tolist():
+        record = dict(base.restaurant_list[position])
+        record['average_rating'], record['rating_count'] = model.entity_store.place_rating_summary(record['placeID'])
+        restaurants.append(record)
+    model.restaurant_listing = base.restaurant_listing.with_values(
+        positions, restaurants,
+        ranges={'rating': [record['average_rating'] for record in restaurants]},
+        sorts={
+            'rating': [record['average_rating'] for record in restaurants],
+            'rating_count': [record['rating_count'] for record in restaurants]
+        }
+    )
+    model.restaurant_list = model.restaurant_listing.records
+    model.search_index = base.search_index.with_records(positions.tolist(), restaurants)
+
+    positions = base.user_positions.find(new_rows['userID'].astype(str).unique())
+    users = []
+    for position in positions.tolist():
+        record = dict(base.user_list[position])
+        record['average_rating'], record['total_ratings'] = model.entity_store.user_rating_summary(record['userID'])
+        users.append(record)
+    model.user_listing = base.user_listing.with_values(
+        positions, users,
+        ranges={'rating': [record['average_rating'] for record in users]},
+        sorts={
+            'rating': [record['average_rating'] for record in users],
+            'total_ratings': [record['total_ratings'] for record in users]
+        }
+    )
+    model.user_list = model.user_listing.records
+
+    model.stats = dict(base.stats, total_reviews=len(model.rating))
+    model.payloads = {}
+
+
+def apply_ratings(base, ratings):
+    """New model with ratings added or replaced, rescoring only the users they affect
+
+    ratings is a list of dicts with the RATING_COLUMNS keys. CF similarities of the raters
+    and their co-raters are updated exactly; CBF profiles of the raters are recomputed
+    with the scaling constants of the last full build. Places without ratings at build
+    time are not CF columns yet and only start to be scored after the next full build, and
+    the similar places index is kept as built until then.
+    """
+    model = copy.copy(base)
+    model.version = base.version + 1
+    model.incremental_updates = base.incremental_updates + len(ratings)
+
+    # Upsert the rating table: the latest rating of a (userID, placeID) pair wins
+    new_rows = rating_rows(ratings)
+    model.rating = datasets.concat([base.rating, new_rows]).drop_duplicates(
+        subset=['userID', 'placeID'], keep='last'
+    )
+
+    model.cf_engine, affected = base.cf_engine.with_ratings(new_rows)
+
+    # Content-based profiles of the raters (their places rated above 1, else their cold-start profile)
+    user_ids = new_rows['userID'].unique().tolist()
+    rated = model.rating[model.rating['userID'].isin(user_ids) & (model.rating['rating'] > 1)]
+    high_rated = rated.groupby('userID', observed=True)['placeID'].agg(list).to_dict()
+    profiles = {
+        model.cf_engine.row(user_id): (user_id, high_rated.get(user_id, []))
+        for user_id in user_ids if user_id in model.cf_engine
+    }
+    model.cbf_engine = base.cbf_engine.with_profiles(profiles)
+
+    # Refresh the precomputed top-N and candidates of every user whose scores changed
+    rows = np.array(sorted(set(affected) | set(profiles)), dtype=np.int64)
+    place_ids = np.asarray(model.cf_engine.place_ids)
+    top_n_index, candidate_index = base.top_n_index, base.candidate_index
+    for start in range(0, len(rows), config.CF_BLOCK_SIZE):
+        block = rows[start:start + config.CF_BLOCK_SIZE]
+        blocks = model.component_scores_rows(block)
+        block_user_ids = [model.cf_engine.user_id(row) for row in block.tolist()]
+        top_place_ids, top_scores = top_n_rows(blocks['hybrid'], place_ids, top_n_index.max_n)
+        top_n_index = top_n_index.with_users(block_user_ids, top_place_ids, top_scores)
+        candidate_index = candidate_index.with_users(block_user_ids, blocks['cf'], blocks['cbf'])
+    model.top_n_index, model.candidate_index = top_n_index, candidate_index
+    build_popularity(model)
+
+    refresh_catalog(model, base, new_rows)
+    model.built_at = time.time()
+    return model, {
+        'version': model.version,
+        'ratings': len(ratings),
+        'users_rescored': len(rows),
+        'pending_rebuild': sorted({rating['placeID'] for rating in ratings if rating['placeID'] not in model.cf_engine.place_index})
+    }
+
+
+def ingest_ratings(ratings):
+    """Apply ratings to the published model, append them to the rating CSV and publish the result"""
+    global _current_model
+
+    ensure_model()
+    with _write_lock:
+        base = _current_model
+        if base is None:
+            raise RuntimeError('Model is not ready')
+        start = time.perf_counter()
+        model, summary = apply_ratings(base, ratings)
+        if config.PERSIST_RATINGS:
+            rating_rows(ratings).to_csv(
+                os.path.join(config.DATA_DIR, DATASETS['rating']), mode='a', header=False, index=False
+            )
+        model.build_seconds = time.perf_counter() - start
+        with _build_lock:
+            _current_model = model
+    return summary
@@ -0,0 +1,89 @@
+"""
+Sampling profiler for the slowest requests of the Restaurant Recommendation System
+
+When enabled (PROFILE_SLOW_REQUESTS > 0), one background thread samples the Python
+stack of every thread that is handling a request every PROFILE_INTERVAL_MS
+milliseconds. When a request ends its samples are kept if it is among the slowest
+requests seen so far, as collapsed stacks ("outer;inner;innermost count", the input
+format of flame graph tools). Requests are never slowed down by more than the
+sampling thread's share of the GIL.
+"""
+
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+MAX_DEPTH = 64
+
+
+def collapsed_stack(frame):
+    """Root-first 'function (file:line)' frames of a stack joined with ';'"""
+    frames = []
+    while frame is not None and len(frames) < MAX_DEPTH:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler:
+    """Samples the stacks of in-flight requests and keeps the profiles of the slowest ones"""
+
+    def __init__(self, keep, interval_ms=5):
+        self.keep = keep
+        self.interval = interval_ms / 1000
+        self._active = {}
+        self._slowest = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_sampler(self):
+        """Start the sampling thread, again in a forked worker (caller holds the lock)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._active = {}
+            threading.Thread(target=self._sample, name='request-profiler', daemon=True).start()
+
+    def begin(self):
+        """Start sampling the calling thread"""
+        with self._lock:
+            self._ensure_sampler()
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, seconds, **details):
+        """Stop sampling the calling thread and keep its profile if it is among the slowest requests"""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+            if samples is None:
+                return
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            profile = dict(details, seconds=round(seconds, 6), samples=sum(samples.values()), stacks=[
+                f'{stack} {count}' for stack, count in samples.most_common()
+            ])
+            entry = (seconds, next(self._sequence), profile)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heapreplace(self._slowest, entry)
+
+    def profiles(self):
+        """Kept profiles, slowest first"""
+        with self._lock:
+            return [profile for _, _, profile in sorted(self._slowest, key=lambda entry: entry[:2], reverse=True)]
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[collapsed_stack(frame)] += 1
@@ -0,0 +1,1190 @@
+"""
+Recommendation engines for the Restaurant Recommendation System
+"""
+
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import OneHotEncoder
+
+from metrics import timed
+
+
+def build_user_item_matrix(rating):
+    """Build a CSR user-item rating matrix with sorted user and place IDs (same layout as pivot_table)
+
+    If a user rated a place more than once, the latest rating wins.
+    """
+    ratings = rating.drop_duplicates(subset=['userID', 'placeID'], keep='last')
+    user_ids = np.sort(ratings['userID'].unique())
+    place_ids = np.sort(ratings['placeID'].unique())
+    rows = np.searchsorted(user_ids, ratings['userID'].to_numpy())
+    cols = np.searchsorted(place_ids, ratings['placeID'].to_numpy())
+    matrix = sparse.csr_matrix(
+        (ratings['rating'].to_numpy(dtype=np.float64), (rows, cols)),
+        shape=(len(user_ids), len(place_ids))
+    )
+    matrix.sort_indices()
+    return matrix, pd.Index(user_ids, name='userID'), pd.Index(place_ids, name='placeID')
+
+
+def _row_norms(matrix):
+    """L2 norm of every row of a CSR matrix"""
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+
+
+def _csr_arrays(prefix, matrix):
+    """data, indices and indptr arrays of a CSR matrix, for model snapshots"""
+    return {f'{prefix}_data': matrix.data, f'{prefix}_indices': matrix.indices, f'{prefix}_indptr': matrix.indptr}
+
+
+def _csr_from_arrays(arrays, prefix, shape):
+    """CSR matrix from the arrays written by _csr_arrays (memory-mapped arrays are not copied)"""
+    return sparse.csr_matrix((arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'], arrays[f'{prefix}_indptr']), shape=shape)
+
+
+def _normalize_rows(matrix):
+    """L2-normalise the rows of a CSR matrix, leaving all-zero rows untouched"""
+    norms = _row_norms(matrix)
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def _top_k_rows(block, k):
+    """Keep the k largest entries of every row of a CSR block"""
+    block = block.tocsr()
+    block.sort_indices()
+    if k is None:
+        return block
+    counts = np.diff(block.indptr)
+    if counts.max(initial=0) <= k:
+        return block
+    keep = np.ones(block.nnz, dtype=bool)
+    for row in np.flatnonzero(counts > k):
+        start, end = block.indptr[row], block.indptr[row + 1]
+        order = np.argpartition(-block.data[start:end], k)
+        keep[start + order[k:]] = False
+    rows = np.repeat(np.arange(block.shape[0]), counts)[keep]
+    pruned = sparse.csr_matrix((block.data[keep], (rows, block.indices[keep])), shape=block.shape)
+    pruned.sort_indices()
+    return pruned
+
+
+def _top_k_entries(cols, values, k):
+    """The k largest entries of one sparse row, as (cols, values) sorted by col"""
+    if k is not None and len(values) > k:
+        keep = np.argpartition(-values, k)[:k]
+        cols, values = cols[keep], values[keep]
+    order = np.argsort(cols)
+    return cols[order], values[order]
+
+
+def top_n_rows(block, place_ids, n):
+    """(placeIDs, scores) of the n best places of every row of a dense score block, best first
+
+    Ties are broken in column order, which is placeID order for the CF place columns, so
+    any block holding the same scores for the same places gives the same ranking.
+    """
+    if n <= 0:
+        candidates = np.empty((block.shape[0], 0), dtype=np.int64)
+    elif n < block.shape[1]:
+        # Every place above the n-th best score, then the first places tied with it
+        kth = -np.partition(-block, n - 1, axis=1)[:, n - 1:n]
+        above = block > kth
+        tied = block == kth
+        keep = above | (tied & (np.cumsum(tied, axis=1) <= n - above.sum(axis=1, keepdims=True)))
+        candidates = np.nonzero(keep)[1].reshape(block.shape[0], n)
+    else:
+        candidates = np.tile(np.arange(block.shape[1]), (block.shape[0], 1))
+    candidate_scores = np.take_along_axis(block, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return place_ids[np.take_along_axis(candidates, order, axis=1)], np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def popularity_scores(rating, place_ids):
+    """Popularity of every place on the 0-2 rating scale: log(1 + ratings), relative to the most rated place"""
+    ratings = rating.drop_duplicates(subset=['userID', 'placeID'], keep='last')
+    counts = ratings['placeID'].value_counts().reindex(place_ids, fill_value=0).to_numpy(dtype=np.float64)
+    most = np.log1p(counts.max(initial=0))
+    return 2 * np.log1p(counts) / most if most > 0 else np.zeros(len(counts))
+
+
+def rating_updates(rows):
+    """Map userID -> {placeID: rating} for some rating table rows, the last row of a pair winning"""
+    updates = {}
+    for user_id, place_id, value in zip(rows['userID'].tolist(), rows['placeID'].tolist(), rows['rating'].tolist()):
+        updates.setdefault(user_id, {})[place_id] = value
+    return updates
+
+
+class SparseCF:
+    """User-based collaborative filtering on a sparse user-item matrix with top-k neighbours
+
+    Memory is proportional to the number of ratings plus users x n_neighbours; scores
+    for a user are computed on demand as a sparse neighbour row times the rating matrix.
+
+    An engine is never modified once built: with_ratings() returns a new engine that
+    shares the base matrices and keeps the changed rating and neighbour rows in small
+    overlay dictionaries keyed by matrix row.
+    """
+
+    def __init__(self, rating, n_neighbours=200, block_size=1024):
+        self.n_neighbours = n_neighbours
+        with timed('user_item_matrix'):
+            self.user_item, self.user_ids, self.place_ids = build_user_item_matrix(rating)
+        with timed('cf_similarity'):
+            self.neighbours = self._build_neighbours(block_size)
+
+        # Normaliser for each user: sum of absolute neighbour similarities (0 replaced by 1)
+        sim_sums = np.asarray(abs(self.neighbours).sum(axis=1)).ravel()
+        sim_sums[sim_sums == 0] = 1
+        self.sim_sums = sim_sums
+        self._init_lookups()
+
+    def _init_lookups(self):
+        """ID lookups, row norms and empty overlays for incremental updates"""
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self.place_index = {place_id: col for col, place_id in enumerate(self.place_ids)}
+        self.norms = _row_norms(self.user_item)
+        # Users added after the build get rows after the base matrix, in order of arrival
+        self.new_user_ids = []
+        self._new_user_index = {}
+        self._rating_rows = {}
+        self._neighbour_rows = {}
+        self._sim_sums = {}
+        # Base rows whose ratings are overlaid, for finding the scores that need the overlays
+        self._overridden = np.zeros(len(self.user_ids), dtype=bool)
+
+    def _build_neighbours(self, block_size):
+        """Cosine similarity between users, keeping only the top-k neighbours of each user"""
+        normalized = _normalize_rows(self.user_item).tocsr()
+        transposed = normalized.T.tocsc()
+        blocks = []
+        for start in range(0, normalized.shape[0], block_size):
+            block = normalized[start:start + block_size] @ transposed
+            blocks.append(_top_k_rows(block, self.n_neighbours))
+        if not blocks:
+            return sparse.csr_matrix((0, 0))
+        return sparse.vstack(blocks, format='csr')
+
+    @classmethod
+    def from_arrays(cls, arrays, n_neighbours):
+        """Rebuild an engine from the arrays written by to_arrays (memory-mapped arrays are not copied)"""
+        engine = cls.__new__(cls)
+        engine.n_neighbours = n_neighbours
+        engine.user_ids = pd.Index(arrays['cf_user_ids'], name='userID')
+        engine.place_ids = pd.Index(arrays['cf_place_ids'], name='placeID')
+        shape = (len(engine.user_ids), len(engine.place_ids))
+        engine.user_item = sparse.csr_matrix(
+            (arrays['cf_user_item_data'], arrays['cf_user_item_indices'], arrays['cf_user_item_indptr']), shape=shape
+        )
+        engine.neighbours = sparse.csr_matrix(
+            (arrays['cf_neighbours_data'], arrays['cf_neighbours_indices'], arrays['cf_neighbours_indptr']),
+            shape=(shape[0], shape[0])
+        )
+        engine.sim_sums = arrays['cf_sim_sums']
+        engine._init_lookups()
+        return engine
+
+    def to_arrays(self):
+        """Plain NumPy arrays describing the engine, for model snapshots"""
+        if self._rating_rows:
+            raise ValueError('Engines with incremental updates cannot be written to a snapshot')
+        return {
+            'cf_user_ids': np.asarray(self.user_ids, dtype=str),
+            'cf_place_ids': np.asarray(self.place_ids),
+            'cf_user_item_data': self.user_item.data,
+            'cf_user_item_indices': self.user_item.indices,
+            'cf_user_item_indptr': self.user_item.indptr,
+            'cf_neighbours_data': self.neighbours.data,
+            'cf_neighbours_indices': self.neighbours.indices,
+            'cf_neighbours_indptr': self.neighbours.indptr,
+            'cf_sim_sums': self.sim_sums
+        }
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the sparse matrices"""
+        total = 0
+        for matrix in (self.user_item, self.neighbours):
+            total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return total
+
+    @property
+    def n_users(self):
+        """Number of matrix rows, including users added incrementally"""
+        return len(self.user_ids) + len(self.new_user_ids)
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index or user_id in self._new_user_index
+
+    def row(self, user_id):
+        """Row number of a user in the rating matrix"""
+        row = self.user_index.get(user_id)
+        return row if row is not None else self._new_user_index[user_id]
+
+    def user_id(self, row):
+        """User ID of a rating matrix row"""
+        return self.user_ids[row] if row < len(self.user_ids) else self.new_user_ids[row - len(self.user_ids)]
+
+    def rating_row(self, row):
+        """(place columns, ratings) of one matrix row"""
+        if row in self._rating_rows:
+            return self._rating_rows[row]
+        start, end = self.user_item.indptr[row], self.user_item.indptr[row + 1]
+        return self.user_item.indices[start:end], self.user_item.data[start:end]
+
+    def neighbour_row(self, row):
+        """(neighbour rows, similarities) of one matrix row"""
+        if row in self._neighbour_rows:
+            return self._neighbour_rows[row]
+        start, end = self.neighbours.indptr[row], self.neighbours.indptr[row + 1]
+        return self.neighbours.indices[start:end], self.neighbours.data[start:end]
+
+    def _score_row(self, row):
+        """CF scores of one row, reading rating and neighbour rows through the overlays"""
+        neighbour_rows, similarities = self.neighbour_row(row)
+        overridden = np.array([other in self._rating_rows for other in neighbour_rows.tolist()], dtype=bool)
+        base = ~overridden
+        weights = sparse.csr_matrix(
+            (similarities[base], neighbour_rows[base], [0, int(base.sum())]), shape=(1, len(self.user_ids))
+        )
+        scores = (weights @ self.user_item).toarray()[0]
+        for other, similarity in zip(neighbour_rows[overridden].tolist(), similarities[overridden].tolist()):
+            cols, ratings = self._rating_rows[other]
+            scores[cols] += similarity * ratings
+        return scores / self._sim_sums.get(row, self.sim_sums[row] if row < len(self.user_ids) else 1.0)
+
+    def scores_rows(self, rows):
+        """Dense CF scores (len(rows) x places) for the given matrix rows
+
+        Rows untouched by incremental updates (base neighbour row, no neighbour with
+        overlaid ratings) are scored with one sparse product; the others row by row.
+        """
+        rows = np.atleast_1d(rows)
+        if not self._rating_rows:
+            weighted = self.neighbours[rows] @ self.user_item
+            return weighted.toarray() / self.sim_sums[rows][:, np.newaxis]
+
+        fast = rows < len(self.user_ids)
+        fast[fast] = np.array([row not in self._neighbour_rows for row in rows[fast].tolist()], dtype=bool)
+        neighbours = self.neighbours[rows[fast]]
+        entry_rows = np.repeat(np.arange(neighbours.shape[0]), np.diff(neighbours.indptr))
+        has_overridden = np.bincount(
+            entry_rows, weights=self._overridden[neighbours.indices], minlength=neighbours.shape[0]
+        ) > 0
+        fast[fast] = ~has_overridden
+
+        scores = np.empty((len(rows), len(self.place_ids)))
+        if fast.any():
+            weighted = self.neighbours[rows[fast]] @ self.user_item
+            scores[fast] = weighted.toarray() / self.sim_sums[rows[fast]][:, np.newaxis]
+        for position in np.flatnonzero(~fast).tolist():
+            scores[position] = self._score_row(int(rows[position]))
+        return scores
+
+    def scores(self, user_id):
+        """CF scores of one user for every place, as a Series indexed by placeID"""
+        if user_id not in self:
+            return None
+        return pd.Series(self.scores_rows(self.row(user_id))[0], index=self.place_ids)
+
+    def _dots(self, cols, values):
+        """Dot product of every row of the rating matrix with one sparse rating row"""
+        vector = np.zeros(len(self.place_ids))
+        vector[cols] = values
+        dots = np.zeros(self.n_users)
+        dots[:len(self.user_ids)] = self.user_item @ vector
+        for row, (row_cols, row_values) in self._rating_rows.items():
+            dots[row] = row_values @ vector[row_cols]
+        return dots
+
+    def _norms(self):
+        """L2 norm of every row of the rating matrix"""
+        norms = np.zeros(self.n_users)
+        norms[:len(self.user_ids)] = self.norms
+        for row, (_, values) in self._rating_rows.items():
+            norms[row] = np.sqrt(values @ values)
+        return norms
+
+    def _update_similarities(self, row, old_cols, old_values):
+        """Recompute the similarities of one row after its ratings changed; returns the rows whose scores changed"""
+        cols, values = self._rating_rows[row]
+        norms = self._norms()
+        denominators = norms * norms[row]
+        new_dots = self._dots(cols, values)
+        similarities = np.divide(new_dots, denominators, out=np.zeros(self.n_users), where=denominators > 0)
+
+        # The row's own top-k neighbours
+        candidates = np.flatnonzero(similarities)
+        neighbour_rows, neighbour_sims = _top_k_entries(candidates, similarities[candidates], self.n_neighbours)
+        self._neighbour_rows[row] = (neighbour_rows, neighbour_sims)
+        self._sim_sums[row] = float(np.abs(neighbour_sims).sum()) or 1.0
+
+        # Its entry in the neighbour rows of every user it shares a rated place with, now or before
+        touched = np.flatnonzero((new_dots != 0) | (self._dots(old_cols, old_values) != 0))
+        touched = touched[touched != row]
+        for other in touched.tolist():
+            other_rows, other_sims = self.neighbour_row(other)
+            entries = dict(zip(other_rows.tolist(), other_sims.tolist()))
+            if similarities[other] != 0:
+                entries[row] = float(similarities[other])
+            else:
+                entries.pop(row, None)
+            other_rows = np.fromiter(entries.keys(), dtype=np.int64, count=len(entries))
+            other_sims = np.fromiter(entries.values(), dtype=np.float64, count=len(entries))
+            other_rows, other_sims = _top_k_entries(other_rows, other_sims, self.n_neighbours)
+            self._neighbour_rows[other] = (other_rows, other_sims)
+            self._sim_sums[other] = float(np.abs(other_sims).sum()) or 1.0
+        return {row} | set(touched.tolist())
+
+    def with_ratings(self, rows):
+        """New engine with some ratings added or replaced, plus the sorted rows whose scores changed
+
+        rows are rating table rows (the last one of a userID/placeID pair wins). Places
+        that are not columns of the matrix (no ratings at build time) are skipped until
+        the next full build.
+        """
+        engine = copy.copy(self)
+        engine.new_user_ids = list(self.new_user_ids)
+        engine._new_user_index = dict(self._new_user_index)
+        engine._rating_rows = dict(self._rating_rows)
+        engine._neighbour_rows = dict(self._neighbour_rows)
+        engine._sim_sums = dict(self._sim_sums)
+
+        affected = set()
+        for user_id, place_ratings in rating_updates(rows).items():
+            changes = {
+                engine.place_index[place_id]: float(value)
+                for place_id, value in place_ratings.items() if place_id in engine.place_index
+            }
+            if not changes:
+                continue
+            if user_id in engine:
+                row = engine.row(user_id)
+                old_cols, old_values = engine.rating_row(row)
+            else:
+                row = engine.n_users
+                engine._new_user_index[user_id] = row
+                engine.new_user_ids.append(user_id)
+                old_cols, old_values = np.empty(0, dtype=np.int64), np.empty(0)
+            merged = dict(zip(old_cols.tolist(), old_values.tolist()))
+            merged.update(changes)
+            cols = np.array(sorted(merged), dtype=np.int64)
+            engine._rating_rows[row] = (cols, np.array([merged[col] for col in cols.tolist()], dtype=np.float64))
+            affected |= engine._update_similarities(row, old_cols, old_values)
+        engine._overridden = self._overridden.copy()
+        engine._overridden[[row for row in engine._rating_rows if row < len(engine.user_ids)]] = True
+        return engine, sorted(affected)
+
+
+def blended_ratings(rating, food_weight=0.0, service_weight=0.0):
+    """Rating table whose 'rating' is the weighted mean of the overall, food and service ratings
+
+    Missing food or service ratings are left out of the mean, so the 0-2 scale is kept.
+    """
+    total = rating['rating'].astype(float)
+    weights = pd.Series(1.0, index=rating.index)
+    for column, weight in (('food_rating', food_weight), ('service_rating', service_weight)):
+        if weight and column in rating:
+            present = rating[column].notna()
+            total = total + weight * rating[column].astype(float).fillna(0)
+            weights = weights + weight * present
+    return rating.assign(rating=total / weights)
+
+
+class ALSRecommender:
+    """Matrix factorization CF trained with alternating least squares
+
+    Users and places get `factors`-dimensional vectors; a user's scores are one
+    vector-by-matrix product, clipped to the rating range. In 'explicit' mode the
+    factors fit the observed ratings with weighted-lambda regularisation; in 'implicit'
+    mode every rating is a positive interaction with confidence 1 + alpha * rating
+    (Hu, Koren & Volinsky), and scores are scaled to the rating range.
+
+    The training target is the overall rating, optionally blended with the food and
+    service ratings (see blended_ratings).
+
+    Like SparseCF the engine is never modified once trained: with_ratings() folds the
+    changed users back in against the fixed place factors and returns a new engine.
+    """
+
+    def __init__(self, rating, factors=32, iterations=15, regularization=0.1, mode='explicit', alpha=10.0,
+                 food_weight=0.0, service_weight=0.0, threads=1, seed=42):
+        if mode not in ('explicit', 'implicit'):
+            raise ValueError(f'Unknown ALS mode: {mode}')
+        self.food_weight = food_weight
+        self.service_weight = service_weight
+        rating = blended_ratings(rating, food_weight, service_weight)
+        self.factors = factors
+        self.regularization = regularization
+        self.mode = mode
+        self.alpha = alpha
+        self.threads = max(threads, 1)
+        with timed('user_item_matrix'):
+            self.user_item, self.user_ids, self.place_ids = build_user_item_matrix(rating)
+
+        rng = np.random.default_rng(seed)
+        self.user_factors = rng.normal(scale=0.1, size=(len(self.user_ids), factors))
+        self.item_factors = rng.normal(scale=0.1, size=(len(self.place_ids), factors))
+        item_user = self.user_item.T.tocsr()
+        with timed('als_training'):
+            for _ in range(iterations):
+                self.user_factors = self._solve_rows(self.user_item, self.item_factors)
+                self.item_factors = self._solve_rows(item_user, self.user_factors)
+        self._init_lookups()
+
+    def _init_lookups(self):
+        """ID lookups, score range and empty overlays for incremental updates"""
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self.place_index = {place_id: col for col, place_id in enumerate(self.place_ids)}
+        self.max_rating = float(self.user_item.data.max()) if self.user_item.nnz else 1.0
+        self.new_user_ids = []
+        self._new_user_index = {}
+        self._rating_rows = {}
+        self._user_vectors = {}
+
+    def _solve_row(self, cols, values, fixed, gram):
+        """Least-squares factor vector of one row given the fixed factors of the other side"""
+        if len(cols) == 0:
+            return np.zeros(self.factors)
+        selected = fixed[cols]
+        if self.mode == 'explicit':
+            a = selected.T @ selected + self.regularization * len(cols) * np.eye(self.factors)
+            b = selected.T @ values
+        else:
+            confidence = 1 + self.alpha * values
+            a = gram + (selected.T * (confidence - 1)) @ selected + self.regularization * np.eye(self.factors)
+            b = selected.T @ confidence
+        return np.linalg.solve(a, b)
+
+    def _solve_rows(self, matrix, fixed):
+        """Solve every row of a CSR matrix against fixed factors, split across threads"""
+        gram = fixed.T @ fixed if self.mode == 'implicit' else None
+        result = np.zeros((matrix.shape[0], self.factors))
+
+        def solve_range(start, end):
+            for row in range(start, end):
+                lo, hi = matrix.indptr[row], matrix.indptr[row + 1]
+                result[row] = self._solve_row(matrix.indices[lo:hi], matrix.data[lo:hi], fixed, gram)
+
+        chunk = -(-matrix.shape[0] // self.threads) if matrix.shape[0] else 1
+        ranges = [(start, min(start + chunk, matrix.shape[0])) for start in range(0, matrix.shape[0], chunk)]
+        if self.threads == 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                solve_range(start, end)
+        else:
+            with ThreadPoolExecutor(max_workers=self.threads) as executor:
+                list(executor.map(lambda bounds: solve_range(*bounds), ranges))
+        return result
+
+    @classmethod
+    def from_arrays(cls, arrays, settings):
+        """Rebuild an engine from the arrays written by to_arrays and its ALS settings"""
+        engine = cls.__new__(cls)
+        engine.factors = settings['ALS_FACTORS']
+        engine.regularization = settings['ALS_REGULARIZATION']
+        engine.mode = settings['ALS_MODE']
+        engine.alpha = settings['ALS_ALPHA']
+        engine.food_weight = settings['ALS_FOOD_WEIGHT']
+        engine.service_weight = settings['ALS_SERVICE_WEIGHT']
+        engine.threads = 1
+        engine.user_ids = pd.Index(arrays['als_user_ids'], name='userID')
+        engine.place_ids = pd.Index(arrays['als_place_ids'], name='placeID')
+        engine.user_item = sparse.csr_matrix(
+            (arrays['als_user_item_data'], arrays['als_user_item_indices'], arrays['als_user_item_indptr']),
+            shape=(len(engine.user_ids), len(engine.place_ids))
+        )
+        engine.user_factors = arrays['als_user_factors']
+        engine.item_factors = arrays['als_item_factors']
+        engine._init_lookups()
+        return engine
+
+    def to_arrays(self):
+        """Plain NumPy arrays describing the engine, for model snapshots"""
+        if self._rating_rows:
+            raise ValueError('Engines with incremental updates cannot be written to a snapshot')
+        return {
+            'als_user_ids': np.asarray(self.user_ids, dtype=str),
+            'als_place_ids': np.asarray(self.place_ids),
+            'als_user_item_data': self.user_item.data,
+            'als_user_item_indices': self.user_item.indices,
+            'als_user_item_indptr': self.user_item.indptr,
+            'als_user_factors': self.user_factors,
+            'als_item_factors': self.item_factors
+        }
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the rating matrix and the factors"""
+        matrix = self.user_item
+        return (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+                + self.user_factors.nbytes + self.item_factors.nbytes)
+
+    @property
+    def n_users(self):
+        """Number of users, including users added incrementally"""
+        return len(self.user_ids) + len(self.new_user_ids)
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index or user_id in self._new_user_index
+
+    def row(self, user_id):
+        """Row number of a user in the user factors"""
+        row = self.user_index.get(user_id)
+        return row if row is not None else self._new_user_index[user_id]
+
+    def user_id(self, row):
+        """User ID of a user factor row"""
+        return self.user_ids[row] if row < len(self.user_ids) else self.new_user_ids[row - len(self.user_ids)]
+
+    def rating_row(self, row):
+        """(place columns, ratings) of one user"""
+        if row in self._rating_rows:
+            return self._rating_rows[row]
+        start, end = self.user_item.indptr[row], self.user_item.indptr[row + 1]
+        return self.user_item.indices[start:end], self.user_item.data[start:end]
+
+    def scores_rows(self, rows):
+        """Dense scores (len(rows) x places) for the given user rows"""
+        rows = np.atleast_1d(rows)
+        if self._user_vectors:
+            vectors = np.array([
+                self._user_vectors[row] if row in self._user_vectors else self.user_factors[row] for row in rows.tolist()
+            ]).reshape(len(rows), self.factors)
+        else:
+            vectors = self.user_factors[rows]
+        scores = vectors @ self.item_factors.T
+        if self.mode == 'implicit':
+            scores = scores * self.max_rating
+        return np.clip(scores, 0, self.max_rating)
+
+    def scores(self, user_id):
+        """Scores of one user for every place, as a Series indexed by placeID"""
+        if user_id not in self:
+            return None
+        return pd.Series(self.scores_rows(self.row(user_id))[0], index=self.place_ids)
+
+    def with_ratings(self, rows):
+        """New engine with some ratings added or replaced, plus the sorted rows whose scores changed
+
+        rows are rating table rows. Changed users are folded in against the place factors
+        of the last training run; places that are not columns of the matrix are skipped
+        until the next full build.
+        """
+        engine = copy.copy(self)
+        engine.new_user_ids = list(self.new_user_ids)
+        engine._new_user_index = dict(self._new_user_index)
+        engine._rating_rows = dict(self._rating_rows)
+        engine._user_vectors = dict(self._user_vectors)
+        gram = self.item_factors.T @ self.item_factors if self.mode == 'implicit' else None
+
+        affected = set()
+        rows = blended_ratings(rows, self.food_weight, self.service_weight)
+        for user_id, place_ratings in rating_updates(rows).items():
+            changes = {
+                engine.place_index[place_id]: float(value)
+                for place_id, value in place_ratings.items() if place_id in engine.place_index
+            }
+            if not changes:
+                continue
+            if user_id in engine:
+                row = engine.row(user_id)
+                old_cols, old_values = engine.rating_row(row)
+            else:
+                row = engine.n_users
+                engine._new_user_index[user_id] = row
+                engine.new_user_ids.append(user_id)
+                old_cols, old_values = np.empty(0, dtype=np.int64), np.empty(0)
+            merged = dict(zip(old_cols.tolist(), old_values.tolist()))
+            merged.update(changes)
+            cols = np.array(sorted(merged), dtype=np.int64)
+            values = np.array([merged[col] for col in cols.tolist()], dtype=np.float64)
+            engine._rating_rows[row] = (cols, values)
+            engine._user_vectors[row] = engine._solve_row(cols, values, engine.item_factors, gram)
+            affected.add(row)
+        return engine, sorted(affected)
+
+
+class ContentBased:
+    """Content-based filtering on sparse one-hot encoded restaurant features
+
+    Every place has one encoded item row per cuisine. A user's profile is the mean of the
+    item rows of the places they rated above 1. Users without such a rating fall back to a
+    cold-start profile built from their cuisine and payment preferences and the profile
+    attributes mapped onto restaurant features (budget -> price, ...), scored against item
+    rows extended with the payments their place accepts. Profiles are sparse rows scored on
+    demand by cosine similarity against every item row, scaled per item row to the CF range
+    (0-2) with the minimum and maximum over all users of the build (rating and cold-start
+    profiles separately), and reduced to the best-matching item row of each place. Score
+    rows are aligned with the rows and columns of the CF matrix.
+    """
+
+    def __init__(self, rest_geo, rest_cuisine, rating, user_ids, place_ids, feature_columns, rest_pay=None,
+                 cons_cuisine=None, cons_pay=None, cons_profile=None, profile_features=None, block_size=1024):
+        rest_features = rest_geo[['placeID'] + feature_columns[:-1]].merge(
+            rest_cuisine[['placeID', feature_columns[-1]]], on='placeID', how='left'
+        )
+        rest_features[feature_columns[-1]] = rest_features[feature_columns[-1]].astype(object).fillna('Unknown')
+        self.feature_columns = list(feature_columns)
+        self.profile_features = dict(profile_features or {})
+
+        with timed('one_hot_encoding'):
+            self.encoder = OneHotEncoder(sparse_output=True, handle_unknown='ignore')
+            self.encoder.fit(rest_features[feature_columns])
+            self.item_profiles = self.encoder.transform(rest_features[feature_columns]).tocsr()
+            self.item_place_ids = rest_features['placeID'].to_numpy()
+            payments = rest_pay['Rpayment'].dropna().astype(str) if rest_pay is not None else pd.Series([], dtype=object)
+            self.payment_ids = pd.Index(np.sort(payments.unique()))
+            self.item_payments = self._item_payments(rest_pay)
+        self._init_lookups(user_ids, place_ids)
+
+        with timed('cbf_cosine'):
+            high = rating[rating['rating'] > 1].drop_duplicates(subset=['userID', 'placeID'], keep='last')
+            user_rows = self.user_ids.get_indexer(high['userID'])
+            self.profiles, _ = self._profiles(user_rows, high['placeID'].tolist(), len(user_ids))
+            self.cold_user_ids, self.cold_profiles = self._cold_start_profiles(cons_cuisine, cons_pay, cons_profile)
+            self._init_users()
+            self.item_min, self.item_max = self._score_range(
+                self.profiles[self.has_profile], self.item_profiles, self.item_norms, block_size
+            )
+            self.cold_min, self.cold_max = self._score_range(
+                self.cold_profiles, self.cold_items, self.cold_item_norms, block_size
+            )
+
+    def _item_payments(self, rest_pay):
+        """Payments accepted by the place of every item row, weighted 1/k for k payments"""
+        shape = (len(self.item_place_ids), len(self.payment_ids))
+        if rest_pay is None or not len(self.payment_ids):
+            return sparse.csr_matrix(shape)
+        places = pd.Index(pd.unique(self.item_place_ids))
+        accepted = pd.DataFrame({
+            'place': places.get_indexer(rest_pay['placeID']),
+            'payment': self.payment_ids.get_indexer(rest_pay['Rpayment'].astype(object))
+        }).drop_duplicates()
+        accepted = accepted[(accepted['place'] >= 0) & (accepted['payment'] >= 0)]
+        counts = np.bincount(accepted['place'], minlength=len(places))
+        by_place = sparse.csr_matrix(
+            (1 / counts[accepted['place']], (accepted['place'], accepted['payment'])), shape=(len(places), shape[1])
+        )
+        return by_place[places.get_indexer(self.item_place_ids)]
+
+    def _init_lookups(self, user_ids, place_ids):
+        """Item rows per placeID, the grouping of item rows by CF place column and the extended cold-start items"""
+        self.user_ids = pd.Index(user_ids)
+        self.place_ids = pd.Index(place_ids)
+        self.item_norms = _row_norms(self.item_profiles)
+        self.cold_items = sparse.hstack([self.item_profiles, self.item_payments], format='csr')
+        self.cold_item_norms = _row_norms(self.cold_items)
+        self.item_rows = {}
+        for item_row, place_id in enumerate(self.item_place_ids.tolist()):
+            self.item_rows.setdefault(place_id, []).append(item_row)
+        item_cols = self.place_ids.get_indexer(self.item_place_ids)
+        valid = np.flatnonzero(item_cols >= 0)
+        item_order = valid[np.argsort(item_cols[valid], kind='stable')]
+        self._place_cols, starts = np.unique(item_cols[item_order], return_index=True)
+        # First item row of every place, then (place positions, item rows) of each further cuisine
+        counts = np.diff(np.append(starts, len(item_order)))
+        self._first_rows = item_order[starts]
+        self._extra_rows = [
+            (np.flatnonzero(counts > level), item_order[starts[counts > level] + level])
+            for level in range(1, counts.max(initial=1))
+        ]
+        self._score_rows = {}
+
+    def _init_users(self):
+        """Which CF rows have a rating profile, and the cold-start profile row of every user"""
+        self.has_profile = np.diff(self.profiles.indptr) > 0
+        self.cold_index = {user_id: row for row, user_id in enumerate(self.cold_user_ids.tolist())}
+        self.cold_rows = self.cold_user_ids.get_indexer(self.user_ids)
+
+    def _profiles(self, user_rows, place_ids, n_users):
+        """Mean item row of each user's highly rated places (CSR), and which users have a profile"""
+        pairs = [
+            (user_row, item_row) for user_row, place_id in zip(user_rows.tolist(), place_ids)
+            for item_row in self.item_rows.get(place_id, [])
+        ]
+        user_rows = np.array([user_row for user_row, _ in pairs], dtype=np.int64)
+        item_rows = np.array([item_row for _, item_row in pairs], dtype=np.int64)
+        membership = sparse.csr_matrix(
+            (np.ones(len(pairs)), (user_rows, item_rows)), shape=(n_users, self.item_profiles.shape[0])
+        )
+        counts = np.asarray(membership.sum(axis=1)).ravel()
+        has_profile = counts > 0
+        scale = np.divide(1, counts, out=np.zeros_like(counts), where=has_profile)
+        return (sparse.diags(scale) @ membership @ self.item_profiles).tocsr(), has_profile
+
+    def _cold_start_profiles(self, cons_cuisine, cons_pay, cons_profile):
+        """userIDs and cold-start profiles (CSR) of every user in the cuisine, payment and profile tables
+
+        A profile has the same layout as the extended item rows: the encoded restaurant
+        features followed by the payments. Cuisines and payments are weighted 1/k for k
+        known values, so every feature group weighs as much as in an item row.
+        """
+        tables = [table for table in (cons_cuisine, cons_pay, cons_profile) if table is not None]
+        user_ids = pd.Index(np.sort(pd.unique(np.concatenate(
+            [table['userID'].astype(str).to_numpy() for table in tables] or [np.empty(0, dtype=object)]
+        ))))
+        offsets = np.cumsum([0] + [len(categories) for categories in self.encoder.categories_])
+        width = offsets[-1] + len(self.payment_ids)
+        rows, cols, weights = [], [], []
+
+        def add(table, column_positions, offset, spread):
+            users = user_ids.get_indexer(table['userID'].astype(str))
+            known = (users >= 0) & (column_positions >= 0)
+            users, positions = users[known], column_positions[known] + offset
+            if spread:
+                weight = 1 / np.bincount(users, minlength=len(user_ids))[users]
+            else:
+                weight = np.ones(len(users))
+            rows.append(users)
+            cols.append(positions)
+            weights.append(weight)
+
+        def feature_positions(column, values):
+            position = self.feature_columns.index(column)
+            categories = pd.Index(self.encoder.categories_[position])
+            return categories.get_indexer(pd.Series(values, dtype=object)), offsets[position]
+
+        if cons_cuisine is not None:
+            cuisine = cons_cuisine.drop_duplicates()
+            positions, offset = feature_positions(self.feature_columns[-1], cuisine[self.feature_columns[-1]])
+            add(cuisine, positions, offset, True)
+        if cons_pay is not None:
+            payment = cons_pay.drop_duplicates()
+            add(payment, self.payment_ids.get_indexer(payment['Upayment'].astype(object)), offsets[-1], True)
+        if cons_profile is not None:
+            for attribute, (column, values) in self.profile_features.items():
+                if attribute in cons_profile.columns and column in self.feature_columns:
+                    mapped = cons_profile[attribute].astype(object).map(values)
+                    positions, offset = feature_positions(column, mapped)
+                    add(cons_profile, positions, offset, False)
+
+        profiles = sparse.csr_matrix(
+            (np.concatenate(weights or [np.empty(0)]),
+             (np.concatenate(rows or [np.empty(0, dtype=np.int64)]), np.concatenate(cols or [np.empty(0, dtype=np.int64)]))),
+            shape=(len(user_ids), width)
+        )
+        profiles.sum_duplicates()
+        return user_ids, profiles
+
+    @staticmethod
+    def _cosine(profiles, items, item_norms):
+        """Cosine similarity between every item row and sparse user profiles (items x profiles)
+
+        A block of profiles is narrow (one column per feature value), so it is scored as a
+        dense block with one sparse-times-dense product. Scores stay item-major until
+        _by_place, so the per-item scaling and the reduction by place run over contiguous rows.
+        """
+        profiles = profiles.toarray()
+        denominators = np.outer(item_norms, np.linalg.norm(profiles, axis=1))
+        dots = np.asarray(items @ profiles.T)
+        return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators > 0)
+
+    def _score_range(self, profiles, items, item_norms, block_size):
+        """Minimum and maximum raw score of every item row over all profiles, computed in blocks"""
+        low, high = np.zeros(items.shape[0]), np.zeros(items.shape[0])
+        for start in range(0, profiles.shape[0], block_size):
+            raw = self._cosine(profiles[start:start + block_size], items, item_norms)
+            if start == 0:
+                low, high = raw.min(axis=1), raw.max(axis=1)
+            else:
+                low, high = np.minimum(low, raw.min(axis=1)), np.maximum(high, raw.max(axis=1))
+        return low, high
+
+    @staticmethod
+    def _scale(raw, low, high):
+        """Min-max scale raw scores per item row to 0-2 (NaN where every user scored the same)"""
+        spread = (high - low)[:, np.newaxis]
+        return np.divide(2 * (raw - low[:, np.newaxis]), spread, out=np.full_like(raw, np.nan), where=spread > 0)
+
+    def _by_place(self, item_scores):
+        """Best item row score of every CF place column, ignoring NaN (0 without any score), as profiles x places"""
+        result = np.zeros((item_scores.shape[1], len(self.place_ids)))
+        if len(self._first_rows):
+            best = item_scores[self._first_rows]
+            for positions, item_rows in self._extra_rows:
+                best[positions] = np.fmax(best[positions], item_scores[item_rows])
+            result[:, self._place_cols] = np.nan_to_num(best, nan=0.0).T
+        return result
+
+    def _rating_scores(self, profiles):
+        return self._by_place(self._scale(
+            self._cosine(profiles, self.item_profiles, self.item_norms), self.item_min, self.item_max
+        ))
+
+    def cold_start_scores(self, profiles):
+        """Score rows (len(profiles) x places) of cold-start profiles"""
+        return self._by_place(self._scale(
+            self._cosine(profiles, self.cold_items, self.cold_item_norms), self.cold_min, self.cold_max
+        ))
+
+    def cold_start_profile(self, cuisines=(), payments=(), attributes=None):
+        """Cold-start profile (1 x features CSR) of cuisine and payment preferences and profile attributes
+
+        attributes maps userprofile columns (budget, drink_level, ...) to values; unknown
+        values are ignored.
+        """
+        _, profiles = self._cold_start_profiles(
+            pd.DataFrame({'userID': [''] * len(cuisines), self.feature_columns[-1]: list(cuisines)}),
+            pd.DataFrame({'userID': [''] * len(payments), 'Upayment': list(payments)}),
+            pd.DataFrame([dict(attributes or {}, userID='')])
+        )
+        return profiles
+
+    def user_cold_start_profile(self, user_id):
+        """Cold-start profile (1 x features CSR) of a user in the profile tables, or None"""
+        row = self.cold_index.get(user_id)
+        return self.cold_profiles[row] if row is not None else None
+
+    @classmethod
+    def from_arrays(cls, arrays, encoder, user_ids, place_ids, feature_columns, profile_features=None):
+        """Rebuild an engine from the arrays written by to_arrays"""
+        engine = cls.__new__(cls)
+        engine.encoder = encoder
+        engine.feature_columns = list(feature_columns)
+        engine.profile_features = dict(profile_features or {})
+        engine.item_place_ids = arrays['cbf_item_place_ids']
+        engine.payment_ids = pd.Index(arrays['cbf_payment_ids'])
+        n_features = sum(len(categories) for categories in encoder.categories_)
+        engine.item_profiles = _csr_from_arrays(arrays, 'cbf_item_profiles', (len(engine.item_place_ids), n_features))
+        engine.item_payments = _csr_from_arrays(
+            arrays, 'cbf_item_payments', (len(engine.item_place_ids), len(engine.payment_ids))
+        )
+        engine.item_min = arrays['cbf_item_min']
+        engine.item_max = arrays['cbf_item_max']
+        engine._init_lookups(user_ids, place_ids)
+        engine.profiles = _csr_from_arrays(arrays, 'cbf_profiles', (len(engine.user_ids), n_features))
+        engine.cold_user_ids = pd.Index(arrays['cbf_cold_user_ids'])
+        engine.cold_profiles = _csr_from_arrays(
+            arrays, 'cbf_cold_profiles', (len(engine.cold_user_ids), engine.cold_items.shape[1])
+        )
+        engine.cold_min = arrays['cbf_cold_min']
+        engine.cold_max = arrays['cbf_cold_max']
+        engine._init_users()
+        return engine
+
+    def to_arrays(self):
+        """Plain NumPy arrays describing the engine, for model snapshots"""
+        if self._score_rows:
+            raise ValueError('Engines with incremental updates cannot be written to a snapshot')
+        arrays = {
+            'cbf_item_place_ids': self.item_place_ids,
+            'cbf_payment_ids': np.asarray(self.payment_ids, dtype=str),
+            'cbf_item_min': self.item_min,
+            'cbf_item_max': self.item_max,
+            'cbf_cold_user_ids': np.asarray(self.cold_user_ids, dtype=str),
+            'cbf_cold_min': self.cold_min,
+            'cbf_cold_max': self.cold_max
+        }
+        for name in ('item_profiles', 'item_payments', 'profiles', 'cold_profiles'):
+            arrays.update(_csr_arrays(f'cbf_{name}', getattr(self, name)))
+        return arrays
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the sparse item rows and profiles"""
+        total = sum(array.nbytes for array in (self.item_place_ids, self.item_min, self.item_max, self.cold_min, self.cold_max))
+        for matrix in (self.item_profiles, self.item_payments, self.cold_items, self.profiles, self.cold_profiles):
+            total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return total
+
+    def profile_scores(self, high_rated_place_ids, user_id=None):
+        """Score row of a profile built from the given highly rated placeIDs
+
+        Without any, the cold-start profile of user_id is scored (zeros if there is none).
+        """
+        user_rows = np.zeros(len(high_rated_place_ids), dtype=np.int64)
+        profiles, has_profile = self._profiles(user_rows, list(high_rated_place_ids), 1)
+        if has_profile[0]:
+            return self._rating_scores(profiles)[0]
+        cold_profile = self.user_cold_start_profile(user_id)
+        if cold_profile is None:
+            return np.zeros(len(self.place_ids))
+        return self.cold_start_scores(cold_profile)[0]
+
+    def with_profiles(self, profiles):
+        """New engine where the given CF rows are rescored; profiles maps row -> (userID, highly rated placeIDs)
+
+        The per-item-row scaling constants stay those of the last full build.
+        """
+        engine = copy.copy(self)
+        engine._score_rows = dict(self._score_rows)
+        for row, (user_id, place_ids) in profiles.items():
+            engine._score_rows[row] = self.profile_scores(place_ids, user_id)
+        return engine
+
+    def _built_scores(self, rows):
+        """Scores of CF rows of the last full build: rating profiles, else cold-start profiles"""
+        scores = np.zeros((len(rows), len(self.place_ids)))
+        has_profile = self.has_profile[rows]
+        if has_profile.any():
+            scores[has_profile] = self._rating_scores(self.profiles[rows[has_profile]])
+        cold_rows = self.cold_rows[rows]
+        cold = ~has_profile & (cold_rows >= 0)
+        if cold.any():
+            scores[cold] = self.cold_start_scores(self.cold_profiles[cold_rows[cold]])
+        return scores
+
+    def scores_rows(self, rows):
+        """Dense CBF scores (len(rows) x places) for the given CF matrix rows"""
+        rows = np.atleast_1d(rows)
+        if not self._score_rows:
+            return self._built_scores(rows)
+        overridden = np.array([row in self._score_rows for row in rows.tolist()], dtype=bool)
+        built = ~overridden & (rows < len(self.user_ids))
+        scores = np.zeros((len(rows), len(self.place_ids)))
+        scores[built] = self._built_scores(rows[built])
+        for position in np.flatnonzero(overridden).tolist():
+            scores[position] = self._score_rows[int(rows[position])]
+        return scores
+
+
+class SimilarPlaces:
+    """Precomputed top-k most similar places of every restaurant, stored as (placeID, score) arrays
+
+    Similarity blends the cosine between the places' rating columns of the user-item
+    matrix (co-rating) with the cosine between their encoded feature profiles (the mean
+    of a place's item rows). It is computed in blocks of places, bounded to at most
+    block_size places and max_cells similarities at once, keeping only the k best of
+    every row, so a lookup is an array slice.
+    """
+
+    def __init__(self, rating, item_profiles, item_place_ids, k=20, rating_weight=0.5, block_size=1024,
+                 max_cells=1 << 24):
+        self.place_ids = np.unique(np.asarray(item_place_ids)).astype(np.int32)
+        self._init_lookups()
+        n_places = len(self.place_ids)
+        self.k = max(0, min(k, n_places - 1))
+
+        # Unit rows scaled by the square root of their weight, so that products are weighted cosines
+        ratings = (self._co_rating_rows(rating) * np.sqrt(rating_weight)).astype(np.float32)
+        features = self._feature_rows(item_profiles, item_place_ids)
+        feature_norms = np.linalg.norm(features, axis=1)
+        feature_norms[feature_norms == 0] = 1
+        features = (features * (np.sqrt(1 - rating_weight) / feature_norms)[:, None]).astype(np.float32)
+
+        self.neighbour_ids = np.empty((n_places, self.k), dtype=np.int32)
+        self.scores = np.empty((n_places, self.k), dtype=np.float32)
+        step = max(1, min(block_size, max_cells // max(n_places, 1)))
+        for start in range(0, n_places, step):
+            rows = np.arange(start, min(start + step, n_places))
+            block = features[rows] @ features.T
+            block += (ratings[rows] @ ratings.T).toarray()
+            block[np.arange(len(rows)), rows] = -np.inf
+            self.neighbour_ids[rows], self.scores[rows] = top_n_rows(block, self.place_ids, self.k)
+
+    def _init_lookups(self):
+        self.place_index = {place_id: row for row, place_id in enumerate(self.place_ids.tolist())}
+
+    def _co_rating_rows(self, rating):
+        """L2-normalised rating columns of the user-item matrix, one CSR row per place (empty if unrated)"""
+        user_item, _, rated_place_ids = build_user_item_matrix(rating)
+        rows = pd.Index(self.place_ids).get_indexer(rated_place_ids)
+        known = np.flatnonzero(rows >= 0)
+        columns = user_item.T.tocsr()[known]
+        placement = sparse.csr_matrix(
+            (np.ones(len(known)), (rows[known], np.arange(len(known)))), shape=(len(self.place_ids), len(known))
+        )
+        return _normalize_rows((placement @ columns).tocsr())
+
+    def _feature_rows(self, item_profiles, item_place_ids):
+        """Dense mean encoded item row of every place"""
+        rows = np.searchsorted(self.place_ids, np.asarray(item_place_ids))
+        membership = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, np.arange(len(rows)))), shape=(len(self.place_ids), len(rows))
+        )
+        counts = np.asarray(membership.sum(axis=1)).ravel()
+        return (sparse.diags(1 / np.maximum(counts, 1)) @ membership @ item_profiles).toarray()
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild an index from the arrays written by to_arrays"""
+        index = cls.__new__(cls)
+        index.place_ids = arrays['similar_place_ids']
+        index.neighbour_ids = arrays['similar_neighbour_ids']
+        index.scores = arrays['similar_scores']
+        index.k = index.neighbour_ids.shape[1]
+        index._init_lookups()
+        return index
+
+    def to_arrays(self):
+        """Plain NumPy arrays describing the index, for model snapshots"""
+        return {
+            'similar_place_ids': self.place_ids,
+            'similar_neighbour_ids': self.neighbour_ids,
+            'similar_scores': self.scores
+        }
+
+    @property
+    def nbytes(self):
+        """Memory held by the placeID, neighbour and score arrays"""
+        return self.place_ids.nbytes + self.neighbour_ids.nbytes + self.scores.nbytes
+
+    def __contains__(self, place_id):
+        return place_id in self.place_index
+
+    def get(self, place_id, k):
+        """Up to k (placeIDs, scores) of the places most similar to a place, best first, or None if unknown
+
+        Neighbours without any similarity are left out.
+        """
+        row = self.place_index.get(place_id)
+        if row is None:
+            return None
+        scores = self.scores[row, :k]
+        count = int(np.count_nonzero(scores > 0))
+        return self.neighbour_ids[row, :count], scores[:count]
+
+
+class TopNIndex:
+    """Precomputed top-N places per user, stored as (placeID, score) arrays
+
+    Filled block by block with the top_n_rows() of dense blocks of user scores, so a
+    lookup is an array slice instead of a sort over the user's full score row.
+    with_users() returns a new index that shares the arrays and overrides the rows of
+    updated users.
+    """
+
+    def __init__(self, user_ids, place_ids, max_n=50):
+        self.user_index = {user_id: row for row, user_id in enumerate(user_ids)}
+        self.max_n = min(max_n, len(place_ids))
+        self.place_ids = np.empty((len(user_ids), self.max_n), dtype=np.asarray(place_ids).dtype)
+        self.scores = np.empty((len(user_ids), self.max_n), dtype=np.float64)
+        self._overrides = {}
+
+    @classmethod
+    def from_arrays(cls, user_ids, place_ids, scores):
+        """Rebuild an index from its (users x max_n) placeID and score arrays"""
+        index = cls.__new__(cls)
+        index.user_index = {user_id: row for row, user_id in enumerate(user_ids)}
+        index.max_n = place_ids.shape[1]
+        index.place_ids = place_ids
+        index.scores = scores
+        index._overrides = {}
+        return index
+
+    @property
+    def nbytes(self):
+        """Memory held by the placeID and score arrays"""
+        return self.place_ids.nbytes + self.scores.nbytes
+
+    def set_rows(self, rows, place_ids, scores):
+        """Store the top-N (placeIDs, scores) of the users at the given rows"""
+        self.place_ids[rows], self.scores[rows] = place_ids, scores
+
+    def with_users(self, user_ids, place_ids, scores):
+        """New index where the rows of the given users are replaced"""
+        index = copy.copy(self)
+        index._overrides = dict(self._overrides)
+        for user_id, user_place_ids, user_scores in zip(user_ids, place_ids, scores):
+            index._overrides[user_id] = (user_place_ids, user_scores)
+        return index
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index or user_id in self._overrides
+
+    def get(self, user_id, top_n):
+        """Top-N (placeIDs, scores) of a user, or None if unknown or top_n exceeds the index"""
+        if user_id not in self or top_n > self.max_n:
+            return None
+        if user_id in self._overrides:
+            place_ids, scores = self._overrides[user_id]
+            return place_ids[:top_n], scores[:top_n]
+        row = self.user_index[user_id]
+        return self.place_ids[row, :top_n], self.scores[row, :top_n]
+
+    def get_many(self, user_ids, top_n):
+        """Top-N (placeIDs, scores) arrays (len(user_ids) x top_n) of users that are all in the index"""
+        rows = np.array([self.user_index.get(user_id, 0) for user_id in user_ids], dtype=np.int64)
+        place_ids, scores = self.place_ids[rows, :top_n], self.scores[rows, :top_n]
+        if self._overrides:
+            for position, user_id in enumerate(user_ids):
+                if user_id in self._overrides:
+                    place_ids[position], scores[position] = (values[:top_n] for values in self._overrides[user_id])
+        return place_ids, scores
+
+
+class CandidateIndex:
+    """Candidate places of every user with their CF and CBF scores, for re-ranking with any weights
+
+    The candidates of a user are the union of their k best CF places, their k best CBF
+    places and the k most popular places. They are stored with both component scores as
+    (users x 3k) arrays of CF place columns (int32, -1 for duplicates) and CF and CBF
+    scores (float64, so the default weights give exactly the hybrid scores of the top-N
+    index), and re-ranking a user with other weights blends one row of k-sized arrays
+    instead of scoring every place. with_users() returns a new index that shares
+    the arrays and overrides the rows of updated users.
+    """
+
+    def __init__(self, user_ids, n_places, popular_cols, k=50):
+        self.user_index = {user_id: row for row, user_id in enumerate(user_ids)}
+        self.k = min(k, n_places)
+        self.popular_cols = np.asarray(popular_cols[:self.k], dtype=np.int32)
+        width = 2 * self.k + len(self.popular_cols)
+        self.cols = np.full((len(user_ids), width), -1, dtype=np.int32)
+        self.cf_scores = np.zeros((len(user_ids), width), dtype=np.float64)
+        self.cbf_scores = np.zeros((len(user_ids), width), dtype=np.float64)
+        self._overrides = {}
+
+    @classmethod
+    def from_arrays(cls, user_ids, popular_cols, cols, cf_scores, cbf_scores):
+        """Rebuild an index from its (users x 3k) column and score arrays"""
+        index = cls.__new__(cls)
+        index.user_index = {user_id: row for row, user_id in enumerate(user_ids)}
+        index.k = cols.shape[1] // 3
+        index.popular_cols = np.asarray(popular_cols[:index.k], dtype=np.int32)
+        index.cols = cols
+        index.cf_scores = cf_scores
+        index.cbf_scores = cbf_scores
+        index._overrides = {}
+        return index
+
+    @property
+    def nbytes(self):
+        """Memory held by the column and score arrays"""
+        return self.cols.nbytes + self.cf_scores.nbytes + self.cbf_scores.nbytes
+
+    def candidate_rows(self, cf_block, cbf_block):
+        """Candidate columns and their CF and CBF scores for dense blocks of user scores"""
+        parts = [np.broadcast_to(self.popular_cols, (cf_block.shape[0], len(self.popular_cols)))]
+        for block in (cf_block, cbf_block):
+            if self.k < block.shape[1]:
+                parts.append(np.argpartition(-block, self.k - 1, axis=1)[:, :self.k])
+            else:
+                parts.append(np.broadcast_to(np.arange(block.shape[1]), block.shape))
+        cols = np.sort(np.hstack(parts), axis=1)
+        cols[:, 1:][cols[:, 1:] == cols[:, :-1]] = -1
+        valid = np.maximum(cols, 0)
+        return (cols.astype(np.int32), np.take_along_axis(cf_block, valid, axis=1).astype(np.float64),
+                np.take_along_axis(cbf_block, valid, axis=1).astype(np.float64))
+
+    def set_rows(self, rows, cf_block, cbf_block):
+        """Store the candidates of the users at the given rows"""
+        self.cols[rows], self.cf_scores[rows], self.cbf_scores[rows] = self.candidate_rows(cf_block, cbf_block)
+
+    def with_users(self, user_ids, cf_block, cbf_block):
+        """New index where the candidates of the given users are replaced"""
+        index = copy.copy(self)
+        index._overrides = dict(self._overrides)
+        for user_id, cols, cf_scores, cbf_scores in zip(user_ids, *self.candidate_rows(cf_block, cbf_block)):
+            index._overrides[user_id] = (cols, cf_scores, cbf_scores)
+        return index
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index or user_id in self._overrides
+
+    def get(self, user_id):
+        """(CF place columns, CF scores, CBF scores) of a user's candidates, or None if unknown"""
+        if user_id in self._overrides:
+            cols, cf_scores, cbf_scores = self._overrides[user_id]
+        elif user_id in self.user_index:
+            row = self.user_index[user_id]
+            cols, cf_scores, cbf_scores = self.cols[row], self.cf_scores[row], self.cbf_scores[row]
+        else:
+            return None
+        valid = cols >= 0
+        return cols[valid], cf_scores[valid], cbf_scores[valid]
@@ -1,6 +1,9 @@
 // API Base URL
 const API_BASE_URL = "http://localhost:5000/api";
 
+// Number of similar restaurants shown below the reviews
+const SIMILAR_RESTAURANTS_COUNT = 6;
+
 // Global variables
 let restaurantData = null;
 
@@ -15,6 +18,7 @@ const ratingStars = document.getElementById("ratingStars");
 const ratingNumber = document.getElementById("ratingNumber");
 const ratingCount = document.getElementById("ratingCount");
 const recentReviews = document.getElementById("recentReviews");
+const similarRestaurants = document.getElementById("similarRestaurants");
 const navToggle = document.querySelector(".nav-toggle");
 const navMenu = document.querySelector(".nav-menu");
 
@@ -33,6 +37,20 @@ async function fetchRestaurantDetail(placeID) {
     }
 }
 
+async function fetchSimilarRestaurants(placeID, k) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/restaurant/${placeID}/similar?k=${k}`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: Failed to fetch similar restaurants`);
+        }
+        const data = await response.json();
+        return data.similar || [];
+    } catch (error) {
+        console.error("Error fetching similar restaurants:", error);
+        throw error;
+    }
+}
+
 // Initialize
 document.addEventListener("DOMContentLoaded", function () {
     setupEventListeners();
@@ -67,6 +85,7 @@ async function loadRestaurantDetail() {
         restaurantData = await fetchRestaurantDetail(placeID);
         displayRestaurantDetail();
         hideLoading();
+        loadSimilarRestaurants(placeID);
     } catch (error) {
         console.error("Error loading restaurant detail:", error);
         showError("Không thể tải thông tin nhà hàng. Vui lòng kiểm tra kết nối server.");
@@ -176,6 +195,57 @@ function displayRestaurantDetail() {
     }
 }
 
+async function loadSimilarRestaurants(placeID) {
+    if (!similarRestaurants) return;
+
+    try {
+        const similar = await fetchSimilarRestaurants(placeID, SIMILAR_RESTAURANTS_COUNT);
+        displaySimilarRestaurants(similar);
+    } catch (error) {
+        // The rest of the page stays usable without this section
+        similarRestaurants.innerHTML = "<p>Không thể tải nhà hàng tương tự.</p>";
+    }
+}
+
+function displaySimilarRestaurants(restaurants) {
+    if (restaurants.length === 0) {
+        similarRestaurants.innerHTML = "<p>Không có nhà hàng tương tự.</p>";
+        return;
+    }
+
+    similarRestaurants.innerHTML = restaurants
+        .map(
+            (restaurant) => `
+            <a class="restaurant-card" href="restaurant-detail.html?placeID=${restaurant.placeID}">
+                <div class="restaurant-header">
+                    <div class="restaurant-name">${restaurant.name}</div>
+                    <div class="restaurant-address">
+                        <i class="fas fa-map-marker-alt"></i>
+                        ${restaurant.address || "Địa chỉ không có sẵn"}, ${restaurant.city || ""}
+                    </div>
+                </div>
+                <div class="restaurant-info">
+                    <div class="restaurant-details">
+                        <div class="detail-item">
+                            <i class="fas fa-dollar-sign"></i>
+                            <span>${getPriceDisplay(restaurant.price)}</span>
+                        </div>
+                        <div class="detail-item">
+                            <i class="fas fa-wine-glass"></i>
+                            <span>${getAlcoholDisplay(restaurant.alcohol)}</span>
+                        </div>
+                    </div>
+                    <div class="similarity">
+                        <i class="fas fa-link"></i>
+                        Độ tương đồng: ${Math.round(restaurant.similarity * 100)}%
+                    </div>
+                </div>
+            </a>
+        `
+        )
+        .join("");
+}
+
 function checkIfOpen(hours, days) {
     if (!hours || !days) return false;
 
@@ -1,8 +1,21 @@
 // API Base URL
 const API_BASE_URL = "http://localhost:5000/api";
 
+// Typeahead: number of suggestions and milliseconds of typing pause before searching
+const SEARCH_SUGGESTIONS_COUNT = 8;
+const SEARCH_DELAY_MS = 150;
+
+// Restaurants per page, and the /api/restaurants sort of each sortBy option
+const PAGE_SIZE = 24;
+const SORT_PARAMS = { name: "name", rating: "-rating", price: "price" };
+
 // Global variables
-let restaurantsData = [];
+let searchTimer = null;
+let latestSearch = "";
+let reloadTimer = null;
+let listRequest = 0;
+let nextCursor = null;
+let loadingMore = false;
 
 // DOM Elements
 const restaurantGrid = document.getElementById("restaurantGrid");
@@ -14,6 +27,7 @@ const navMenu = document.querySelector(".nav-menu");
 
 // Filter elements
 const searchInput = document.getElementById("searchInput");
+const searchSuggestions = document.getElementById("searchSuggestions");
 const cuisineFilter = document.getElementById("cuisineFilter");
 const priceFilter = document.getElementById("priceFilter");
 const ratingFilter = document.getElementById("ratingFilter");
@@ -22,20 +36,35 @@ const clearFiltersBtn = document.getElementById("clearFilters");
 const parkingFilter = document.getElementById("parkingFilter");
 
 // API Functions
-async function fetchRestaurants() {
+async function fetchRestaurants(cursor = null) {
     try {
-        const response = await fetch(`${API_BASE_URL}/restaurants`);
+        const response = await fetch(`${API_BASE_URL}/restaurants?${listingParams(cursor)}`);
         if (!response.ok) {
             throw new Error(`HTTP ${response.status}: Failed to fetch restaurants`);
         }
         const data = await response.json();
-        return data.restaurants;
+        return data;
     } catch (error) {
         console.error("Error fetching restaurants:", error);
         throw error;
     }
 }
 
+async function fetchSearchResults(query, limit) {
+    try {
+        const params = new URLSearchParams({ q: query, limit: limit });
+        const response = await fetch(`${API_BASE_URL}/search?${params}`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: Failed to search restaurants`);
+        }
+        const data = await response.json();
+        return data.results;
+    } catch (error) {
+        console.error("Error searching restaurants:", error);
+        throw error;
+    }
+}
+
 async function fetchStats() {
     try {
         const response = await fetch(`${API_BASE_URL}/stats`);
@@ -57,17 +86,25 @@ document.addEventListener("DOMContentLoaded", function () {
 });
 
 function setupEventListeners() {
-    if (sortBy) sortBy.addEventListener("change", applyFiltersAndSort);
+    if (sortBy) sortBy.addEventListener("change", reloadRestaurants);
     if (navToggle) navToggle.addEventListener("click", toggleMobileNav);
 
     // Filter event listeners
-    if (searchInput) searchInput.addEventListener("input", applyFiltersAndSort);
-    if (cuisineFilter) cuisineFilter.addEventListener("change", applyFiltersAndSort);
-    if (priceFilter) priceFilter.addEventListener("change", applyFiltersAndSort);
-    if (ratingFilter) ratingFilter.addEventListener("change", applyFiltersAndSort);
-    if (statusFilter) statusFilter.addEventListener("change", applyFiltersAndSort);
+    if (searchInput) {
+        searchInput.addEventListener("input", scheduleReload);
+        searchInput.addEventListener("input", scheduleSuggestions);
+        searchInput.addEventListener("keydown", (e) => {
+            if (e.key === "Escape") hideSuggestions();
+        });
+        // Delay so that a click on a suggestion still follows its link
+        searchInput.addEventListener("blur", () => setTimeout(hideSuggestions, 200));
+    }
+    if (cuisineFilter) cuisineFilter.addEventListener("change", reloadRestaurants);
+    if (priceFilter) priceFilter.addEventListener("change", reloadRestaurants);
+    if (ratingFilter) ratingFilter.addEventListener("change", reloadRestaurants);
+    if (statusFilter) statusFilter.addEventListener("change", reloadRestaurants);
     if (clearFiltersBtn) clearFiltersBtn.addEventListener("click", clearAllFilters);
-    if (parkingFilter) parkingFilter.addEventListener("change", applyFiltersAndSort);
+    if (parkingFilter) parkingFilter.addEventListener("change", reloadRestaurants);
 
     document.querySelectorAll(".nav-link").forEach((link) => {
         link.addEventListener("click", function (e) {
@@ -83,14 +120,13 @@ async function loadDataFromAPI() {
     try {
         showLoading();
 
-        // Load restaurants and stats in parallel
-        const [restaurants, stats] = await Promise.all([fetchRestaurants(), fetchStats()]);
-
-        restaurantsData = restaurants;
+        // Load the first page of restaurants and stats in parallel
+        const request = ++listRequest;
+        const [page, stats] = await Promise.all([fetchRestaurants(), fetchStats()]);
 
-        displayRestaurants(restaurantsData);
         populateFilters(stats);
         hideLoading();
+        if (request === listRequest) showPage(page, false);
     } catch (error) {
         console.error("Error loading data:", error);
         showError("Không thể tải dữ liệu nhà hàng. Vui lòng kiểm tra kết nối server.");
@@ -110,34 +146,74 @@ function populateFilters(stats) {
             cuisineFilter.appendChild(option);
         });
     }
+}
 
-    // Populate parking filter from restaurant data
-    if (parkingFilter && restaurantsData.length > 0) {
-        const parkingOptions = new Set();
-        restaurantsData.forEach((restaurant) => {
-            if (restaurant.parking) {
-                restaurant.parking.forEach((p) => parkingOptions.add(p));
-            }
-        });
+// Search text, filters and sort of the page as /api/restaurants parameters
+function listingParams(cursor) {
+    const params = new URLSearchParams({ limit: PAGE_SIZE, sort: SORT_PARAMS[sortBy ? sortBy.value : "name"] || "name" });
+    const filters = {
+        q: searchInput ? searchInput.value.trim() : "",
+        cuisine: cuisineFilter ? cuisineFilter.value : "",
+        price: priceFilter ? priceFilter.value : "",
+        min_rating: ratingFilter ? ratingFilter.value : "",
+        parking: parkingFilter ? parkingFilter.value : "",
+    };
+    Object.entries(filters).forEach(([name, value]) => {
+        if (value) params.set(name, value);
+    });
+    if (cursor !== null) params.set("cursor", cursor);
+    return params;
+}
 
-        parkingFilter.innerHTML = '<option value="">Tất cả bãi đỗ xe</option>';
-        Array.from(parkingOptions)
-            .sort()
-            .forEach((parking) => {
-                const option = document.createElement("option");
-                option.value = parking;
-                option.textContent = getParkingDisplay(parking);
-                parkingFilter.appendChild(option);
-            });
+function scheduleReload() {
+    clearTimeout(reloadTimer);
+    reloadTimer = setTimeout(reloadRestaurants, SEARCH_DELAY_MS);
+}
+
+async function reloadRestaurants() {
+    const request = ++listRequest;
+    try {
+        const page = await fetchRestaurants();
+        // Answers to earlier filter changes may arrive after newer ones
+        if (request !== listRequest) return;
+        showPage(page, false);
+    } catch (error) {
+        showError("Không thể tải dữ liệu nhà hàng. Vui lòng kiểm tra kết nối server.");
     }
 }
 
-function displayRestaurants(restaurants) {
+async function loadMoreRestaurants() {
+    if (nextCursor === null || loadingMore) return;
+
+    loadingMore = true;
+    const request = listRequest;
+    try {
+        const page = await fetchRestaurants(nextCursor);
+        // Dropped when the filters changed while the page was loading
+        if (request === listRequest) showPage(page, true);
+    } catch (error) {
+        showError("Không thể tải thêm nhà hàng. Vui lòng kiểm tra kết nối server.");
+    } finally {
+        loadingMore = false;
+    }
+}
+
+function showPage(page, append) {
+    nextCursor = page.next_cursor;
+    displayRestaurants(page.restaurants, append);
+    updateRestaurantCount(page.total);
+    // Keep loading while the grid does not reach the bottom of the window
+    handleScroll();
+}
+
+function displayRestaurants(restaurants, append = false) {
     if (!restaurantGrid) return;
 
-    restaurantGrid.innerHTML = "";
+    if (!append) {
+        restaurantGrid.innerHTML = "";
+    }
 
-    if (restaurants.length === 0) {
+    if (!append && restaurants.length === 0) {
         restaurantGrid.innerHTML = `
             <div class="no-results">
                 <i class="fas fa-search"></i>
@@ -152,8 +228,6 @@ function displayRestaurants(restaurants) {
         const restaurantCard = createRestaurantCard(restaurant);
         restaurantGrid.appendChild(restaurantCard);
     });
-
-    updateRestaurantCount(restaurants.length);
 }
 
 function createRestaurantCard(restaurant) {
@@ -310,74 +384,61 @@ function getParkingDisplay(parking) {
     return parkingMap[parking] || "N/A";
 }
 
-function applyFiltersAndSort() {
-    let filteredRestaurants = [...restaurantsData];
-
-    // Apply search filter
-    const searchTerm = searchInput ? searchInput.value.toLowerCase().trim() : "";
-    if (searchTerm) {
-        filteredRestaurants = filteredRestaurants.filter(
-            (restaurant) =>
-                restaurant.name.toLowerCase().includes(searchTerm) ||
-                (restaurant.address && restaurant.address.toLowerCase().includes(searchTerm)) ||
-                (restaurant.city && restaurant.city.toLowerCase().includes(searchTerm)) ||
-                (restaurant.cuisines && restaurant.cuisines.some((cuisine) => cuisine.toLowerCase().includes(searchTerm)))
-        );
-    }
+function scheduleSuggestions() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(loadSuggestions, SEARCH_DELAY_MS);
+}
 
-    // Apply cuisine filter
-    const cuisineValue = cuisineFilter ? cuisineFilter.value : "";
-    if (cuisineValue) {
-        filteredRestaurants = filteredRestaurants.filter((restaurant) => {
-            return restaurant.cuisines && restaurant.cuisines.includes(cuisineValue);
-        });
-    }
+async function loadSuggestions() {
+    if (!searchSuggestions) return;
 
-    // Apply price filter
-    const priceValue = priceFilter ? priceFilter.value : "";
-    if (priceValue) {
-        filteredRestaurants = filteredRestaurants.filter((restaurant) => restaurant.price === priceValue);
+    const query = searchInput.value.trim();
+    latestSearch = query;
+    if (!query) {
+        hideSuggestions();
+        return;
     }
 
-    // Apply rating filter
-    const ratingValue = ratingFilter ? ratingFilter.value : "";
-    if (ratingValue) {
-        const minRating = parseFloat(ratingValue);
-        filteredRestaurants = filteredRestaurants.filter((restaurant) => {
-            const avgRating = restaurant.average_rating || 0;
-            return avgRating >= minRating;
-        });
+    try {
+        const results = await fetchSearchResults(query, SEARCH_SUGGESTIONS_COUNT);
+        // Answers to earlier keystrokes may arrive after newer ones
+        if (query !== latestSearch) return;
+        displaySuggestions(results);
+    } catch (error) {
+        hideSuggestions();
     }
+}
 
-    // Apply parking filter
-    const parkingValue = parkingFilter ? parkingFilter.value : "";
-    if (parkingValue) {
-        filteredRestaurants = filteredRestaurants.filter((restaurant) => {
-            return restaurant.parking && restaurant.parking.includes(parkingValue);
-        });
+function displaySuggestions(results) {
+    if (results.length === 0) {
+        searchSuggestions.innerHTML = '<div class="search-suggestion empty">Không tìm thấy nhà hàng nào</div>';
+    } else {
+        searchSuggestions.innerHTML = results
+            .map(
+                (restaurant) => `
+                <a class="search-suggestion" href="restaurant-detail.html?placeID=${restaurant.placeID}">
+                    <span class="suggestion-name">${restaurant.name}</span>
+                    <span class="suggestion-details">
+                        ${restaurant.city !== "N/A" ? restaurant.city : ""}
+                        ${restaurant.cuisines.length > 0 ? " · " + restaurant.cuisines.join(", ") : ""}
+                    </span>
+                </a>
+            `
+            )
+            .join("");
     }
+    searchSuggestions.style.display = "block";
+}
 
-    // Apply sorting
-    const sortValue = sortBy ? sortBy.value : "name";
-    filteredRestaurants.sort((a, b) => {
-        switch (sortValue) {
-            case "name":
-                return a.name.localeCompare(b.name);
-            case "rating":
-                return (b.average_rating || 0) - (a.average_rating || 0);
-            case "price":
-                const priceOrder = { low: 1, medium: 2, high: 3 };
-                return (priceOrder[a.price] || 0) - (priceOrder[b.price] || 0);
-            default:
-                return 0;
-        }
-    });
-
-    displayRestaurants(filteredRestaurants);
+function hideSuggestions() {
+    if (searchSuggestions) {
+        searchSuggestions.style.display = "none";
+    }
 }
 
 function clearAllFilters() {
     if (searchInput) searchInput.value = "";
+    hideSuggestions();
     if (cuisineFilter) cuisineFilter.value = "";
     if (priceFilter) priceFilter.value = "";
     if (ratingFilter) ratingFilter.value = "";
@@ -385,7 +446,7 @@ function clearAllFilters() {
     if (parkingFilter) parkingFilter.value = "";
     if (sortBy) sortBy.value = "name";
 
-    displayRestaurants(restaurantsData);
+    reloadRestaurants();
 }
 
 function updateRestaurantCount(count) {
@@ -459,6 +520,6 @@ function toggleMobileNav() {
 
 function handleScroll() {
     if (window.innerHeight + window.scrollY >= document.body.offsetHeight - 100) {
-        console.log("Reached bottom, could load more restaurants...");
+        loadMoreRestaurants();
     }
 }
@@ -1,6 +1,10 @@
 // API Base URL
 const API_BASE_URL = "http://localhost:5000/api";
 
+// Featured restaurants shown, and the /api/restaurants sort of each sortBy option
+const PAGE_SIZE = 12;
+const SORT_PARAMS = { name: "name", rating: "-rating", price: "price" };
+
 // DOM Elements
 const searchInput = document.getElementById("searchInput");
 const searchBtn = document.getElementById("searchBtn");
@@ -21,18 +25,18 @@ const navToggle = document.querySelector(".nav-toggle");
 const navMenu = document.querySelector(".nav-menu");
 
 // Data storage
-let restaurantsData = [];
 let statsData = {};
+let listRequest = 0;
 
 // API Functions
 async function fetchRestaurants() {
     try {
-        const response = await fetch(`${API_BASE_URL}/restaurants`);
+        const response = await fetch(`${API_BASE_URL}/restaurants?${listingParams()}`);
         if (!response.ok) {
             throw new Error(`HTTP ${response.status}: Failed to fetch restaurants`);
         }
         const data = await response.json();
-        return data.restaurants;
+        return data;
     } catch (error) {
         console.error("Error fetching restaurants:", error);
         throw error;
@@ -66,21 +70,21 @@ function initializeApp() {
 }
 
 function setupEventListeners() {
-    if (searchBtn) searchBtn.addEventListener("click", performSearch);
+    if (searchBtn) searchBtn.addEventListener("click", reloadRestaurants);
     if (searchInput) {
         searchInput.addEventListener("keypress", function (e) {
             if (e.key === "Enter") {
-                performSearch();
+                reloadRestaurants();
             }
         });
     }
 
-    if (cuisineFilter) cuisineFilter.addEventListener("change", applyFilters);
-    if (priceFilter) priceFilter.addEventListener("change", applyFilters);
-    if (alcoholFilter) alcoholFilter.addEventListener("change", applyFilters);
-    if (smokingFilter) smokingFilter.addEventListener("change", applyFilters);
-    if (parkingFilter) parkingFilter.addEventListener("change", applyFilters);
-    if (sortBy) sortBy.addEventListener("change", applyFilters);
+    if (cuisineFilter) cuisineFilter.addEventListener("change", reloadRestaurants);
+    if (priceFilter) priceFilter.addEventListener("change", reloadRestaurants);
+    if (alcoholFilter) alcoholFilter.addEventListener("change", reloadRestaurants);
+    if (smokingFilter) smokingFilter.addEventListener("change", reloadRestaurants);
+    if (parkingFilter) parkingFilter.addEventListener("change", reloadRestaurants);
+    if (sortBy) sortBy.addEventListener("change", reloadRestaurants);
     if (clearFilters) clearFilters.addEventListener("click", clearAllFilters);
     if (navToggle) navToggle.addEventListener("click", toggleMobileNav);
 
@@ -96,13 +100,13 @@ async function loadDataFromAPI() {
     try {
         showLoading();
 
-        // Load restaurants and stats in parallel
-        const [restaurants, stats] = await Promise.all([fetchRestaurants(), fetchStats()]);
+        // Load the first page of restaurants and stats in parallel
+        const request = ++listRequest;
+        const [page, stats] = await Promise.all([fetchRestaurants(), fetchStats()]);
 
-        restaurantsData = restaurants;
         statsData = stats;
 
-        displayRestaurants(restaurantsData);
+        if (request === listRequest) showPage(page);
         updateStats();
         populateFilters();
         generateActivityChart();
@@ -115,6 +119,40 @@ async function loadDataFromAPI() {
     }
 }
 
+// Search text, filters and sort of the page as /api/restaurants parameters
+function listingParams() {
+    const params = new URLSearchParams({ limit: PAGE_SIZE, sort: SORT_PARAMS[sortBy ? sortBy.value : "name"] || "name" });
+    const filters = {
+        q: searchInput ? searchInput.value.trim() : "",
+        cuisine: cuisineFilter ? cuisineFilter.value : "",
+        price: priceFilter ? priceFilter.value : "",
+        alcohol: alcoholFilter ? alcoholFilter.value : "",
+        smoking: smokingFilter ? smokingFilter.value : "",
+        parking: parkingFilter ? parkingFilter.value : "",
+    };
+    Object.entries(filters).forEach(([name, value]) => {
+        if (value) params.set(name, value);
+    });
+    return params;
+}
+
+async function reloadRestaurants() {
+    const request = ++listRequest;
+    try {
+        const page = await fetchRestaurants();
+        // Answers to earlier searches may arrive after newer ones
+        if (request !== listRequest) return;
+        showPage(page);
+    } catch (error) {
+        showError("Không thể tải dữ liệu. Vui lòng kiểm tra kết nối server.");
+    }
+}
+
+function showPage(page) {
+    displayRestaurants(page.restaurants);
+    updateRestaurantCount(page.total);
+}
+
 function displayRestaurants(restaurants) {
     if (!restaurantGrid) return;
 
@@ -134,8 +172,6 @@ function displayRestaurants(restaurants) {
         const restaurantCard = createRestaurantCard(restaurant);
         restaurantGrid.appendChild(restaurantCard);
     });
-
-    updateRestaurantCount(restaurants.length);
 }
 
 function createRestaurantCard(restaurant) {
@@ -258,79 +294,6 @@ function getParkingDisplay(parking) {
     return parkingMap[parking] || "N/A";
 }
 
-function performSearch() {
-    if (!searchInput) return;
-
-    const searchTerm = searchInput.value.toLowerCase().trim();
-    if (!searchTerm) {
-        applyFilters();
-        return;
-    }
-
-    const filteredRestaurants = restaurantsData.filter((restaurant) => {
-        const nameMatch = restaurant.name.toLowerCase().includes(searchTerm);
-        const addressMatch = restaurant.address && restaurant.address.toLowerCase().includes(searchTerm);
-        const cityMatch = restaurant.city && restaurant.city.toLowerCase().includes(searchTerm);
-        const cuisineMatch = restaurant.cuisines && restaurant.cuisines.some((cuisine) => cuisine.toLowerCase().includes(searchTerm));
-
-        return nameMatch || addressMatch || cityMatch || cuisineMatch;
-    });
-
-    applyFilters(filteredRestaurants);
-}
-
-function applyFilters(baseRestaurants = restaurantsData) {
-    let filteredRestaurants = [...baseRestaurants];
-
-    // Apply cuisine filter
-    const selectedCuisine = cuisineFilter ? cuisineFilter.value : "";
-    if (selectedCuisine) {
-        filteredRestaurants = filteredRestaurants.filter((r) => r.cuisines && r.cuisines.includes(selectedCuisine));
-    }
-
-    // Apply price filter
-    const selectedPrice = priceFilter ? priceFilter.value : "";
-    if (selectedPrice) {
-        filteredRestaurants = filteredRestaurants.filter((r) => r.price === selectedPrice);
-    }
-
-    // Apply alcohol filter
-    const selectedAlcohol = alcoholFilter ? alcoholFilter.value : "";
-    if (selectedAlcohol) {
-        filteredRestaurants = filteredRestaurants.filter((r) => r.alcohol === selectedAlcohol);
-    }
-
-    // Apply smoking filter
-    const selectedSmoking = smokingFilter ? smokingFilter.value : "";
-    if (selectedSmoking) {
-        filteredRestaurants = filteredRestaurants.filter((r) => r.smoking_area === selectedSmoking);
-    }
-
-    // Apply parking filter
-    const selectedParking = parkingFilter ? parkingFilter.value : "";
-    if (selectedParking) {
-        filteredRestaurants = filteredRestaurants.filter((r) => r.parking && r.parking.includes(selectedParking));
-    }
-
-    // Apply sorting
-    const sortValue = sortBy ? sortBy.value : "name";
-    filteredRestaurants.sort((a, b) => {
-        switch (sortValue) {
-            case "name":
-                return a.name.localeCompare(b.name);
-            case "rating":
-                return (b.average_rating || 0) - (a.average_rating || 0);
-            case "price":
-                const priceOrder = { low: 1, medium: 2, high: 3 };
-                return (priceOrder[a.price] || 0) - (priceOrder[b.price] || 0);
-            default:
-                return 0;
-        }
-    });
-
-    displayRestaurants(filteredRestaurants);
-}
-
 function clearAllFilters() {
     if (cuisineFilter) cuisineFilter.value = "";
     if (priceFilter) priceFilter.value = "";
@@ -340,7 +303,7 @@ function clearAllFilters() {
     if (sortBy) sortBy.value = "name";
     if (searchInput) searchInput.value = "";
 
-    displayRestaurants(restaurantsData);
+    reloadRestaurants();
 }
 
 function populateFilters() {
@@ -355,26 +318,6 @@ function populateFilters() {
             cuisineFilter.appendChild(option);
         });
     }
-
-    // Populate parking filter from restaurant data
-    if (parkingFilter && restaurantsData.length > 0) {
-        const parkingOptions = new Set();
-        restaurantsData.forEach((restaurant) => {
-            if (restaurant.parking) {
-                restaurant.parking.forEach((p) => parkingOptions.add(p));
-            }
-        });
-
-        parkingFilter.innerHTML = '<option value="">Tất cả</option>';
-        Array.from(parkingOptions)
-            .sort()
-            .forEach((parking) => {
-                const option = document.createElement("option");
-                option.value = parking;
-                option.textContent = getParkingDisplay(parking);
-                parkingFilter.appendChild(option);
-            });
-    }
 }
 
 function updateStats() {
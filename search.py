@@ -0,0 +1,167 @@
+"""
+Text search over the restaurant catalogue
+
+Restaurant names, addresses, cities and cuisines are split into case- and accent-folded
+tokens and kept in an inverted index whose terms are sorted: the postings of every term
+are stored one after the other in term order, so the terms starting with a prefix are a
+range found by bisection and their postings are one contiguous slice. A query matches
+the restaurants containing every query token, the last one as a prefix (typeahead), and
+ranks them by the field weights of the matches plus a weight of their average rating.
+"""
+
+import bisect
+import copy
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# Weight of a token match in every searched field of the /api/restaurants records
+FIELD_WEIGHTS = {'name': 3.0, 'cuisines': 2.0, 'city': 1.5, 'address': 1.0}
+
+# Share of the weight kept by a prefix match that is not the whole token
+PREFIX_MATCH_WEIGHT = 0.5
+
+# Letters and digits; underscores separate tokens (Fast_Food -> fast, food)
+TOKEN_PATTERN = r'[^\W_]+'
+
+# Combining marks left by NFKD normalisation (accents)
+COMBINING_MARKS = '[\u0300-\u036f]'
+
+
+def fold(text):
+    """Lowercase text without accents"""
+    return re.sub(COMBINING_MARKS, '', unicodedata.normalize('NFKD', text.casefold()))
+
+
+def tokenize(text):
+    """Folded tokens of a text"""
+    return re.findall(TOKEN_PATTERN, fold(text))
+
+
+def _field_tokens(values):
+    """(record position, token) pairs of a Series of texts, tokenized like tokenize()"""
+    folded = values.str.casefold().str.normalize('NFKD').str.replace(COMBINING_MARKS, '', regex=True)
+    tokens = folded.str.findall(TOKEN_PATTERN).explode().dropna()
+    return tokens.index.to_numpy(), tokens.to_numpy(dtype=object)
+
+
+class SearchIndex:
+    """Inverted index with prefix lookup over the name, address, city and cuisines of restaurant records"""
+
+    def __init__(self, records, rating_weight=0.5):
+        self.records = records
+        self.rating_weight = rating_weight
+        self.ratings = np.array([record['average_rating'] for record in records], dtype=np.float64)
+
+        frames = []
+        for field, weight in FIELD_WEIGHTS.items():
+            values = pd.Series([record[field] for record in records], dtype=object)
+            if field == 'cuisines':
+                values = values.explode()
+            values = values.where(values != 'N/A').dropna().astype(str)
+            positions, tokens = _field_tokens(values)
+            frames.append(pd.DataFrame({'term': tokens, 'position': positions, 'weight': weight}).drop_duplicates())
+        postings = pd.concat(frames, ignore_index=True).groupby(['term', 'position'], sort=True)['weight'].sum()
+
+        terms = postings.index.get_level_values('term').to_numpy(dtype=object)
+        self.terms, starts = np.unique(terms, return_index=True)
+        self.terms = self.terms.tolist()
+        self.starts = np.append(starts, len(terms)).astype(np.int64)
+        self.positions = postings.index.get_level_values('position').to_numpy(dtype=np.int32)
+        self.weights = postings.to_numpy(dtype=np.float64)
+
+    def with_records(self, positions, records):
+        """New index with the records at some positions replaced, keeping the postings
+
+        The new records must have the same searched fields; their average ratings are
+        taken into the ranking.
+        """
+        index = copy.copy(self)
+        index.records = list(self.records)
+        index.ratings = self.ratings.copy()
+        for position, record in zip(positions, records):
+            index.records[position] = record
+            index.ratings[position] = record['average_rating']
+        return index
+
+    @property
+    def nbytes(self):
+        """Memory held by the posting arrays"""
+        return self.starts.nbytes + self.positions.nbytes + self.weights.nbytes + self.ratings.nbytes
+
+    def _term_range(self, token, prefix):
+        """Range of term numbers equal to a token, or starting with it"""
+        low = bisect.bisect_left(self.terms, token)
+        if prefix:
+            return low, bisect.bisect_left(self.terms, token + '\U0010ffff', low)
+        return low, low + 1 if low < len(self.terms) and self.terms[low] == token else low
+
+    def _token_scores(self, token, term_range, prefix):
+        """Match weight of a token for every record, given its range of terms"""
+        low, high = term_range
+        start, end = self.starts[low], self.starts[high]
+        scores = np.bincount(self.positions[start:end], self.weights[start:end], minlength=len(self.records))
+        if prefix and low < high and self.terms[low] == token:
+            # The whole-token matches keep their full weight
+            exact_end = self.starts[low + 1]
+            return PREFIX_MATCH_WEIGHT * scores + (1 - PREFIX_MATCH_WEIGHT) * np.bincount(
+                self.positions[start:exact_end], self.weights[start:exact_end], minlength=len(self.records)
+            )
+        return PREFIX_MATCH_WEIGHT * scores if prefix else scores
+
+    def _matches(self, query):
+        """(sorted positions, match weights) of the records matching every token of a query"""
+        tokens = tokenize(query)
+        empty = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        if not tokens or not self.records:
+            return empty
+        prefixes = [number == len(tokens) - 1 for number in range(len(tokens))]
+        ranges = [self._term_range(token, prefix) for token, prefix in zip(tokens, prefixes)]
+        sizes = [self.starts[high] - self.starts[low] for low, high in ranges]
+        if min(sizes) == 0:
+            return empty
+
+        # The records of the rarest token are the candidates; the other tokens are looked up at them
+        rarest = int(np.argmin(sizes))
+        low, high = ranges[rarest]
+        if high - low == 1:
+            start, end = self.starts[low], self.starts[high]
+            matches = self.positions[start:end]
+            partial = prefixes[rarest] and self.terms[low] != tokens[rarest]
+            scores = self.weights[start:end] * (PREFIX_MATCH_WEIGHT if partial else 1)
+        else:
+            rarest_scores = self._token_scores(tokens[rarest], ranges[rarest], prefixes[rarest])
+            matches = np.flatnonzero(rarest_scores > 0)
+            scores = rarest_scores[matches]
+        for number, (token, prefix) in enumerate(zip(tokens, prefixes)):
+            if number != rarest:
+                token_scores = self._token_scores(token, ranges[number], prefix)[matches]
+                found = token_scores > 0
+                matches, scores = matches[found], scores[found] + token_scores[found]
+        return matches, scores
+
+    def matches(self, query):
+        """Sorted positions of the records matching every token of a query, the last one as a prefix"""
+        return self._matches(query)[0].astype(np.int64)
+
+    def search(self, query, limit=10):
+        """(records, scores, total matches) of the best records matching every token of a query
+
+        The last token also matches as a prefix. Scores are the summed field weights of
+        the matches plus rating_weight times the average rating; ties keep file order.
+        """
+        matches, scores = self._matches(query)
+        if len(matches) == 0:
+            return [], [], 0
+
+        ranked = scores + self.rating_weight * self.ratings[matches]
+        best = np.arange(len(matches))
+        if 0 < limit < len(matches):
+            # Keep every match tied with the last one, so ties are cut in file order
+            threshold = ranked[np.argpartition(-ranked, limit - 1)[limit - 1]]
+            best = np.flatnonzero(ranked >= threshold)
+        best = best[np.lexsort((matches[best], -ranked[best]))][:limit]
+        return [self.records[position] for position in matches[best].tolist()], ranked[best].tolist(), len(matches)
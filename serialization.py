@@ -0,0 +1,66 @@
+"""
+JSON encoding for the Restaurant Recommendation System
+
+Payloads are encoded with orjson when it is installed and with the standard library
+otherwise. Both produce the same bytes for the payloads served here: compact, sorted
+keys, UTF-8, numpy scalars and arrays as plain numbers and lists. JSONProvider plugs
+the encoder into Flask so every jsonify() goes through it.
+"""
+
+import datetime
+import hashlib
+import json
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """Plain Python value for the numpy and datetime objects json cannot encode"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(payload):
+        """Compact JSON bytes of a payload, keys sorted"""
+        return orjson.dumps(payload, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(payload):
+        """Compact JSON bytes of a payload, keys sorted"""
+        return json.dumps(
+            payload, default=_default, ensure_ascii=False, sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')
+
+
+def encode_json(payload):
+    """Serialize a payload as a response body, the way jsonify does"""
+    return dumps(payload) + b'\n'
+
+
+def json_etag(body):
+    """Strong ETag for a serialized payload"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding responses with dumps()"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(encode_json(obj), mimetype=self.mimetype)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Production server for the Restaurant Recommendation System
+
+    python server.py [--host HOST] [--port PORT] [--workers N] [--no-preload]
+
+The parent process binds the listening socket and, with preload, loads the model before
+forking the workers, so they share its arrays copy-on-write instead of each building
+their own. Every worker serves the shared socket with a threaded WSGI server.
+
+Signals to the parent process:
+    SIGHUP          reload the model, fork new workers on it and retire the old ones once
+                    their in-flight requests have finished, so no request is dropped
+    SIGTERM/SIGINT  stop accepting connections, finish in-flight requests and exit
+
+Platforms without fork() run a single in-process worker.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import config
+import model as model_lifecycle
+from app import app, create_app
+
+
+class InFlightCounter:
+    """WSGI middleware counting the requests whose response has not been fully sent yet"""
+
+    def __init__(self, app):
+        self.app = app
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.count += 1
+        try:
+            body = self.app(environ, start_response)
+        except BaseException:
+            self._done()
+            raise
+        return self._stream(body)
+
+    def _stream(self, body):
+        try:
+            yield from body
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            self._done()
+
+    def _done(self):
+        with self._lock:
+            self.count -= 1
+
+
+def bind_socket(host, port):
+    """Listening socket shared by every worker"""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(socket.SOMAXCONN)
+    return sock
+
+
+def serve_worker(app, sock, host, port):
+    """Serve the shared socket until SIGTERM, then wait for the in-flight requests to finish"""
+    counter = InFlightCounter(app)
+    server = make_server(host, port, counter, threaded=True, fd=sock.fileno())
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    # The parent decides what Ctrl+C and SIGHUP mean for the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server.serve_forever()
+    deadline = time.monotonic() + config.SERVER_GRACEFUL_TIMEOUT
+    while counter.count > 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if counter.count > 0:
+        print(f'Worker {os.getpid()}: {counter.count} requests still running after {config.SERVER_GRACEFUL_TIMEOUT}s')
+    # Idle keep-alive connections are closed with the process; clients reconnect to a live worker
+    server.server_close()
+
+
+class Supervisor:
+    """Parent process: forks, replaces and stops the workers"""
+
+    def __init__(self, sock, host, port, workers, preload):
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload = preload
+        self.current = set()
+        self.retiring = set()
+        self.reload_requested = False
+        self.stop_requested = False
+
+    def spawn(self):
+        """Fork one worker of the current generation"""
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                if not self.preload:
+                    create_app()
+                serve_worker(app, self.sock, self.host, self.port)
+            except BaseException as e:
+                print(f'Worker {os.getpid()} failed. Error: {e}')
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        self.current.add(pid)
+
+    def reload(self):
+        """Reload the model, fork a new generation of workers and retire the old one"""
+        if self.preload:
+            old_version = model_lifecycle.current_model().version
+            reloaded = model_lifecycle.rebuild_model()
+            if reloaded is None or reloaded.version == old_version:
+                print('Model reload failed; keeping the running workers')
+                return
+            print(f'Model version {reloaded.version} loaded')
+        old = self.current
+        self.current = set()
+        for _ in range(self.workers):
+            self.spawn()
+        self.retire(old)
+
+    def retire(self, pids):
+        """Ask workers to finish their in-flight requests and exit"""
+        for pid in pids:
+            self.signal(pid, signal.SIGTERM)
+        self.retiring |= pids
+
+    def signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """Collect exited workers; returns the number of current workers that died"""
+        died = 0
+        while self.current or self.retiring:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.current:
+                self.current.discard(pid)
+                died += 1
+                print(f'Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}')
+            self.retiring.discard(pid)
+        return died
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, 'reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, 'stop_requested', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, 'stop_requested', True))
+
+        for _ in range(self.workers):
+            self.spawn()
+        print(f'Serving on http://{self.host}:{self.port} with {self.workers} workers (pid {os.getpid()})')
+
+        while not self.stop_requested:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            died = self.reap()
+            if died and not self.stop_requested:
+                # Replace crashed workers, pausing a little in case they die on startup
+                time.sleep(1)
+                for _ in range(died):
+                    self.spawn()
+            time.sleep(0.1)
+
+        print('Stopping workers')
+        self.retire(self.current)
+        self.current = set()
+        deadline = time.monotonic() + config.SERVER_GRACEFUL_TIMEOUT + 5
+        while self.retiring and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.retiring:
+            self.signal(pid, signal.SIGKILL)
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Restaurant Recommendation System production server')
+    parser.add_argument('--host', default=config.SERVER_HOST, help='listening address (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT, help='listening port (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS, help='worker processes (default: %(default)s)')
+    parser.add_argument(
+        '--no-preload', dest='preload', action='store_false', default=config.SERVER_PRELOAD,
+        help='let every worker load its own model instead of sharing one loaded before forking'
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    if not config.SERVER_ACCESS_LOG:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    sock = bind_socket(args.host, args.port)
+    if not hasattr(os, 'fork'):
+        print(f'Serving on http://{args.host}:{args.port} with a single worker (no fork() on this platform)')
+        serve_worker(create_app(), sock, args.host, args.port)
+        return 0
+
+    if args.preload:
+        # Load the model once in the parent so every worker starts with it, sharing its pages
+        create_app(preload=True)
+    return Supervisor(sock, args.host, args.port, args.workers, args.preload).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
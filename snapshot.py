@@ -0,0 +1,158 @@
+"""
+Versioned binary model snapshots
+
+A snapshot lets a server process start without parsing the CSV files or recomputing
+the similarity and score matrices. Layout of SNAPSHOT_DIR:
+
+    CURRENT                 name of the newest snapshot
+    <name>/manifest.json    format version, source CSV checksums, model settings,
+                            encoder vocabulary and the list of arrays
+    <name>/<array>.npy      ID maps and score arrays, memory-mapped read-only on load so
+                            every worker process shares one page-cached copy
+    <name>/tables.pkl       the parsed dataset tables
+
+A snapshot is only used when the SHA-256 checksums of the CSV files and the model
+settings match the ones it was built from.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+
+
+SNAPSHOT_FORMAT = 7
+MANIFEST_FILE = 'manifest.json'
+TABLES_FILE = 'tables.pkl'
+CURRENT_FILE = 'CURRENT'
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_checksums(data_dir, file_names):
+    """Checksums of the source CSV files, keyed by file name"""
+    return {file_name: file_checksum(os.path.join(data_dir, file_name)) for file_name in sorted(file_names)}
+
+
+def model_settings():
+    """Settings that change the content of a built model"""
+    settings = {
+        'CF_BACKEND': config.CF_BACKEND, 'CF_NEIGHBOURS': config.CF_NEIGHBOURS, 'TOP_N_MAX': config.TOP_N_MAX,
+        'RANKING_CANDIDATES': config.RANKING_CANDIDATES,
+        'SIMILAR_PLACES_K': config.SIMILAR_PLACES_K, 'SIMILAR_RATING_WEIGHT': config.SIMILAR_RATING_WEIGHT
+    }
+    if config.CF_BACKEND == 'als':
+        settings.update({
+            'ALS_FACTORS': config.ALS_FACTORS, 'ALS_ITERATIONS': config.ALS_ITERATIONS,
+            'ALS_REGULARIZATION': config.ALS_REGULARIZATION, 'ALS_MODE': config.ALS_MODE, 'ALS_ALPHA': config.ALS_ALPHA,
+            'ALS_FOOD_WEIGHT': config.ALS_FOOD_WEIGHT, 'ALS_SERVICE_WEIGHT': config.ALS_SERVICE_WEIGHT
+        })
+    return settings
+
+
+def write_snapshot(snapshot_dir, tables, arrays, vocabulary, checksums, settings):
+    """Write a new snapshot and make it current; returns its directory"""
+    digest = hashlib.sha256(json.dumps([checksums, settings], sort_keys=True).encode('utf-8')).hexdigest()
+    name = f"model-{time.strftime('%Y%m%d-%H%M%S')}-{digest[:8]}"
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, name)
+    staging = os.path.join(snapshot_dir, f'.{name}.tmp')
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.makedirs(staging)
+
+    for array_name, array in arrays.items():
+        np.save(os.path.join(staging, f'{array_name}.npy'), np.ascontiguousarray(array), allow_pickle=False)
+    pd.to_pickle(tables, os.path.join(staging, TABLES_FILE))
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'created_at': time.time(),
+        'source_checksums': checksums,
+        'settings': settings,
+        'encoder_vocabulary': vocabulary,
+        'arrays': {
+            array_name: {'dtype': str(array.dtype), 'shape': list(array.shape)}
+            for array_name, array in arrays.items()
+        }
+    }
+    with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    # Publish: rename the finished directory, then atomically repoint CURRENT
+    os.replace(staging, path)
+    pointer = os.path.join(snapshot_dir, f'.{CURRENT_FILE}.tmp')
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(name + '\n')
+    os.replace(pointer, os.path.join(snapshot_dir, CURRENT_FILE))
+    return path
+
+
+def current_snapshot(snapshot_dir):
+    """Directory of the current snapshot, or None if there is none"""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE), encoding='utf-8') as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(snapshot_dir, name)
+    return path if name and os.path.isdir(path) else None
+
+
+def read_manifest(path):
+    """Manifest of a snapshot directory"""
+    with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_valid(path, checksums, settings):
+    """Whether a snapshot was built with this format from these CSV files and settings"""
+    try:
+        manifest = read_manifest(path)
+    except (OSError, ValueError):
+        return False
+    return (
+        manifest.get('format') == SNAPSHOT_FORMAT
+        and manifest.get('source_checksums') == checksums
+        and manifest.get('settings') == settings
+    )
+
+
+def load_snapshot(path):
+    """Tables, read-only memory-mapped arrays and manifest of a snapshot"""
+    manifest = read_manifest(path)
+    arrays = {
+        array_name: np.load(os.path.join(path, f'{array_name}.npy'), mmap_mode='r', allow_pickle=False)
+        for array_name in manifest['arrays']
+    }
+    tables = pd.read_pickle(os.path.join(path, TABLES_FILE))
+    return tables, arrays, manifest
+
+
+def prune_snapshots(snapshot_dir, keep):
+    """Delete all but the newest `keep` snapshots, never the current one"""
+    current = current_snapshot(snapshot_dir)
+    names = sorted(
+        name for name in os.listdir(snapshot_dir)
+        if name.startswith('model-') and os.path.isdir(os.path.join(snapshot_dir, name))
+    )
+    removed = []
+    for name in names[:max(len(names) - keep, 0)]:
+        path = os.path.join(snapshot_dir, name)
+        if current is not None and os.path.samefile(path, current):
+            continue
+        shutil.rmtree(path)
+        removed.append(path)
+    return removed
@@ -5,5 +5,5 @@ echo Installing dependencies...
 pip install -r requirements.txt
 echo.
 echo Starting Flask server...
-python app.py
+python server.py
 pause
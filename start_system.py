@@ -26,7 +26,7 @@ def start_flask_server():
     """Start the Flask server in a separate thread"""
     def run_server():
         try:
-            subprocess.run([sys.executable, "app.py"])
+            subprocess.run([sys.executable, "server.py"])
         except Exception as e:
             print(f"Flask server error: {e}")
     
@@ -53,22 +53,12 @@ def wait_for_server(url="http://localhost:5000", timeout=30):
     print("✗ Flask server failed to start within timeout")
     return False
 
-def open_browser():
-    """Open the website in the default browser"""
+def open_browser(url="http://localhost:5000/"):
+    """Open the website, served by the Flask server, in the default browser"""
     try:
-        # Try to open the local file first
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        index_path = os.path.join(current_dir, "index.html")
-        
-        if os.path.exists(index_path):
-            file_url = f"file:///{index_path.replace(os.sep, '/')}"
-            webbrowser.open(file_url)
-            print(f"✓ Opened website: {file_url}")
-            return True
-        else:
-            print("✗ index.html not found")
-            return False
-            
+        webbrowser.open(url)
+        print(f"✓ Opened website: {url}")
+        return True
     except Exception as e:
         print(f"✗ Failed to open browser: {e}")
         return False
@@ -98,7 +88,7 @@ def main():
     # Step 3: Wait for server to be ready
     if not wait_for_server():
         print("\n❌ Flask server failed to start. Please check for errors and try:")
-        print("   python app.py")
+        print("   python server.py")
         return 1
     
     print()
@@ -106,7 +96,7 @@ def main():
     # Step 4: Open browser
     print("Opening website in browser...")
     if not open_browser():
-        print("\n⚠️  Please manually open index.html in your browser")
+        print("\n⚠️  Please manually open http://localhost:5000/ in your browser")
     
     print()
     print("=" * 60)
@@ -115,13 +105,13 @@ def main():
     print()
     print("📋 What's running:")
     print("   • Flask API server: http://localhost:5000")
-    print("   • Website: index.html (opened in browser)")
+    print("   • Website: http://localhost:5000/ (opened in browser)")
     print()
     print("🔗 Quick links:")
-    print("   • Home: index.html")
-    print("   • Restaurants: restaurants.html") 
-    print("   • Users: users.html")
-    print("   • Recommendations: recommendations.html")
+    print("   • Home: http://localhost:5000/")
+    print("   • Restaurants: http://localhost:5000/restaurants.html")
+    print("   • Users: http://localhost:5000/users.html")
+    print("   • Recommendations: http://localhost:5000/recommendations.html")
     print()
     print("💡 To use the recommendation system:")
     print("   1. Go to the 'Gợi Ý' (Recommendations) page")
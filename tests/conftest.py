@@ -0,0 +1,62 @@
+"""
+Fixtures building models from a copy of the bundled data/ directory
+
+Every test gets its own copy of the CSV files, data cache and snapshot directory, and
+ratings are never persisted to the repository's data/. Models get distinct versions,
+so the app's response caches never serve a response of another test's model.
+"""
+
+import itertools
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+import model as model_module  # noqa: E402
+
+# Steps leave room for the versions published by ingested ratings
+_versions = itertools.count(1000, 1000)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Copy of data/ that models are built from"""
+    path = tmp_path / 'data'
+    shutil.copytree(os.path.join(ROOT, 'data'), path, ignore=shutil.ignore_patterns('.cache'))
+    monkeypatch.setattr(config, 'DATA_DIR', str(path))
+    monkeypatch.setattr(config, 'DATA_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(config, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(config, 'SNAPSHOT_ENABLED', False)
+    monkeypatch.setattr(config, 'PERSIST_RATINGS', False)
+    return path
+
+
+@pytest.fixture
+def build(data_dir):
+    """Build a model from the CSV files in data_dir, with a fresh version"""
+    return lambda: model_module.build_model(next(_versions))
+
+
+@pytest.fixture
+def model(build):
+    return build()
+
+
+@pytest.fixture
+def publish(monkeypatch):
+    """Publish a model to the app, as a finished build or ingested ratings would"""
+    return lambda model: monkeypatch.setattr(model_module, '_current_model', model)
+
+
+@pytest.fixture
+def client(model, publish):
+    """Flask test client serving the model fixture"""
+    import app
+
+    publish(model)
+    return app.app.test_client()
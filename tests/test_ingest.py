@@ -0,0 +1,119 @@
+"""Ratings applied to a published model give the same results as a rebuild from the CSV files"""
+
+import math
+
+import numpy as np
+import pytest
+
+from model import DATASETS, apply_ratings, rating_rows
+
+NEW_USER = 'U9999'
+
+
+def rating_batches(model):
+    """Two batches: a replaced rating, new ratings of known users and a user who never rated before"""
+    rating = model.rating
+    first = rating.iloc[0]
+    user, place = first['userID'], int(first['placeID'])
+    places = sorted(model.restaurant_records)
+    rated = set(rating.loc[rating['userID'] == user, 'placeID'])
+    unrated = next(other for other in places if other not in rated)
+    other_user = rating['userID'].iloc[50]
+    return [
+        [dict(userID=user, placeID=place, rating=(int(first['rating']) + 1) % 3, food_rating=1, service_rating=None),
+         dict(userID=user, placeID=unrated, rating=2, food_rating=2, service_rating=2),
+         dict(userID=other_user, placeID=places[3], rating=0, food_rating=None, service_rating=0)],
+        [dict(userID=NEW_USER, placeID=places[5], rating=2, food_rating=2, service_rating=1),
+         dict(userID=NEW_USER, placeID=place, rating=1, food_rating=1, service_rating=1),
+         dict(userID=other_user, placeID=places[3], rating=2, food_rating=2, service_rating=2),
+         dict(userID=other_user, placeID=places[-1], rating=1, food_rating=None, service_rating=None)]
+    ]
+
+
+@pytest.fixture
+def models(model, build, data_dir):
+    """(model with the batches applied, model rebuilt from the CSV files with them appended), and the batches"""
+    batches = rating_batches(model)
+    incremental = model
+    for batch in batches:
+        incremental, _ = apply_ratings(incremental, batch)
+        rating_rows(batch).to_csv(data_dir / DATASETS['rating'], mode='a', header=False, index=False)
+    rebuilt = build()
+
+    # Ingested ratings keep the CBF scaling constants of the last full build
+    for name in ('item_min', 'item_max', 'cold_min', 'cold_max'):
+        setattr(rebuilt.cbf_engine, name, getattr(model.cbf_engine, name))
+    return incremental, rebuilt, batches
+
+
+def close(a, b):
+    """Equality of JSON values, floats within 1e-9"""
+    if isinstance(a, float) or isinstance(b, float):
+        return isinstance(a, (int, float)) and isinstance(b, (int, float)) and math.isclose(a, b, abs_tol=1e-9)
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(close(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(close(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def test_scores_match_rebuild(models):
+    incremental, rebuilt, _ = models
+    assert list(incremental.cf_engine.place_ids) == list(rebuilt.cf_engine.place_ids)
+    user_ids = list(rebuilt.cf_engine.user_ids)
+    scores = incremental.component_scores_rows(np.array([incremental.cf_engine.row(user_id) for user_id in user_ids]))
+    expected = rebuilt.component_scores_rows(np.arange(len(user_ids)))
+    for component in ('cf', 'cbf', 'hybrid'):
+        assert np.allclose(scores[component], expected[component], rtol=0, atol=1e-9), component
+
+
+def test_top_n_matches_rebuild(models):
+    incremental, rebuilt, _ = models
+    for user_id in rebuilt.cf_engine.user_ids:
+        expected = rebuilt.ranked_recommendations(rebuilt.user_scores(user_id), 10)
+        assert close(incremental.recommendations(user_id, 10), expected), user_id
+
+
+@pytest.mark.parametrize('path', [
+    '/api/restaurants',
+    '/api/users/all',
+    '/api/stats',
+    '/api/restaurants?limit=500&sort=-rating',
+    '/api/restaurants?limit=500&sort=rating_count&min_rating=1',
+    '/api/users/all?limit=500&sort=-total_ratings',
+    '/api/users/all?limit=500&sort=rating&min_rating=0.5',
+    '/api/search?q=restaurant&limit=50'
+])
+def test_listings_and_stats_match_rebuild(models, publish, path):
+    import app
+
+    incremental, rebuilt, _ = models
+    client = app.app.test_client()
+    publish(incremental)
+    response = client.get(path)
+    publish(rebuilt)
+    assert response.status_code == 200
+    assert close(response.get_json(), client.get(path).get_json())
+
+
+def test_details_match_rebuild(models, publish):
+    import app
+
+    incremental, rebuilt, batches = models
+    client = app.app.test_client()
+    paths = sorted({f"/api/user/{rating['userID']}" for batch in batches for rating in batch})
+    paths += sorted({f"/api/restaurant/{rating['placeID']}" for batch in batches for rating in batch})
+    publish(incremental)
+    responses = [client.get(path) for path in paths]
+    publish(rebuilt)
+    for path, response in zip(paths, responses):
+        expected = client.get(path)
+        # The new user has no profile, so both models answer 404
+        assert response.status_code == expected.status_code, path
+        assert close(response.get_json(), expected.get_json()), path
+
+
+def test_new_user_is_recommended_like_rebuild(models):
+    incremental, rebuilt, _ = models
+    assert NEW_USER in incremental.cf_engine and NEW_USER in rebuilt.cf_engine
+    assert close(incremental.recommendations(NEW_USER, 10), rebuilt.ranked_recommendations(rebuilt.user_scores(NEW_USER), 10))
@@ -0,0 +1,74 @@
+"""Paged /api/restaurants and /api/users/all listings walked with cursors"""
+
+import pytest
+
+
+def walk(client, path, key):
+    """Records of every page of a listing, following next_cursor, and the totals reported by the pages"""
+    records, totals, cursor = [], set(), None
+    while True:
+        response = client.get(path + (f'&cursor={cursor}' if cursor is not None else ''))
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        records += page[key]
+        totals.add(page['total'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return records, totals
+
+
+@pytest.mark.parametrize('query', [
+    'sort=-rating',
+    'sort=name',
+    'sort=price&cuisine=Mexican',
+    'sort=rating_count&min_rating=1&parking=none,public',
+    'q=restaurant&sort=-rating',
+    'q=caf&open_at=2024-01-01T12:00',
+    ''
+])
+def test_restaurant_cursor_walk_matches_one_page(client, query):
+    expected = client.get(f'/api/restaurants?limit=500&{query}').get_json()
+    assert expected['total'] > 7
+    records, totals = walk(client, f'/api/restaurants?limit=7&{query}', 'restaurants')
+    assert records == expected['restaurants']
+    assert totals == {expected['total']}
+    assert len({record['placeID'] for record in records}) == len(records)
+
+
+@pytest.mark.parametrize('query', [
+    'sort=userID',
+    'sort=-total_ratings',
+    'sort=birth_year&smoker=false',
+    'sort=rating&min_rating=0.5&cuisine=Mexican'
+])
+def test_user_cursor_walk_matches_one_page(client, query):
+    expected = client.get(f'/api/users/all?limit=500&{query}').get_json()
+    assert expected['total'] > 9
+    records, totals = walk(client, f'/api/users/all?limit=9&{query}', 'users')
+    assert records == expected['users']
+    assert totals == {expected['total']}
+
+
+def test_walk_covers_full_table(client):
+    records, _ = walk(client, '/api/restaurants?limit=11', 'restaurants')
+    assert records == client.get('/api/restaurants').get_json()['restaurants']
+    records, _ = walk(client, '/api/users/all?limit=11', 'users')
+    assert records == client.get('/api/users/all').get_json()['users']
+
+
+def test_sorted_pages_are_in_order(client):
+    records, _ = walk(client, '/api/restaurants?limit=10&sort=-rating', 'restaurants')
+    ratings = [record['average_rating'] for record in records]
+    assert ratings == sorted(ratings, reverse=True)
+
+
+def test_search_filter_matches_search(client):
+    search = client.get('/api/search?q=taco&limit=50').get_json()
+    page = client.get('/api/restaurants?q=taco&limit=50').get_json()
+    assert page['total'] == search['total']
+    assert {record['placeID'] for record in page['restaurants']} == {record['placeID'] for record in search['results']}
+
+
+@pytest.mark.parametrize('query', ['cursor=-1', 'offset=-1', 'limit=0', 'limit=501', 'cursor=abc', 'sort=bogus'])
+def test_invalid_paging_is_rejected(client, query):
+    assert client.get(f'/api/restaurants?{query}').status_code == 400
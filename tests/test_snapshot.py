@@ -0,0 +1,79 @@
+"""Models written to a snapshot and loaded back serve the same results as the model built from CSV"""
+
+import numpy as np
+import pytest
+
+import config
+import snapshot
+from model import DATASETS, RANKING_WEIGHTS, apply_ratings, load_or_build_model, model_to_snapshot, rating_rows
+
+
+def write(model):
+    """Write a model as the current snapshot, like manage.py build-model"""
+    tables, arrays, vocabulary = model_to_snapshot(model)
+    checksums = snapshot.source_checksums(config.DATA_DIR, DATASETS.values())
+    return snapshot.write_snapshot(config.SNAPSHOT_DIR, tables, arrays, vocabulary, checksums, snapshot.model_settings())
+
+
+@pytest.fixture
+def loaded(model, monkeypatch):
+    write(model)
+    monkeypatch.setattr(config, 'SNAPSHOT_ENABLED', True)
+    return load_or_build_model(model.version + 1)
+
+
+def test_snapshot_is_loaded(loaded):
+    assert loaded.source.startswith('snapshot:')
+    # Score arrays are memory-mapped, not copied
+    assert isinstance(loaded.top_n_index.scores, np.memmap)
+
+
+def test_arrays_round_trip(model, loaded):
+    _, arrays, vocabulary = model_to_snapshot(model)
+    _, loaded_arrays, loaded_vocabulary = model_to_snapshot(loaded)
+    assert arrays.keys() == loaded_arrays.keys()
+    for name, array in arrays.items():
+        assert loaded_arrays[name].dtype == array.dtype, name
+        assert np.array_equal(loaded_arrays[name], array), name
+    assert loaded_vocabulary == vocabulary
+
+
+def test_recommendations_round_trip(model, loaded):
+    weights = dict(RANKING_WEIGHTS, popularity=0.5)
+    user_ids = list(model.cf_engine.user_ids) + list(model.cbf_engine.cold_index)
+    for user_id in user_ids:
+        assert loaded.recommendations(user_id, 10) == model.recommendations(user_id, 10), user_id
+        assert loaded.recommendations(user_id, 40) == model.recommendations(user_id, 40), user_id
+        assert loaded.reranked_recommendations(user_id, weights, 10) == model.reranked_recommendations(user_id, weights, 10)
+    for place_id in model.restaurant_records:
+        assert loaded.similar_restaurants(place_id, 5) == model.similar_restaurants(place_id, 5), place_id
+
+
+def test_catalog_round_trip(model, loaded):
+    for name in ('restaurants', 'users', 'stats'):
+        assert loaded.payload(name)[0] == model.payload(name)[0], name
+
+
+def test_ratings_apply_to_loaded_model(model, loaded):
+    user_id = model.rating['userID'].iloc[0]
+    place_id = sorted(model.restaurant_records)[0]
+    batch = [dict(userID=user_id, placeID=place_id, rating=2, food_rating=2, service_rating=2)]
+    updated, _ = apply_ratings(model, batch)
+    loaded_updated, _ = apply_ratings(loaded, batch)
+    assert loaded_updated.recommendations(user_id, 10) == updated.recommendations(user_id, 10)
+    assert loaded.recommendations(user_id, 10) == model.recommendations(user_id, 10)
+
+
+def test_changed_csv_invalidates_snapshot(model, data_dir, monkeypatch):
+    write(model)
+    monkeypatch.setattr(config, 'SNAPSHOT_ENABLED', True)
+    batch = [dict(userID='U9999', placeID=sorted(model.restaurant_records)[0], rating=2, food_rating=2, service_rating=2)]
+    rating_rows(batch).to_csv(data_dir / DATASETS['rating'], mode='a', header=False, index=False)
+    assert load_or_build_model().source == 'csv'
+
+
+def test_changed_settings_invalidate_snapshot(model, monkeypatch):
+    write(model)
+    monkeypatch.setattr(config, 'SNAPSHOT_ENABLED', True)
+    monkeypatch.setattr(config, 'CF_NEIGHBOURS', config.CF_NEIGHBOURS + 1)
+    assert load_or_build_model().source == 'csv'
@@ -1,27 +1,33 @@
 // API Base URL
 const API_BASE_URL = "http://localhost:5000/api";
 
+// Users per page of /api/users/all
+const PAGE_SIZE = 48;
+
 // Global variables
-let usersData = [];
 let statsData = {};
 let cuisineChartInstance = null;
 let paymentChartInstance = null;
-let ageChartInstance = null;
 let personalityChartInstance = null;
+let loadedUsers = 0;
+let nextCursor = null;
 
 // DOM Elements
 const loadingSpinner = document.getElementById("loadingSpinner");
 const usersGrid = document.getElementById("usersGrid");
+const loadMoreUsers = document.getElementById("loadMoreUsers");
 
 // API Functions
-async function fetchUsers() {
+async function fetchUsers(cursor = null) {
     try {
-        const response = await fetch(`${API_BASE_URL}/users/all`);
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (cursor !== null) params.set("cursor", cursor);
+        const response = await fetch(`${API_BASE_URL}/users/all?${params}`);
         if (!response.ok) {
             throw new Error(`HTTP ${response.status}: Failed to fetch users`);
         }
         const data = await response.json();
-        return data.users;
+        return data;
     } catch (error) {
         console.error("Error fetching users:", error);
         throw error;
@@ -52,14 +58,13 @@ async function loadDataFromAPI() {
     try {
         showLoading();
 
-        // Load users and stats in parallel
-        const [users, stats] = await Promise.all([fetchUsers(), fetchStats()]);
+        // Load the first page of users and stats in parallel
+        const [page, stats] = await Promise.all([fetchUsers(), fetchStats()]);
 
-        usersData = users;
         statsData = stats;
 
         hideLoading();
-        displayUsers();
+        showPage(page);
         generateCharts();
     } catch (error) {
         console.error("Error loading data:", error);
@@ -70,6 +75,7 @@ async function loadDataFromAPI() {
 
 function setupEventListeners() {
     window.addEventListener("resize", generateCharts);
+    if (loadMoreUsers) loadMoreUsers.addEventListener("click", loadNextPage);
 
     const navToggle = document.querySelector(".nav-toggle");
     if (navToggle) {
@@ -141,12 +147,38 @@ function showError(message) {
     }, 5000);
 }
 
-function displayUsers() {
+async function loadNextPage() {
+    if (nextCursor === null) return;
+
+    loadMoreUsers.disabled = true;
+    try {
+        showPage(await fetchUsers(nextCursor));
+    } catch (error) {
+        showError("Không thể tải thêm người dùng. Vui lòng kiểm tra kết nối server.");
+    } finally {
+        loadMoreUsers.disabled = false;
+    }
+}
+
+function showPage(page) {
+    nextCursor = page.next_cursor;
+    displayUsers(page.users, loadedUsers > 0);
+    loadedUsers += page.users.length;
+
+    if (loadMoreUsers) {
+        loadMoreUsers.style.display = nextCursor === null ? "none" : "flex";
+        loadMoreUsers.textContent = `Xem thêm người dùng (${loadedUsers}/${page.total})`;
+    }
+}
+
+function displayUsers(users, append = false) {
     if (!usersGrid) return;
 
-    usersGrid.innerHTML = "";
+    if (!append) {
+        usersGrid.innerHTML = "";
+    }
 
-    if (usersData.length === 0) {
+    if (!append && users.length === 0) {
         usersGrid.innerHTML = `
             <div class="no-results">
                 <i class="fas fa-user"></i>
@@ -157,7 +189,7 @@ function displayUsers() {
         return;
     }
 
-    usersData.forEach((user) => {
+    users.forEach((user) => {
         const userCard = document.createElement("a");
         userCard.className = "user-card compact";
         userCard.href = `user-detail.html?userID=${user.userID}`;
@@ -204,7 +236,6 @@ function generateCharts() {
     // Destroy existing charts
     if (cuisineChartInstance) cuisineChartInstance.destroy();
     if (paymentChartInstance) paymentChartInstance.destroy();
-    if (ageChartInstance) ageChartInstance.destroy();
     if (personalityChartInstance) personalityChartInstance.destroy();
 
     // Generate cuisine chart from stats data
@@ -262,62 +293,6 @@ function generateCharts() {
             },
         });
     }
-
-    // Generate age distribution chart
-    const ageCtx = document.getElementById("ageChart");
-    if (ageCtx && usersData.length > 0) {
-        const ageGroups = {
-            "Dưới 20": 0,
-            "20-30": 0,
-            "31-40": 0,
-            "41-50": 0,
-            "Trên 50": 0,
-        };
-
-        usersData.forEach((user) => {
-            if (user.birth_year) {
-                const age = new Date().getFullYear() - user.birth_year;
-                if (age < 20) ageGroups["Dưới 20"]++;
-                else if (age <= 30) ageGroups["20-30"]++;
-                else if (age <= 40) ageGroups["31-40"]++;
-                else if (age <= 50) ageGroups["41-50"]++;
-                else ageGroups["Trên 50"]++;
-            }
-        });
-
-        ageChartInstance = new Chart(ageCtx.getContext("2d"), {
-            type: "bar",
-            data: {
-                labels: Object.keys(ageGroups),
-                datasets: [
-                    {
-                        label: "Số lượng người dùng",
-                        data: Object.values(ageGroups),
-                        backgroundColor: "#36A2EB",
-                        borderColor: "#333",
-                        borderWidth: 1,
-                    },
-                ],
-            },
-            options: {
-                responsive: true,
-                maintainAspectRatio: false,
-                scales: {
-                    y: {
-                        beginAtZero: true,
-                        title: { display: true, text: "Số lượng người dùng" },
-                    },
-                    x: {
-                        title: { display: true, text: "Nhóm tuổi" },
-                    },
-                },
-                plugins: {
-                    legend: { display: false },
-                    title: { display: true, text: "Phân bố độ tuổi người dùng" },
-                },
-            },
-        });
-    }
 }
 
 // Utility functions for display mapping
@@ -0,0 +1,13 @@
+"""
+WSGI entry point of the Restaurant Recommendation System, for any WSGI server:
+
+    gunicorn --preload --workers 4 wsgi:app
+
+With SERVER_PRELOAD the model is loaded on import, so a server that imports the
+application before forking (gunicorn --preload) shares it between its workers.
+"""
+
+import config
+from app import create_app
+
+app = create_app(preload=config.SERVER_PRELOAD)